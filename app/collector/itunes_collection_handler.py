@@ -1,5 +1,6 @@
 from typing import Any, Dict, List, Union
 
+from app.common import metrics
 from app.common.exceptions import ItunesDataFieldNotFoundError
 from core.common.fs_utils import FileHandleError, remove_file, write_json
 from core.common.string import to_utf8_string, trim_string
@@ -18,6 +19,7 @@ def concat_collection_backup_file(
     return f"{directory_path}/{collection_id}.json.bak"
 
 
+@metrics.timed("file.write_itunes_data")
 def write_itunes_data(
     itunes_collection_path: str, collection_id: Union[int, str], data: Union[List, Dict]
 ) -> None:
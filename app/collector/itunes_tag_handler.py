@@ -3,6 +3,7 @@ import traceback
 from json import JSONDecodeError
 from typing import Dict, List
 
+from app.common import metrics
 from core.common.file_lock import FileLock, FileLockException
 from core.common.fs_utils import FileHandleError, read_json, write_json
 from core.common.string import to_utf8_string
@@ -69,6 +70,7 @@ def find_itunes_tag(itunes_tag_fp: str, tag_name: str) -> Dict:
         raise Exception("unexpected error, %s" % (exc,)) from exc
 
 
+@metrics.timed("file.update_itunes_tag_data")
 def update_itunes_tag_data(itunes_tag_fp: str, tags: List[Dict]) -> None:
     try:
         if not tags:
@@ -45,7 +45,7 @@ def apply_method_with_list_to_get_all_result(
             logger.debug(
                 "method throw error, method: %s, item: %s, %s",
                 method.__name__,
-                dir(item),
+                type(item).__name__,
                 exc,
             )
     return result
@@ -75,3 +75,9 @@ def sort_list_by_key(
     if not isinstance(items, list):
         raise TypeError("items not a list type")
     return sorted(items, key=lambda d: d.get(key, default), reverse=reverse)
+
+
+def chunk_list(items: List[Any], size: int) -> List[List[Any]]:
+    if size < 1:
+        raise ValueError("chunk size must be positive, size: %s" % (size,))
+    return [items[i : i + size] for i in range(0, len(items), size)]
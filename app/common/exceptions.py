@@ -1,3 +1,6 @@
+import reprlib
+from typing import Any
+
 from core.db.utils import Error
 
 
@@ -21,6 +24,12 @@ class DatabaseRemoveError(Error):
     pass
 
 
+class DatabaseWriteTimeoutError(Error):
+    """
+    result of a write is unknown, it may still be committed later, so it is not retried
+    """
+
+
 # ### feed parser ###
 
 
@@ -28,8 +37,52 @@ class FormatterException(Exception):
     pass
 
 
+class _PayloadRepr(reprlib.Repr):
+    """bounded repr, feedparser dicts are walked like dict instead of repr() in full"""
+
+    def __init__(self):
+        super().__init__()
+        self.maxlevel = 3
+        self.maxdict = 12
+        self.maxlist = 6
+        self.maxstring = 80
+        self.maxother = 80
+
+    def repr_FeedParserDict(self, x, level):
+        return self.repr_dict(x, level)
+
+
+_payload_repr = _PayloadRepr()
+
+_NO_PAYLOAD = object()
+
+
 class FeedResultException(Exception):
-    pass
+    """
+    message is formatted only when rendered, most of them are caught and dropped unread
+
+    raise FeedResultFieldNotFoundError("field %s not found", key, payload=field)
+
+    payload, e.g. the entry missing a field, is appended as a repr cut to PAYLOAD_MAX_LENGTH,
+    without payload nothing but the message is kept
+    """
+
+    PAYLOAD_MAX_LENGTH = 512
+
+    def __init__(self, message: str = "", *args: Any, payload: Any = _NO_PAYLOAD):
+        super().__init__(message, *args)
+        self.payload = payload
+
+    def __str__(self) -> str:
+        message, *args = self.args or ("",)
+        if args:
+            message = message % tuple(args)
+        if self.payload is _NO_PAYLOAD:
+            return message
+        return "%s, %s" % (
+            message,
+            _payload_repr.repr(self.payload)[: self.PAYLOAD_MAX_LENGTH],
+        )
 
 
 class FeedResultFieldNotFoundError(FeedResultException):
@@ -0,0 +1,247 @@
+import datetime
+import functools
+import io
+import json
+import math
+import os
+import shutil
+import threading
+import timeit
+from multiprocessing import util
+from typing import Dict, List, Optional
+
+from rich.console import Console
+from rich.table import Table
+
+from config.constants import METRICS_PATH
+from log_helper.async_logger import get_async_logger
+
+logger = get_async_logger(__name__)
+
+COUNTER = "c"
+GAUGE = "g"
+HISTOGRAM = "h"
+
+# events are kept in memory and appended to a per process file when buffer is full,
+# process exit, or flush() is called
+_BUFFER_SIZE = 500
+_BUFFER: List = []
+_STATE: Dict = {
+    "run_id": None,
+    "run_dir": None,
+    "finalize_pid": None,
+    "lock": threading.Lock(),
+}
+_COLUMNS = ["count", "total", "p50", "p95", "p99", "max"]
+
+# summaries of the latest runs kept in METRICS_PATH, and event dirs left by crashed runs
+KEEP_RUNS = 30
+
+
+def _clear_buffer_in_child() -> None:
+    # forked child must not write events recorded by its parent again
+    del _BUFFER[:]
+    _STATE.update({"finalize_pid": None, "lock": threading.Lock()})
+
+
+os.register_at_fork(after_in_child=_clear_buffer_in_child)
+
+
+def start_run(run_id: Optional[str] = None) -> str:
+    """
+    Start collecting events, call it before creating pool / pipeline so workers inherit it
+    """
+    run_id = run_id or datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    run_dir = os.path.join(METRICS_PATH, run_id)
+    os.makedirs(run_dir, exist_ok=True)
+    del _BUFFER[:]
+    _STATE.update({"run_id": run_id, "run_dir": run_dir})
+    return run_id
+
+
+def is_running() -> bool:
+    return _STATE["run_dir"] is not None
+
+
+def record(kind: str, name: str, value: float) -> None:
+    if not is_running():
+        return
+    pid = os.getpid()
+    if _STATE["finalize_pid"] != pid:
+        # flush when worker process exits normally
+        util.Finalize(None, flush, exitpriority=10)
+        _STATE["finalize_pid"] = pid
+    with _STATE["lock"]:
+        _BUFFER.append((kind, name, value))
+        is_full = len(_BUFFER) >= _BUFFER_SIZE
+    if is_full:
+        flush()
+
+
+def incr(name: str, value: float = 1) -> None:
+    record(COUNTER, name, value)
+
+
+def gauge(name: str, value: float) -> None:
+    record(GAUGE, name, value)
+
+
+def observe(name: str, seconds: float) -> None:
+    record(HISTOGRAM, name, seconds)
+
+
+def flush() -> None:
+    if not _BUFFER or not is_running():
+        return
+    with _STATE["lock"]:
+        events = list(_BUFFER)
+        del _BUFFER[:]
+    fp = os.path.join(_STATE["run_dir"], f"{os.getpid()}.jsonl")
+    try:
+        with open(fp, "a", encoding="utf-8") as file:
+            file.write("".join(json.dumps(event) + "\n" for event in events))
+    except Exception as exc:
+        logger.info("flush metrics failed, %s", exc)
+
+
+class Timer:
+    """
+    Observe elapsed seconds of the block into histogram name
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> "Timer":
+        self.start = timeit.default_timer()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        observe(self.name, timeit.default_timer() - self.start)
+
+
+def timed(name: Optional[str] = None):
+    def decorator(func):
+        metric_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Timer(metric_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """nearest rank percentile"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize() -> Dict:
+    """
+    Aggregate events written by every process of current run
+    """
+    counters: Dict[str, float] = {}
+    gauges: Dict[str, float] = {}
+    samples: Dict[str, List[float]] = {}
+
+    run_dir = _STATE["run_dir"]
+    for file_name in sorted(os.listdir(run_dir)) if run_dir else []:
+        with open(os.path.join(run_dir, file_name), "r", encoding="utf-8") as file:
+            for line in file:
+                kind, name, value = json.loads(line)
+                if kind == COUNTER:
+                    counters[name] = counters.get(name, 0) + value
+                elif kind == GAUGE:
+                    gauges[name] = value
+                elif kind == HISTOGRAM:
+                    samples.setdefault(name, []).append(value)
+
+    histograms = {}
+    for name, values in samples.items():
+        values.sort()
+        histograms[name] = {
+            "count": len(values),
+            "total": round(sum(values), 3),
+            "p50": round(percentile(values, 50), 4),
+            "p95": round(percentile(values, 95), 4),
+            "p99": round(percentile(values, 99), 4),
+            "max": round(values[-1], 4),
+        }
+
+    return {
+        "run_id": _STATE["run_id"],
+        "counters": counters,
+        "gauges": gauges,
+        "histograms": histograms,
+    }
+
+
+def create_summary_table(summary: Dict) -> str:
+    table = Table(title=f"metrics {summary['run_id']}")
+    for column in ["name"] + _COLUMNS:
+        table.add_column(column)
+    # most expensive first, shows where the time goes
+    for name, values in sorted(
+        summary["histograms"].items(), key=lambda item: item[1]["total"], reverse=True
+    ):
+        table.add_row(name, *[str(values[key]) for key in _COLUMNS])
+    for name, value in sorted({**summary["counters"], **summary["gauges"]}.items()):
+        table.add_row(name, str(value), *[""] * (len(_COLUMNS) - 1))
+
+    console = Console(width=160)
+    output_stream = io.StringIO()
+    console.file = output_stream
+    console.print(table)
+    return output_stream.getvalue()
+
+
+def remove_old_runs(keep: int = KEEP_RUNS) -> None:
+    """
+    Keep the latest keep entries of METRICS_PATH, summaries and event dirs of crashed runs
+    """
+    try:
+        entries = sorted(
+            os.scandir(METRICS_PATH),
+            key=lambda entry: entry.stat().st_mtime,
+            reverse=True,
+        )
+        for entry in entries[keep:]:
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
+    except Exception as exc:
+        logger.info("remove old metrics failed, %s", exc)
+
+
+def end_run() -> Optional[Dict]:
+    """
+    Log and save summary into METRICS_PATH/<run_id>.json, then stop collecting,
+    only the latest KEEP_RUNS summaries are kept
+    """
+    if not is_running():
+        return None
+    flush()
+    summary = summarize()
+    try:
+        with open(
+            os.path.join(METRICS_PATH, f"{summary['run_id']}.json"),
+            "w",
+            encoding="utf-8",
+        ) as file:
+            json.dump(summary, file, ensure_ascii=False, indent=2)
+        shutil.rmtree(_STATE["run_dir"], ignore_errors=True)
+    except Exception as exc:
+        logger.info("save metrics failed, %s", exc)
+    remove_old_runs()
+
+    logger.info("metrics summary\n%s", create_summary_table(summary))
+    _STATE.update({"run_id": None, "run_dir": None})
+    return summary
@@ -1,16 +1,52 @@
 import timeit
-from multiprocessing import BoundedSemaphore
-from threading import Thread
-from typing import Dict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, Tuple
 
+from app.common.collection import chunk_list
 from app.common.inspect import diff_time
-from app.crawler import crawl_detail, crawl_top
+from app.crawler import (
+    crawl_detail,
+    crawl_details,
+    crawl_details_concurrently,
+    crawl_feeder_content_cached,
+    crawl_top,
+    crawl_tops_concurrently,
+    parse_feeder_content,
+)
 from app.crawler.exceptions import CrawlerUnavailable
+from app.db.operations import insert_rank_data
+from config.loader import execution
 from log_helper.async_logger import get_async_logger
 
 logger = get_async_logger(__name__)
 
 
+def count_down_retry(retry_dict, collection_id, reason: str) -> None:
+    """
+    Add collection into retry, every collection has 3 times quota
+    """
+    count = retry_dict.get(collection_id)
+
+    if count is None:
+        # New one, has 3 times quota
+        logger.info("[%s] count_zero! %s", reason, collection_id)
+
+        retry_dict.update({collection_id: 3})
+
+    elif count < 1:
+        # latest one
+        logger.info("[%s] %s remove with loop limit", reason, collection_id)
+
+    else:
+        # Minus quota count
+        logger.info("[%s] update_count %s", reason, collection_id)
+
+        retry_dict.update({collection_id: (count - 1)})
+
+    logger.info("[%s] %s end", reason, collection_id)
+
+
 def get_detail(collection_dict, retry_dict, collection_id) -> None:
     """
     Get Lookup Detail for Insert Schedule
@@ -21,14 +57,7 @@ def get_detail(collection_dict, retry_dict, collection_id) -> None:
     try:
         logger.info("%s start", collection_id)
 
-        detail = next(
-            (
-                value
-                for key, value in list(collection_dict.items())
-                if collection_id == key
-            ),
-            None,
-        )
+        detail = collection_dict.get(collection_id)
 
         if not detail:
             logger.info("%s run", collection_id)
@@ -41,65 +70,292 @@ def get_detail(collection_dict, retry_dict, collection_id) -> None:
         # do retry when both block & not found
         exception_name = exc.__class__.__name__
         logger.info("[%s] %s start (%s)", exception_name, collection_id, str(exc))
+        count_down_retry(retry_dict, collection_id, exception_name)
 
-        count = retry_dict.get(collection_id)
+    except Exception as exc:
+        logger.error("unexpected error, %s", exc)
 
-        if count is None:
-            # New one, has 3 times quota
-            logger.info("[%s] count_zero! %s", exception_name, collection_id)
 
-            retry_dict.update({collection_id: 3})
+def get_detail_chunk(
+    collection_dict, retry_dict, cost_list, genre_dict, chunk: List
+) -> None:
+    """
+    Call lookup api for one chunk, record cost for every collection id of the chunk,
+    under its genre in genre_dict, the chunk cost is shared by its ids
+    """
+    start_time = timeit.default_timer()
+    try:
+        logger.info("batch of %s start", len(chunk))
+        details = crawl_details(collection_ids=chunk)
 
-        elif count < 1:
-            # latest one
-            logger.info("[%s] %s remove with loop limit", exception_name, collection_id)
+    except CrawlerUnavailable as exc:
+        exception_name = exc.__class__.__name__
+        logger.info("[%s] batch of %s (%s)", exception_name, len(chunk), str(exc))
+        details = {}
 
-        else:
-            # Minus quota count
-            logger.info("[%s] update_count %s", exception_name, collection_id)
+    except Exception as exc:
+        logger.error("unexpected error, %s", exc)
+        return
 
-            retry_dict.update({collection_id: (count - 1)})
+    save_detail_chunk(
+        collection_dict,
+        retry_dict,
+        cost_list,
+        genre_dict,
+        chunk,
+        details,
+        diff_time(start_time),
+    )
 
-        logger.info("[%s] %s end", exception_name, collection_id)
 
-    except Exception as exc:
-        logger.error("unexpected error, %s", exc)
+def save_detail_chunk(
+    collection_dict,
+    retry_dict,
+    cost_list,
+    genre_dict,
+    chunk: List,
+    details: Dict,
+    cost_time: float,
+) -> None:
+    """
+    Save details of one chunk into collection_dict, add missing collections into retry
+    """
+    collection_dict.update(details)
+
+    for collection_id in chunk:
+        if collection_id not in details:
+            count_down_retry(retry_dict, collection_id, "Missing")
+
+    if cost_list is not None:
+        cost_time = round(cost_time / len(chunk), 3)
+        cost_list.extend(
+            [
+                {
+                    "genre_id": (genre_dict or {}).get(c_id),
+                    "collection_id": c_id,
+                    "cost_time": cost_time,
+                }
+                for c_id in chunk
+            ]
+        )
+
+    logger.info("batch of %s end, missing %s", len(chunk), len(chunk) - len(details))
+
 
+def get_detail_batch(
+    collection_dict, retry_dict, collection_ids: List, cost_list=None, genre_dict=None
+) -> None:
+    """
+    Batch version of get_detail
+        (1) call lookup api with chunks of collection ids, chunks run in a thread pool
+        (2) save result into Dict collection_dict
+        (3) add into retry if chunk meet CrawlerUnavailable or collection missing in response
+    """
+    collection_ids = [c_id for c_id in collection_ids if not collection_dict.get(c_id)]
+    chunks = chunk_list(collection_ids, execution.config.lookup_batch_size)
+    if not chunks:
+        return
 
-def get_top(collection_dict, retry_dict, cost_list, collection_list, genre_id) -> Dict:
+    func = partial(get_detail_chunk, collection_dict, retry_dict, cost_list, genre_dict)
+    thread_num = min(execution.runner.lookup_thread_num, len(chunks))
+    with ThreadPoolExecutor(max_workers=thread_num) as executor:
+        # consume results to surface unexpected errors raised in threads
+        for _ in executor.map(func, chunks):
+            pass
+
+
+def get_top_list(top_cost_list, genre_id) -> Dict:
     """
-    Call Top Api, then call lookup api for every collection
+    Call Top Api only, lookup is dispatched later for the unique ids of all genres,
+    cost of the top api is recorded per genre in top_cost_list
     """
     top_list = []
     try:
+        start_time = timeit.default_timer()
         top_list = crawl_top(genre_id)
+        top_cost_list.append({"genre_id": genre_id, "cost_time": diff_time(start_time)})
 
-        sem_lock = BoundedSemaphore(10)
-        for collection_id in top_list:
-            if collection_id in collection_list:
-                continue
+    # for crawl top error: BlockException or NotFoundException
+    except CrawlerUnavailable as e:
+        logger.info("[get_top_list][%s] genre %s", e.__class__.__name__, genre_id)
 
-            start_time = timeit.default_timer()
-            get_detail(collection_dict, retry_dict, collection_id)
+    except Exception as e:
+        logger.info("[get_top_list][Error] %s %s", genre_id, str(e))
 
-            sem_lock.acquire()
+    finally:
+        return {genre_id: top_list}
 
-            t = Thread(
-                target=get_detail, args=(collection_dict, retry_dict, collection_id)
-            )
-            t.start()
-            t.join()
 
-            sem_lock.release()
+def collect_unique_collection_ids(results: List[Dict], collection_list) -> Dict:
+    """
+    Merge top lists of all genres, keep first seen order, skip existed collections,
+    return {collection_id: genre_id of the first top list it is in}
+    """
+    existed = set(collection_list)
+    genre_dict = {}
+    for result in results:
+        for genre_id, top_list in list(result.items()):
+            for collection_id in top_list:
+                if collection_id in existed or collection_id in genre_dict:
+                    continue
+                genre_dict[collection_id] = genre_id
+    return genre_dict
 
-            cost_list.append({"genre_id": genre_id, "cost_time": diff_time(start_time)})
 
-    # for crawl top error: BlockException or NotFoundException
+def get_top_lists_concurrently(top_cost_list, genre_ids: List) -> List[Dict]:
+    """
+    Like get_top_list for every genre, all requests run in one event loop,
+    top list of a failed genre is empty
+    """
+    results = []
+    for genre_id, crawl_result in crawl_tops_concurrently(genre_ids).items():
+        if isinstance(crawl_result.result, Exception):
+            results.append({genre_id: []})
+            continue
+        top_cost_list.append(
+            {"genre_id": genre_id, "cost_time": crawl_result.cost_time}
+        )
+        results.append({genre_id: crawl_result.result})
+    return results
+
+
+def get_details_concurrently(
+    collection_dict, retry_dict, collection_ids: List, cost_list=None, genre_dict=None
+) -> None:
+    """
+    Like get_detail_batch, all chunks run in one event loop instead of thread pools
+    """
+    collection_ids = [c_id for c_id in collection_ids if not collection_dict.get(c_id)]
+    chunks = chunk_list(collection_ids, execution.config.lookup_batch_size)
+    if not chunks:
+        return
+
+    for chunk, crawl_result in zip(chunks, crawl_details_concurrently(chunks)):
+        details = crawl_result.result
+        if isinstance(details, Exception):
+            if not isinstance(details, CrawlerUnavailable):
+                logger.error("unexpected error, %s", details)
+                continue
+            details = {}
+        save_detail_chunk(
+            collection_dict,
+            retry_dict,
+            cost_list,
+            genre_dict,
+            chunk,
+            details,
+            crawl_result.cost_time,
+        )
+
+
+# ### pipeline stages ###
+
+
+def top_stage(
+    lost_genres, seen_dict, collection_list, lock, sleep_dict, genre_id, emit: Callable
+) -> None:
+    """
+    Pipeline stage: call top api, save rank data, then emit every new collection id once
+    """
+    try:
+        top_list = crawl_top(genre_id)
+
     except CrawlerUnavailable as e:
-        logger.info("[get_top][insert][%s] genre %s", e.__class__.__name__, genre_id)
+        logger.info("[top_stage][%s] genre %s", e.__class__.__name__, genre_id)
+        lost_genres.append(genre_id)
+        return
 
     except Exception as e:
-        logger.info("[get_top][insert][Error] %s %s", genre_id, str(e))
+        logger.info("[top_stage][Error] %s %s", genre_id, str(e))
+        lost_genres.append(genre_id)
+        return
 
-    finally:
-        return {genre_id: top_list}
+    if not top_list:
+        lost_genres.append(genre_id)
+        return
+
+    try:
+        insert_rank_data(
+            category_id=genre_id, data=top_list, lock=lock, sleep_dict=sleep_dict
+        )
+    except Exception as exc:
+        logger.info("create %s rank data error: %s", genre_id, exc)
+
+    collection_ids = []
+    for collection_id in top_list:
+        if collection_id in collection_list:
+            continue
+        # same collection may chart in several genres, only the first one takes it
+        if seen_dict.setdefault(collection_id, genre_id) != genre_id:
+            continue
+        collection_ids.append(collection_id)
+
+    for chunk in chunk_list(collection_ids, execution.config.lookup_batch_size):
+        emit(chunk)
+
+
+def lookup_stage(retry_dict, collection_ids: List, emit: Callable) -> None:
+    """
+    Pipeline stage: call lookup api for a chunk of ids, emit (collection_id, detail)
+    """
+    detail_dict: Dict = {}
+    get_detail_batch(detail_dict, retry_dict, collection_ids)
+
+    for collection_id, detail in detail_dict.items():
+        retry_dict.pop(collection_id, None)
+
+        if not detail:
+            logger.info("[lookup_stage] %s empty detail, skip", collection_id)
+            continue
+
+        emit((collection_id, detail))
+
+
+def fetch_stage(deleted_collection_ids: List, item: Tuple, emit: Callable) -> None:
+    """
+    Pipeline stage: download feed content unless not modified, a deleted program is
+    always downloaded for recovery, emit (collection_id, detail, content, validator)
+    """
+    collection_id, detail = item
+
+    feed_url = detail.get("feedUrl")
+    if not feed_url:
+        logger.info("[fetch_stage] %s does not have feedUrl", collection_id)
+        return
+
+    start_time = timeit.default_timer()
+    download = crawl_feeder_content_cached(
+        url=feed_url, use_cache=collection_id not in deleted_collection_ids
+    )
+    if download is None:
+        return
+
+    if download.not_modified:
+        logger.info("[fetch_stage] %s feed not modified, skip", collection_id)
+        return
+
+    logger.info(
+        "[fetch_stage] collection_id %s, feed_url %s, cost %s sec",
+        collection_id,
+        feed_url,
+        diff_time(start_time),
+    )
+    emit((collection_id, detail, download.content, download.validator))
+
+
+def parse_stage(item: Tuple, emit: Callable) -> None:
+    """
+    Pipeline stage: parse feed content, emit (collection_id, detail, feed_result, validator)
+    """
+    collection_id, detail, content, validator = item
+
+    start_time = timeit.default_timer()
+    feed_result = parse_feeder_content(content)
+
+    logger.info(
+        "[parse_stage] collection_id %s, entries %s, cost %s sec",
+        collection_id,
+        len(feed_result.get("entries", [])),
+        diff_time(start_time),
+    )
+    emit((collection_id, detail, feed_result, validator))
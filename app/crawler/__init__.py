@@ -1,23 +1,54 @@
+import asyncio
 import multiprocessing
+import timeit
 import traceback
-from typing import Any, Dict, Optional
+from collections import namedtuple
+from typing import Any, Dict, Iterable, List, Optional, Union
 
 import urllib3
 
-from app.crawler.exceptions import CrawlerBlockException, CrawlerNotFoundException
-from app.crawler.feed_handler import feeder_work, feeder_work_and_save
+from app.common import metrics
+from app.crawler.async_feed_handler import async_feeder_download_conditional
+from app.crawler.async_itunes_api import (
+    async_get_lookup_api_results,
+    async_get_top_api_result,
+)
+from app.crawler.async_request_handler import AsyncFetchEngine
+from app.crawler.exceptions import (
+    CrawlerBlockException,
+    CrawlerNotFoundException,
+    CrawlerRateLimited,
+    CrawlerUnavailable,
+)
+from app.crawler.feed_cache import FeedDownload, load_feed_validator
+from app.crawler.feed_handler import (
+    feeder_download_conditional,
+    feeder_work,
+    feeder_work_and_save,
+    parse_feed_content,
+)
 from app.crawler.itunes_api import (
+    LookupData,
+    TopData,
     get_lookup_api_result,
+    get_lookup_api_results,
     get_search_api_result,
     get_top_api_result,
 )
 from app.crawler.wrapper import abort_wrapper
+from app.feed_parser.engine import get_stream_backend
+from app.feed_parser.parse_pool import get_parse_service
+from app.feed_parser.stream import StreamSourceError, parse_feed_stream
+from config.loader import execution
 from log_helper.async_logger import get_async_logger
 
 urllib3.disable_warnings()
 
 logger = get_async_logger(__name__)
 
+# result is an exception if the request failed, cost_time includes waiting for the stage
+CrawlResult = namedtuple("CrawlResult", ["result", "cost_time"])
+
 
 def get_collection_id(data):
     collection_id = None
@@ -29,23 +60,26 @@ def get_collection_id(data):
     return collection_id
 
 
-def crawl_top(genre_id: int):
-    try:
-        rank_data = []
-        top_data = get_top_api_result(genre_id)
+def create_rank_data(top_data: TopData) -> List:
+    rank_data = []
+    for entry in top_data.entry:
+        collection_id = get_collection_id(data=entry)
+        if collection_id:
+            rank_data.append(collection_id)
+    return rank_data
 
-        for entry in top_data.entry:
-            collection_id = get_collection_id(data=entry)
-            if collection_id:
-                rank_data.append(collection_id)
 
-        return rank_data
+@metrics.timed("crawler.top")
+def crawl_top(genre_id: int):
+    try:
+        return create_rank_data(get_top_api_result(genre_id))
 
     except Exception as exc:
         logger.info("unexpected error, %s", exc)
         raise exc
 
 
+@metrics.timed("crawler.lookup")
 def crawl_detail(collection_id) -> Dict:
     try:
         lookup_data = get_lookup_api_result(collection_id=collection_id)
@@ -77,12 +111,66 @@ def crawl_detail(collection_id) -> Dict:
             "Not Found error for collection id %s: %s" % (collection_id, str(exc))
         )
 
+    except CrawlerRateLimited as exc:
+        # not requested at all, let caller retry it
+        raise CrawlerRateLimited(
+            "Rate limited for collection id %s: %s" % (collection_id, str(exc))
+        )
+
     except Exception as exc:
         raise Exception(
             "Occur error about collection id %s: %s" % (collection_id, str(exc))
         )
 
 
+def create_details(collection_ids: List, lookup_data: LookupData) -> Dict:
+    result_dict = {
+        str(result.get("collectionId")): result
+        for result in lookup_data.results
+        if result.get("collectionId") is not None
+    }
+
+    details = {}
+    for collection_id in collection_ids:
+        result = result_dict.get(str(collection_id))
+        if result is not None:
+            details[collection_id] = result
+    return details
+
+
+@metrics.timed("crawler.lookup_batch")
+def crawl_details(collection_ids: List) -> Dict:
+    """
+    Batch version of crawl_detail, return {collection_id: detail}
+
+    collection ids absent from the response are absent from the returned dict too
+    """
+    try:
+        lookup_data = get_lookup_api_results(collection_ids=collection_ids)
+        return create_details(collection_ids, lookup_data)
+
+    except CrawlerBlockException as exc:
+        raise CrawlerBlockException(
+            "Block error for collection ids %s: %s" % (collection_ids, str(exc))
+        )
+
+    except CrawlerNotFoundException as exc:
+        raise CrawlerNotFoundException(
+            "Not Found error for collection ids %s: %s" % (collection_ids, str(exc))
+        )
+
+    except CrawlerUnavailable as exc:
+        # a whole batch is lost, let caller retry it
+        raise CrawlerUnavailable(
+            "Unavailable error for collection ids %s: %s" % (collection_ids, str(exc))
+        )
+
+    except Exception as exc:
+        raise Exception(
+            "Occur error about collection ids %s: %s" % (collection_ids, str(exc))
+        )
+
+
 def crawl_detail_for_update_daemon(collection_id) -> Dict:
     """
     Porting from crawl_detail, call lookup api and treate its response
@@ -188,6 +276,111 @@ def crawl_feeder(url: str, timeout=10) -> Optional[Any]:
     return result
 
 
+@metrics.timed("crawler.feed_fetch")
+def crawl_feeder_content_cached(
+    url: str, timeout=10, use_cache: bool = True, stream: bool = False
+) -> Optional[FeedDownload]:
+    """
+    Download feed unless it is not modified since validator saved by save_feed_validator
+
+    use_cache: False downloads the feed even if it is not modified, e.g. for recovery
+    stream: content may be an iterator of chunks read while parsing, see feeder_download_conditional
+    """
+    download = None
+
+    try:
+        download = abort_wrapper(
+            feeder_download_conditional,
+            url,
+            load_feed_validator(url) if use_cache else None,
+            stream,
+            timeout,
+            timeout=timeout,
+        )
+
+    except multiprocessing.TimeoutError as exc:
+        logger.info("feeder_download timeout error, url: %s, %s", url, exc)
+
+    except Exception as _:
+        logger.info(
+            "feeder_download get unexpected error, url: %s, %s",
+            url,
+            traceback.format_exc(10),
+        )
+
+    if download is None:
+        logger.info("feeder_download get nothing")
+
+    return download
+
+
+@metrics.timed("feed.parse")
+def parse_feeder_content(content: bytes) -> Optional[Any]:
+    result = parse_feed_content(content)
+
+    if result.get("bozo") != 0:
+        logger.info(
+            "parse_feed_content bozo error, bozo_exception: %s",
+            result.get("bozo_exception", "bozo error"),
+        )
+        # exception object (e.g. SAXParseException) may not be picklable
+        result["bozo_exception"] = str(result.get("bozo_exception", "bozo error"))
+
+    return result
+
+
+@metrics.timed("feed.parse_header")
+def parse_feeder_content_stream(
+    content: Union[bytes, Iterable[bytes]]
+) -> Optional[Any]:
+    """
+    Like parse_feeder_content, but entries are parsed lazily while iterating them
+
+    content can be the chunks of a streamed download, None if reading them fails before
+    the first entry, entries.incomplete is set if it fails after it
+    """
+    try:
+        result = parse_feed_stream(
+            content, execution.config.stream_parse["chunk_size"], get_stream_backend()
+        )
+
+    except StreamSourceError as exc:
+        logger.info("parse_feed_stream read error, %s", exc)
+        close_feeder_content(content)
+        return None
+
+    if result.get("bozo") != 0:
+        logger.info(
+            "parse_feed_stream bozo error, bozo_exception: %s",
+            result.get("bozo_exception", "bozo error"),
+        )
+
+    return result
+
+
+def close_feeder_content(content: Any) -> None:
+    """
+    Close the response behind streamed content or entries, nothing to do for bytes
+    """
+    close = getattr(content, "close", None)
+    if close is not None:
+        close()
+
+
+@metrics.timed("feed.parse_pool")
+def parse_feeder_content_pooled(content: bytes) -> Optional[Any]:
+    """
+    Like parse_feeder_content, but parsed by the parser workers of parse service,
+    entries are EpisodeRecord
+    """
+    result = get_parse_service().parse(content)
+
+    if result.get("bozo") != 0:
+        logger.info("parse service bozo error, collection feed not well-formed")
+
+    return result
+
+
 def crawl_feeder_and_save(url, collection_id, timeout=10):
     result = None
 
@@ -217,3 +410,107 @@ def crawl_feeder_and_save(url, collection_id, timeout=10):
             )
 
     return result
+
+
+# ### asyncio versions, every stage shares one AsyncFetchEngine of app_config async_http ###
+
+
+async def _async_crawl(name: str, coro) -> CrawlResult:
+    start_time = timeit.default_timer()
+    try:
+        with metrics.Timer(name):
+            result = await coro
+    except Exception as exc:
+        result = exc
+    return CrawlResult(
+        result=result, cost_time=round(timeit.default_timer() - start_time, 3)
+    )
+
+
+async def _async_crawl_top(engine: AsyncFetchEngine, genre_id) -> List:
+    return create_rank_data(await async_get_top_api_result(engine, genre_id))
+
+
+async def _async_crawl_details(engine: AsyncFetchEngine, collection_ids: List) -> Dict:
+    lookup_data = await async_get_lookup_api_results(engine, collection_ids)
+    return create_details(collection_ids, lookup_data)
+
+
+async def _async_gather_crawl(name: str, func, items: List) -> List[CrawlResult]:
+    async with AsyncFetchEngine() as engine:
+        return await asyncio.gather(
+            *[_async_crawl(name, func(engine, item)) for item in items]
+        )
+
+
+def crawl_tops_concurrently(genre_ids: List) -> Dict[Any, CrawlResult]:
+    """
+    Call top api for all genres in one event loop
+
+    return {genre_id: CrawlResult}, result is the rank data of crawl_top or exception
+    """
+    results = asyncio.run(
+        _async_gather_crawl("crawler.top", _async_crawl_top, genre_ids)
+    )
+    for genre_id, crawl_result in zip(genre_ids, results):
+        if isinstance(crawl_result.result, Exception):
+            logger.info("top error, genre_id: %s, %s", genre_id, crawl_result.result)
+    return dict(zip(genre_ids, results))
+
+
+def crawl_details_concurrently(chunks: List[List]) -> List[CrawlResult]:
+    """
+    Call batch lookup api for all chunks of collection ids in one event loop
+
+    return CrawlResult in order of chunks, result is the details of crawl_details or
+    exception
+    """
+    results = asyncio.run(
+        _async_gather_crawl("crawler.lookup_batch", _async_crawl_details, chunks)
+    )
+    for chunk, crawl_result in zip(chunks, results):
+        if isinstance(crawl_result.result, Exception):
+            logger.info(
+                "lookup error, collection ids: %s, %s", chunk, crawl_result.result
+            )
+    return results
+
+
+async def _async_crawl_feeder_contents(
+    urls: List[str], use_cache: bool
+) -> List[CrawlResult]:
+    async with AsyncFetchEngine() as engine:
+        return await asyncio.gather(
+            *[
+                _async_crawl(
+                    "crawler.feed_fetch",
+                    async_feeder_download_conditional(
+                        engine, url, load_feed_validator(url) if use_cache else None
+                    ),
+                )
+                for url in urls
+            ]
+        )
+
+
+def crawl_feeder_contents_cached(
+    urls: List[str], use_cache: bool = True
+) -> Dict[str, Optional[FeedDownload]]:
+    """
+    Download all feeds in one event loop like crawl_feeder_content_cached,
+    return {url: FeedDownload or None}
+    """
+    results = asyncio.run(_async_crawl_feeder_contents(urls, use_cache))
+
+    downloads = {}
+    for url, crawl_result in zip(urls, results):
+        download = crawl_result.result
+        if isinstance(download, Exception):
+            logger.info(
+                "feeder_download get unexpected error, url: %s, %s", url, download
+            )
+            download = None
+        elif download is None:
+            logger.info("feeder_download get nothing, url: %s", url)
+        downloads[url] = download
+    return downloads
@@ -0,0 +1,76 @@
+import asyncio
+from typing import Optional
+
+import aiohttp
+
+from app.crawler.async_request_handler import AsyncFetchEngine
+from app.crawler.exceptions import FeedException, FeedTooLargeException
+from app.crawler.feed_cache import (
+    FeedDownload,
+    FeedValidator,
+    create_conditional_headers,
+    create_feed_validator,
+    incr_cache_stat,
+    is_unchanged_content,
+)
+from app.crawler.feed_handler import feeder_download_conditional, is_ic_975_url
+from app.crawler.header import create_common_header
+from app.crawler.sanitizer import sanitize_feed_content
+from app.crawler.stream_download import get_feed_max_bytes
+from log_helper.async_logger import get_async_logger
+
+logger = get_async_logger(__name__)
+
+
+async def async_feeder_download_conditional(
+    engine: AsyncFetchEngine, url: str, validator: Optional[FeedValidator]
+) -> Optional[FeedDownload]:
+    """
+    Async version of feed_handler.feeder_download_conditional, body is read at once
+    """
+    if is_ic_975_url(url):
+        # ic975 需要 ssl adapter，交給 thread 執行同步版本
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None, feeder_download_conditional, url, validator
+        )
+
+    try:
+        result = await engine.fetch(
+            "feed",
+            url,
+            headers={**create_common_header(), **create_conditional_headers(validator)},
+            max_bytes=get_feed_max_bytes(),
+        )
+
+        if result.status == 304:
+            incr_cache_stat("not_modified")
+            return FeedDownload(content=None, validator=validator, not_modified=True)
+
+        if result.status >= 400:
+            logger.info("response error, url: %s, http code: %s", url, result.status)
+            return None
+
+        if is_unchanged_content(validator, result.content):
+            # server ignores conditional headers, but body is the same
+            incr_cache_stat("hit")
+            return FeedDownload(content=None, validator=validator, not_modified=True)
+
+        incr_cache_stat("miss")
+        return FeedDownload(
+            content=sanitize_feed_content(url, result.content),
+            validator=create_feed_validator(url, result.headers, result.content),
+            not_modified=False,
+        )
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+        logger.info("request or response error, url: %s, %s", url, exc)
+        return None
+
+    except FeedTooLargeException as exc:
+        logger.info("feed download aborted, url: %s, %s", url, exc)
+        raise
+
+    except Exception as exc:
+        logger.info("request feed failed, url: %s, %s", url, exc)
+        raise FeedException from exc
@@ -0,0 +1,67 @@
+from typing import Dict, List, Union
+
+from app.crawler.async_request_handler import (
+    AsyncFetchEngine,
+    FetchResult,
+    async_safe_request,
+)
+from app.crawler.itunes_api import (
+    LookupData,
+    TopData,
+    create_itunes_batch_lookup_url,
+    create_itunes_genre_url,
+    create_itunes_lookup_url,
+    create_lookup_data,
+    create_top_data,
+    load_api_data,
+)
+from log_helper.async_logger import get_async_logger
+
+logger = get_async_logger(__name__)
+
+
+def convert_result_to_dict(result: FetchResult) -> Dict:
+    if not isinstance(result, FetchResult):
+        return {}
+    return load_api_data(result.content)
+
+
+async def async_get_top_api_result(
+    engine: AsyncFetchEngine, genre_id: Union[int, str], retry: bool = False
+) -> TopData:
+    data = convert_result_to_dict(
+        await async_safe_request(
+            engine, "top", create_itunes_genre_url(int(genre_id)), retry
+        )
+    )
+    return create_top_data(data)
+
+
+async def async_get_lookup_api_result(
+    engine: AsyncFetchEngine, collection_id: Union[int, str], retry: bool = False
+) -> LookupData:
+    data = convert_result_to_dict(
+        await async_safe_request(
+            engine, "lookup", create_itunes_lookup_url(int(collection_id)), retry
+        )
+    )
+    return create_lookup_data(data)
+
+
+async def async_get_lookup_api_results(
+    engine: AsyncFetchEngine,
+    collection_ids: List[Union[int, str]],
+    retry: bool = False,
+) -> LookupData:
+    """
+    Async version of itunes_api.get_lookup_api_results
+    """
+    data = convert_result_to_dict(
+        await async_safe_request(
+            engine,
+            "lookup",
+            create_itunes_batch_lookup_url([int(c_id) for c_id in collection_ids]),
+            retry,
+        )
+    )
+    return create_lookup_data(data)
@@ -0,0 +1,183 @@
+import asyncio
+import traceback
+from collections import namedtuple
+from typing import Dict, Optional
+
+import aiohttp
+
+from app.crawler.exceptions import (
+    CrawlerBlockException,
+    CrawlerNotFoundException,
+    CrawlerRateLimited,
+    CrawlerUnavailable,
+)
+from app.crawler.header import create_common_header
+from app.crawler.rate_limiter import get_rate_limiter
+from app.crawler.request_handler import is_block_status, is_not_found_status
+from app.crawler.stream_download import async_read_response_content, get_accept_encoding
+from config.loader import execution
+from log_helper.async_logger import get_async_logger
+
+logger = get_async_logger(__name__)
+
+FetchResult = namedtuple("FetchResult", ["url", "status", "headers", "content"])
+
+DEFAULT_STAGE_CONFIG = {"concurrency": 10, "timeout": 30}
+
+
+class AsyncFetchEngine:
+    """
+    asyncio http engine, share one session and limit concurrency / timeout per stage
+
+    stage_config e.g. {"top": {"concurrency": 4, "timeout": 30}, "lookup": {...}, "feed": {...}}
+
+    Usage:
+        async with AsyncFetchEngine() as engine:
+            result = await engine.fetch("lookup", url)
+    """
+
+    def __init__(self, stage_config: Optional[Dict] = None):
+        if stage_config is None:
+            stage_config = execution.config.async_http
+        self.stage_config = stage_config
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> "AsyncFetchEngine":
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    async def open(self) -> None:
+        if self._session is None:
+            # limit=0, concurrency is controlled by stage semaphores
+            connector = aiohttp.TCPConnector(limit=0, ssl=False)
+            # body is decoded by async_read_response_content, which can stop early
+            self._session = aiohttp.ClientSession(
+                connector=connector, auto_decompress=False
+            )
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def get_stage_config(self, stage: str) -> Dict:
+        return {**DEFAULT_STAGE_CONFIG, **self.stage_config.get(stage, {})}
+
+    def get_concurrency(self, stage: str) -> int:
+        return int(self.get_stage_config(stage)["concurrency"])
+
+    def _get_semaphore(self, stage: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(stage)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.get_concurrency(stage))
+            self._semaphores[stage] = semaphore
+        return semaphore
+
+    def _get_timeout(self, stage: str) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(total=self.get_stage_config(stage)["timeout"])
+
+    async def fetch(
+        self,
+        stage: str,
+        url: str,
+        headers: Optional[Dict] = None,
+        max_bytes: Optional[int] = None,
+    ) -> FetchResult:
+        """
+        Request url under stage limit, raise aiohttp / asyncio error as it is
+
+        max_bytes: raise FeedTooLargeException if decoded body is larger, None means no limit
+        """
+        headers = {
+            **(headers or create_common_header()),
+            "Accept-Encoding": get_accept_encoding(),
+        }
+        if self._session is None:
+            await self.open()
+
+        async with self._get_semaphore(stage):
+            async with self._session.get(
+                url,
+                headers=headers,
+                timeout=self._get_timeout(stage),
+            ) as response:
+                content = await async_read_response_content(response, max_bytes)
+                return FetchResult(
+                    url=str(response.url),
+                    status=response.status,
+                    headers=response.headers.copy(),
+                    content=content,
+                )
+
+
+async def async_safe_request(
+    engine: AsyncFetchEngine,
+    stage: str,
+    url: str,
+    retry=False,
+    wait_interval: int = 30,
+) -> FetchResult:
+    """
+    Async version of request_handler.safe_request
+    """
+    limiter = get_rate_limiter()
+    try:
+        if limiter is not None:
+            await limiter.async_acquire()
+        result = await engine.fetch(stage, url)
+
+        # do retry or not
+        if retry and not 200 <= result.status < 400:
+            logger.info(
+                "response is not okay, retry in %s seconds, http code: %s, url: %s",
+                wait_interval,
+                result.status,
+                url,
+            )
+            await asyncio.sleep(wait_interval)
+            if limiter is not None:
+                await limiter.async_acquire()
+            result = await engine.fetch(stage, url)
+            logger.info(
+                "requests has retried, http code: %s, url: %s", result.status, url
+            )
+
+        if is_block_status(result.status):
+            raise CrawlerBlockException()
+
+        elif is_not_found_status(result.status):
+            raise CrawlerNotFoundException()
+
+        if result.status >= 400:
+            raise CrawlerUnavailable("http code: %s" % (result.status,))
+
+        if limiter is not None:
+            limiter.report_success()
+        return result
+
+    except (CrawlerBlockException, aiohttp.ClientConnectionError) as exc:
+        logger.info("requests blocked, %s", exc)
+        if limiter is not None:
+            limiter.report_block()
+        raise CrawlerBlockException("Block error, %s" % (exc,)) from exc
+
+    except CrawlerNotFoundException as exc:
+        logger.info("requests not found, %s", exc)
+        raise CrawlerNotFoundException("Not found error, %s" % (exc,)) from exc
+
+    except CrawlerRateLimited as exc:
+        # request is not sent, caller retries it later like other unavailable ones
+        logger.info("requests rate limited, url: %s, %s", url, exc)
+        raise
+
+    except (CrawlerUnavailable, asyncio.TimeoutError) as exc:
+        logger.info("requests unavailable, url: %s, %s", url, exc)
+        raise CrawlerUnavailable("Unavailable error, %s" % (exc,)) from exc
+
+    except (Exception,) as exc:
+        logger.critical("unexpected error, %s", traceback.format_exc(10))
+        raise CrawlerUnavailable("Unavailable error, %s" % (exc,)) from exc
@@ -10,9 +10,17 @@ class CrawlerNotFoundException(CrawlerUnavailable):
     pass
 
 
+class CrawlerRateLimited(CrawlerUnavailable):
+    pass
+
+
 class FeedException(Exception):
     pass
 
 
 class FeedBozoException(FeedException):
     pass
+
+
+class FeedTooLargeException(FeedException):
+    pass
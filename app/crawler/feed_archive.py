@@ -0,0 +1,111 @@
+"""
+Raw feed archive, feeds are saved as received, gzip compressed and named by content hash
+
+    data/feed_archive/blobs/<hash[:2]>/<hash>.xml.gz
+    data/feed_archive/index.tsv     collection_id <tab> hash, one line per change
+
+a feed already archived is not written again, the index only gets a line when the
+latest blob of a collection changes, the last line of a collection wins
+"""
+
+import gzip
+import os
+import tempfile
+from typing import Dict, Optional, Union
+
+from app.common import metrics
+from app.crawler.feed_cache import create_content_hash
+from config.constants import FEED_ARCHIVE_PATH
+from log_helper.async_logger import get_async_logger
+
+logger = get_async_logger(__name__)
+
+# xml still shrinks several times at the fastest level
+COMPRESS_LEVEL = 1
+
+ARCHIVE_BLOB_PATH = os.path.join(FEED_ARCHIVE_PATH, "blobs")
+ARCHIVE_INDEX_FP = os.path.join(FEED_ARCHIVE_PATH, "index.tsv")
+
+# latest hash per collection known by this process, loaded from index on first use
+_INDEX: Dict[str, Dict[str, str]] = {}
+
+
+def create_blob_fp(content_hash: str) -> str:
+    return os.path.join(ARCHIVE_BLOB_PATH, content_hash[:2], f"{content_hash}.xml.gz")
+
+
+def load_archive_index() -> Dict[str, str]:
+    """{collection_id: hash of the latest blob}"""
+    index = {}
+    if not os.path.exists(ARCHIVE_INDEX_FP):
+        return index
+    with open(ARCHIVE_INDEX_FP, "r", encoding="utf-8") as file:
+        for line in file:
+            collection_id, _, content_hash = line.rstrip("\n").partition("\t")
+            if content_hash:
+                index[collection_id] = content_hash
+    return index
+
+
+def _get_index() -> Dict[str, str]:
+    if "latest" not in _INDEX:
+        _INDEX["latest"] = load_archive_index()
+    return _INDEX["latest"]
+
+
+def _write_blob(fp: str, content: bytes) -> None:
+    """write to temp file then rename, a blob is complete or missing"""
+    dir_path = os.path.dirname(fp)
+    os.makedirs(dir_path, exist_ok=True)
+    fd, tmp_fp = tempfile.mkstemp(dir=dir_path, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(gzip.compress(content, compresslevel=COMPRESS_LEVEL, mtime=0))
+        os.replace(tmp_fp, fp)
+    except Exception:
+        os.remove(tmp_fp)
+        raise
+
+
+def _append_index(collection_id: str, content_hash: str) -> None:
+    # one small write with O_APPEND, lines of concurrent processes are not mixed
+    line = f"{collection_id}\t{content_hash}\n".encode("utf-8")
+    fd = os.open(ARCHIVE_INDEX_FP, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+@metrics.timed("file.archive_feed")
+def archive_feed(
+    collection_id: Union[str, int], content: bytes, content_hash: Optional[str] = None
+) -> str:
+    """
+    Save raw feed content, content_hash can be passed if it is already computed,
+    return the hash
+    """
+    collection_id = str(collection_id)
+    content_hash = content_hash or create_content_hash(content)
+
+    fp = create_blob_fp(content_hash)
+    if os.path.exists(fp):
+        metrics.incr("feed.archive_dedup")
+    else:
+        _write_blob(fp, content)
+        metrics.incr("feed.archive_write")
+
+    index = _get_index()
+    if index.get(collection_id) != content_hash:
+        _append_index(collection_id, content_hash)
+        index[collection_id] = content_hash
+    return content_hash
+
+
+def read_archived_feed(collection_id: Union[str, int]) -> Optional[bytes]:
+    """latest feed of collection known by this process, None if not archived"""
+    content_hash = _get_index().get(str(collection_id))
+    if content_hash is None:
+        return None
+    with gzip.open(create_blob_fp(content_hash), "rb") as file:
+        return file.read()
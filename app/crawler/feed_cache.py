@@ -0,0 +1,120 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+from collections import namedtuple
+from typing import Dict, Optional
+
+from app.common import metrics
+from config.constants import FEED_CACHE_PATH
+from log_helper.async_logger import get_async_logger
+
+logger = get_async_logger(__name__)
+
+FeedValidator = namedtuple(
+    "FeedValidator", ["url", "etag", "last_modified", "content_hash"]
+)
+
+# content is None when feed is not modified
+FeedDownload = namedtuple("FeedDownload", ["content", "validator", "not_modified"])
+
+# created before pool / pipeline forks, so every worker shares the same counters
+_CACHE_STATS = {
+    "hit": multiprocessing.Value("i", 0),
+    "miss": multiprocessing.Value("i", 0),
+    "not_modified": multiprocessing.Value("i", 0),
+}
+
+
+def incr_cache_stat(name: str) -> None:
+    value = _CACHE_STATS[name]
+    with value.get_lock():
+        value.value += 1
+
+
+def get_cache_stats() -> Dict[str, int]:
+    return {name: value.value for name, value in _CACHE_STATS.items()}
+
+
+def reset_cache_stats() -> None:
+    for value in _CACHE_STATS.values():
+        with value.get_lock():
+            value.value = 0
+
+
+def create_content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def create_validator_fp(url: str) -> str:
+    url_key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(FEED_CACHE_PATH, f"{url_key}.json")
+
+
+def create_feed_validator(
+    url: str, headers: Dict, content: Optional[bytes]
+) -> FeedValidator:
+    """content is None for a body not read at once, it has no content hash"""
+    return FeedValidator(
+        url=url,
+        etag=headers.get("ETag"),
+        last_modified=headers.get("Last-Modified"),
+        content_hash=create_content_hash(content) if content is not None else None,
+    )
+
+
+def has_http_validator(headers: Dict) -> bool:
+    """next run can tell a change by conditional GET, without the content hash"""
+    return bool(headers.get("ETag") or headers.get("Last-Modified"))
+
+
+def create_conditional_headers(validator: Optional[FeedValidator]) -> Dict:
+    headers = {}
+    if validator is None:
+        return headers
+    if validator.etag:
+        headers["If-None-Match"] = validator.etag
+    if validator.last_modified:
+        headers["If-Modified-Since"] = validator.last_modified
+    return headers
+
+
+def load_feed_validator(url: str) -> Optional[FeedValidator]:
+    fp = create_validator_fp(url)
+    if not os.path.exists(fp):
+        return None
+    try:
+        with open(fp, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        if data.get("url") != url:
+            return None
+        return FeedValidator(**data)
+    except Exception as exc:
+        logger.info("load feed validator failed, url: %s, %s", url, exc)
+        return None
+
+
+@metrics.timed("file.save_feed_validator")
+def save_feed_validator(validator: Optional[FeedValidator]) -> None:
+    """
+    Save validator when feed reaches a final outcome, write to temp file then rename
+    """
+    if validator is None:
+        return
+    fp = create_validator_fp(validator.url)
+    try:
+        fd, tmp_fp = tempfile.mkstemp(dir=FEED_CACHE_PATH, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump(validator._asdict(), file, ensure_ascii=False)
+        os.replace(tmp_fp, fp)
+    except Exception as exc:
+        logger.info("save feed validator failed, url: %s, %s", validator.url, exc)
+
+
+def is_unchanged_content(validator: Optional[FeedValidator], content: bytes) -> bool:
+    return (
+        validator is not None
+        and validator.content_hash is not None
+        and validator.content_hash == create_content_hash(content)
+    )
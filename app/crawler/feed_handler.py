@@ -1,7 +1,5 @@
-import os
-import re
 import traceback
-from typing import Optional, Union
+from typing import Dict, Optional
 
 import feedparser
 import requests
@@ -11,11 +9,27 @@ from feedparser import FeedParserDict
 from requests import RequestException
 from requests.exceptions import HTTPError
 
-from app.crawler.exceptions import FeedException
+from app.crawler.exceptions import FeedException, FeedTooLargeException
+from app.crawler.feed_archive import archive_feed
+from app.crawler.feed_cache import (
+    FeedDownload,
+    FeedValidator,
+    create_conditional_headers,
+    create_feed_validator,
+    has_http_validator,
+    incr_cache_stat,
+    is_unchanged_content,
+)
 from app.crawler.header import create_common_header
 from app.crawler.request_handler import adapter_request
-from config.constants import FEED_DATA_PATH
-from core.common.fs_utils import write_xml_with_et
+from app.crawler.sanitizer import iter_sanitized_chunks, sanitize_feed_content
+from app.crawler.stream_download import (
+    get_accept_encoding,
+    get_feed_max_bytes,
+    iter_response_content,
+    read_response_content,
+)
+from app.feed_parser.engine import parse_feed
 from log_helper.async_logger import get_async_logger
 
 urllib3.disable_warnings()
@@ -27,119 +41,150 @@ def is_ic_975_url(url: str) -> bool:
     return "ic975.com" in url
 
 
-def create_feed_data_fp(fp: str, collection_id: Union[str, int]) -> str:
-    return os.path.join(fp, f"{str(collection_id)}.xml")
-
-
 def feeder_work(url) -> FeedParserDict:
     try:
-        request_headers = create_common_header()
+        response = request_feed(url)
+        content = read_response_content(response, get_feed_max_bytes())
         result = feedparser.parse(
-            url,
+            content,
             response_headers={"content-type": "text/xml; charset=utf-8"},
-            request_headers=request_headers,
         )
+        result["status"] = response.status_code
         return result
     except Exception as exc:
         logger.info("request feed failed, url: %s, %s", url, exc)
         raise FeedException from exc
 
 
-def feeder_work_and_save(url, collection_id) -> Optional[FeedParserDict]:
-    feed_data_path = FEED_DATA_PATH
+def request_feed(
+    url: str, extra_headers: Optional[Dict] = None, timeout: Optional[float] = None
+) -> requests.Response:
+    """
+    Response with body not read yet, read it by read_response_content / iter_response_content
+
+    timeout: seconds to wait for connecting and for every read of the body, None waits forever
+    """
+    if is_ic_975_url(url):
+        # 若為 ic975，優先使用 adapter 去 call (只是不想再製造多一次的 503 response ，免得多留不正確的黑紀錄)
+        return adapter_request(url=url, stream=True)
+
+    headers = {
+        **create_common_header(),
+        "Accept-Encoding": get_accept_encoding(),
+        **(extra_headers or {}),
+    }
+    response = requests.get(
+        url=url, headers=headers, verify=False, stream=True, timeout=timeout
+    )
+    # 若有其他的 503，試試看 adapter 去 call
+    if response and response.status_code == "503":
+        logger.info("response http status 503, url: %s", url)
+        response.close()
+        response = adapter_request(url=url, stream=True)
+    return response
+
+
+def feeder_download_conditional(
+    url,
+    validator: Optional[FeedValidator],
+    stream: bool = False,
+    timeout: Optional[float] = None,
+) -> Optional[FeedDownload]:
+    """
+    Download feed with If-None-Match / If-Modified-Since from validator of the last run
+
+    stream: content is an iterator of sanitized chunks, the body is read while it is
+    parsed, e.g. by parse_feed_stream, and the caller must read it to the end or close it,
+    the body is still read at once if the response has no ETag / Last-Modified, as the
+    content hash is the only way to tell a change next run
+    timeout: seconds to wait for every read of a streamed body
+    """
+    try:
+        response = request_feed(
+            url, create_conditional_headers(validator), timeout if stream else None
+        )
+
+        if response.status_code == 304:
+            response.close()
+            incr_cache_stat("not_modified")
+            return FeedDownload(content=None, validator=validator, not_modified=True)
+
+        response.raise_for_status()
+        if stream and has_http_validator(response.headers):
+            incr_cache_stat("miss")
+            chunks = iter_response_content(response, get_feed_max_bytes())
+            return FeedDownload(
+                content=iter_sanitized_chunks(url, chunks),
+                validator=create_feed_validator(url, response.headers, None),
+                not_modified=False,
+            )
+
+        content = read_response_content(response, get_feed_max_bytes())
 
-    feed_data_fp = create_feed_data_fp(feed_data_path, collection_id)
+        if is_unchanged_content(validator, content):
+            # server ignores conditional headers, but body is the same
+            incr_cache_stat("hit")
+            return FeedDownload(content=None, validator=validator, not_modified=True)
 
+        incr_cache_stat("miss")
+        return FeedDownload(
+            content=sanitize_feed_content(url, content),
+            validator=create_feed_validator(url, response.headers, content),
+            not_modified=False,
+        )
+
+    except (HTTPError, RequestException) as exc:
+        logger.info("request or response error, url: %s, %s", url, exc)
+        return None
+
+    except FeedTooLargeException as exc:
+        logger.info("feed download aborted, url: %s, %s", url, exc)
+        raise
+
+    except Exception as exc:
+        logger.info("request feed failed, url: %s, %s", url, exc)
+        raise FeedException from exc
+
+
+def parse_feed_content(content: bytes) -> FeedParserDict:
+    """parse by engine of app_config feed_parser_engine"""
+    return parse_feed(content)
+
+
+def feeder_work_and_save(url, collection_id) -> Optional[FeedParserDict]:
     try:
         # 1. request
-        if is_ic_975_url(url):
-            # 若為 ic975，優先使用 adapter 去 call (只是不想再製造多一次的 503 response ，免得多留不正確的黑紀錄)
-            response = adapter_request(url=url)
-        else:
-            headers = create_common_header()
-            response = requests.get(url=url, headers=headers, verify=False)
-            # 若有其他的 503，試試看 adapter 去 call
-            if response and response.status_code == "503":
-                logger.info("response http status 503, url: %s", url)
-                response = adapter_request(url=url)
-
+        response = request_feed(url)
         response.raise_for_status()
+        raw_content = read_response_content(response, get_feed_max_bytes())
 
-        # 2. save xml
+        # 2. save raw content, not well-formed feeds are kept as well
         try:
-            write_xml_with_et(feed_data_fp, response.content)
+            archive_feed(collection_id, raw_content)
         except Exception as exc:
             logger.info(
-                "save XML failed, collection_id: %s, url: %s, %s",
+                "archive feed failed, collection_id: %s, url: %s, %s",
                 collection_id,
                 url,
                 exc,
             )
 
-        # 3. parse by feedparser
+        # 3. filter C0 except x09, x0D, x0A before parsing
+        content = sanitize_feed_content(url, raw_content)
+
+        # 4. parse by feedparser
         result = feedparser.parse(
-            response.content,
+            content,
             response_headers={"content-type": "text/xml; charset=utf-8"},
         )
 
-        # 4. retry if bozo occur
-        if result.get("bozo") != 0:
-            # 4.1 response has bozo - means XML not well-fromed
-            feed_encoding = result.get("encoding", None)
-            bozo_message = result.get("bozo_exception", "bozo error")
-            logger.info(
-                "bozo error, collection_id: %s, encoding: %s, bozo_exception: %s, will try filter C0",
-                collection_id,
-                bozo_message,
-                feed_encoding,
-            )
-
-            if not feed_encoding:
-                logger.info(
-                    "feedparser get encoding empty, collection_id: %s, try utf-8",
-                    collection_id,
-                )
-                feed_encoding = "utf-8"
-
-            # 4.1.1 filter C0 except x09, x0D, x0A
-            #  [\u0000-\u001F\u007F] (all C0, cntrl: https://www.regular-expressions.info/posixbrackets.html)
-            #  [\u0000-\u0008\u000B\u000C\u000E-\u001F\u007F] (C0 except x09, x0D, x0A, https://regex101.com/r/36zomv/6)
-            response_str = response.content.decode(feed_encoding)
-            response_str = re.sub(
-                r"[\u0000-\u0008\u000B\u000C\u000E-\u001F\u007F]", "", response_str
-            )
-
-            # 4.1.2 save again
-            try:
-                write_xml_with_et(feed_data_fp, response.content)
-            except Exception as exc:
-                logger.info(
-                    "save XML failed again, collection_id: %s, url: %s, %s",
-                    collection_id,
-                    url,
-                    exc,
-                )
-
-            # 4.1.3 parse again
-            result = feedparser.parse(
-                response_str,
-                response_headers={"content-type": "text/xml; charset=utf-8"},
-            )
-            if result.get("bozo") == 0:
-                logger.info(
-                    "feedparser retry success, collection_id: %s", collection_id
-                )
-
         if result.get("bozo") != 0:
-            # 4.2 still has bozo
-            feed_encoding2 = result.get("encoding", None)
-            bozo_message2 = result.get("bozo_exception", "bozo error")
             # record log for observation
             logger.info(
-                "bozo error again, collection_id: %s, encoding: %s, bozo_exception: %s",
+                "bozo error, collection_id: %s, encoding: %s, bozo_exception: %s",
                 collection_id,
-                bozo_message2,
-                feed_encoding2,
+                result.get("encoding", None),
+                result.get("bozo_exception", "bozo error"),
             )
 
         return result
@@ -148,6 +193,10 @@ def feeder_work_and_save(url, collection_id) -> Optional[FeedParserDict]:
         logger.info("request or response error, url: %s, %s", url, exc)
         return None
 
+    except FeedTooLargeException as exc:
+        logger.info("feed download aborted, url: %s, %s", url, exc)
+        raise
+
     except Exception as exc:
         logger.critical("unexpected error, url: %s, %s", url, traceback.format_exc(10))
         raise FeedException from exc
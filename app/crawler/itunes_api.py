@@ -1,9 +1,12 @@
+import json
 from collections import namedtuple
-from typing import Dict, Union
+from typing import Dict, List, Union
 
 import requests
 
+from app.crawler.exceptions import CrawlerUnavailable
 from app.crawler.request_handler import safe_request
+from config.loader import execution
 from log_helper.async_logger import get_async_logger
 
 logger = get_async_logger(__name__)
@@ -12,31 +15,67 @@ TopData = namedtuple("TopData", ["entry"])
 LookupData = namedtuple("LookupData", ["resultCount", "results"])
 
 
+def load_api_data(content: bytes) -> Dict:
+    """
+    Json body of itunes api, raise CrawlerUnavailable if it is empty or not json
+    """
+    try:
+        data = json.loads(content)
+    except ValueError as exc:
+        raise CrawlerUnavailable(
+            "Unavailable error, invalid body, %s" % (exc,)
+        ) from exc
+    if not isinstance(data, dict):
+        raise CrawlerUnavailable("Unavailable error, unexpected body, %s" % (data,))
+    return data
+
+
 def convert_resp_to_dict(resp: requests.Response) -> Dict:
     if not isinstance(resp, requests.Response):
         return {}
-    return resp.json()
+    return load_api_data(resp.content)
+
+
+def create_top_data(data: Dict) -> TopData:
+    return TopData(data.get("feed", {}).get("entry", []))
+
+
+def create_lookup_data(data: Dict) -> LookupData:
+    """raise CrawlerUnavailable if data is not a lookup / search result"""
+    try:
+        return LookupData(resultCount=data["resultCount"], results=data["results"])
+    except KeyError as exc:
+        raise CrawlerUnavailable(
+            "Unavailable error, %s not found in result" % (exc,)
+        ) from exc
+
+
+def get_itunes_api_host() -> str:
+    return execution.config.itunes_api_host.rstrip("/")
 
 
 def create_itunes_genre_url(genre_id: int) -> str:
-    return f"https://itunes.apple.com/tw/rss/toppodcasts/genre={str(genre_id)}/limit=200/json"
+    return f"{get_itunes_api_host()}/tw/rss/toppodcasts/genre={str(genre_id)}/limit=200/json"
 
 
 def create_itunes_lookup_url(collection_id: int) -> str:
-    return f"https://itunes.apple.com/lookup?id={str(collection_id)}"
+    return f"{get_itunes_api_host()}/lookup?id={str(collection_id)}"
+
+
+def create_itunes_batch_lookup_url(collection_ids: List[Union[int, str]]) -> str:
+    ids = ",".join(str(collection_id) for collection_id in collection_ids)
+    return f"{get_itunes_api_host()}/lookup?id={ids}"
 
 
 def create_itunes_search_url(keyword: str) -> str:
-    return (
-        f"https://itunes.apple.com/search?media=podcast&limit=200&term={str(keyword)}"
-    )
+    return f"{get_itunes_api_host()}/search?media=podcast&limit=200&term={str(keyword)}"
 
 
 def get_top_api_result(genre_id: Union[int, str], retry: bool = False) -> TopData:
     data = convert_resp_to_dict(
         safe_request(create_itunes_genre_url(int(genre_id)), retry)
     )
-    return TopData(data.get("feed", {}).get("entry", []))
+    return create_top_data(data)
 
 
 def get_lookup_api_result(
@@ -45,11 +84,27 @@ def get_lookup_api_result(
     data = convert_resp_to_dict(
         safe_request(create_itunes_lookup_url(int(collection_id)), retry)
     )
-    return LookupData(resultCount=data["resultCount"], results=data["results"])
+    return create_lookup_data(data)
+
+
+def get_lookup_api_results(
+    collection_ids: List[Union[int, str]], retry: bool = False
+) -> LookupData:
+    """
+    Lookup several collections in one request, results order is not guaranteed
+    and missing collections are simply absent
+    """
+    data = convert_resp_to_dict(
+        safe_request(
+            create_itunes_batch_lookup_url([int(c_id) for c_id in collection_ids]),
+            retry,
+        )
+    )
+    return create_lookup_data(data)
 
 
 def get_search_api_result(term: Union[int, str], retry: bool = False) -> LookupData:
     data = convert_resp_to_dict(
         safe_request(create_itunes_search_url(str(term)), retry)
     )
-    return LookupData(resultCount=data["resultCount"], results=data["results"])
+    return create_lookup_data(data)
@@ -0,0 +1,244 @@
+import abc
+import asyncio
+import multiprocessing
+import os
+import time
+from typing import Dict, Optional
+
+from redis.exceptions import RedisError
+
+from app.common import metrics
+from app.crawler.exceptions import CrawlerRateLimited
+from config.constants import ITUNES_CACHE_DB_NUMBER
+from config.loader import execution
+from core.cache.conn import get_redis_conn
+from core.conf import settings
+from log_helper.async_logger import get_async_logger
+
+logger = get_async_logger(__name__)
+
+# index of shared state
+_TOKENS, _UPDATED_AT, _RATE = 0, 1, 2
+
+# created before pool / pipeline forks, so every worker shares the same bucket
+_SHARED_STATE = multiprocessing.RawArray("d", [-1.0, 0.0, 0.0])
+_SHARED_LOCK = multiprocessing.Lock()
+
+# refill then take tokens, return seconds to wait (0 means granted)
+_REDIS_TAKE_SCRIPT = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+local updated_at = tonumber(redis.call('HGET', KEYS[1], 'updated_at'))
+local rate = tonumber(redis.call('HGET', KEYS[1], 'rate'))
+local now = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local requested = tonumber(ARGV[4])
+if rate == nil then
+    rate = tonumber(ARGV[3])
+end
+if tokens == nil then
+    tokens = burst
+    updated_at = now
+end
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = (requested - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens))
+redis.call('HSET', KEYS[1], 'updated_at', tostring(now))
+redis.call('HSET', KEYS[1], 'rate', tostring(rate))
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(wait)
+"""
+
+# multiply rate by factor then add step, clamp to [min_rate, max_rate]
+_REDIS_ADJUST_SCRIPT = """
+local rate = tonumber(redis.call('HGET', KEYS[1], 'rate'))
+if rate == nil then
+    rate = tonumber(ARGV[1])
+end
+rate = rate * tonumber(ARGV[2]) + tonumber(ARGV[3])
+rate = math.max(tonumber(ARGV[4]), math.min(tonumber(ARGV[5]), rate))
+redis.call('HSET', KEYS[1], 'rate', tostring(rate))
+if tonumber(ARGV[2]) < 1 then
+    redis.call('HSET', KEYS[1], 'tokens', '0')
+end
+return tostring(rate)
+"""
+
+
+class TokenBucket(abc.ABC):
+    """
+    Token bucket with AIMD rate, blocked response halves the rate, success adds a step back
+
+    config e.g. {"rate": 5, "burst": 10, "min_rate": 0.5, "max_rate": 20,
+                 "decrease_factor": 0.5, "increase_step": 0.1, "max_wait": 60}
+    """
+
+    def __init__(self, config: Dict):
+        self.config = config
+
+    @abc.abstractmethod
+    def take(self, tokens: float = 1) -> float:
+        """take tokens, return seconds to wait before taking again, 0 means granted"""
+
+    @abc.abstractmethod
+    def adjust(self, factor: float, step: float) -> float:
+        """multiply rate by factor then add step, return the new rate"""
+
+    def acquire(self, tokens: float = 1) -> None:
+        """
+        Wait until tokens are granted, raise CrawlerRateLimited instead of waiting
+        over max_wait, the request is not sent then
+        """
+        start_time = time.time()
+        while True:
+            wait = self.take(tokens)
+            if wait <= 0:
+                metrics.observe("rate_limit.wait", time.time() - start_time)
+                return
+            if time.time() - start_time + wait > self.config["max_wait"]:
+                metrics.incr("rate_limit.give_up")
+                raise CrawlerRateLimited(
+                    "rate limiter wait over %s sec" % (self.config["max_wait"],)
+                )
+            time.sleep(wait)
+
+    async def async_acquire(self, tokens: float = 1) -> None:
+        """
+        Like acquire, other coroutines keep running while waiting
+        """
+        start_time = time.time()
+        while True:
+            wait = self.take(tokens)
+            if wait <= 0:
+                metrics.observe("rate_limit.wait", time.time() - start_time)
+                return
+            if time.time() - start_time + wait > self.config["max_wait"]:
+                metrics.incr("rate_limit.give_up")
+                raise CrawlerRateLimited(
+                    "rate limiter wait over %s sec" % (self.config["max_wait"],)
+                )
+            await asyncio.sleep(wait)
+
+    def report_block(self) -> None:
+        metrics.incr("rate_limit.block")
+        rate = self.adjust(self.config["decrease_factor"], 0)
+        logger.info("rate limiter back off, rate: %s/s", rate)
+
+    def report_success(self) -> None:
+        self.adjust(1, self.config["increase_step"])
+
+    def _clamp(self, rate: float) -> float:
+        return max(self.config["min_rate"], min(self.config["max_rate"], rate))
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    Bucket state lives in shared memory, shared by all processes forked from the main one
+    """
+
+    def take(self, tokens: float = 1) -> float:
+        burst = self.config["burst"]
+        with _SHARED_LOCK:
+            now = time.time()
+            if _SHARED_STATE[_TOKENS] < 0:
+                _SHARED_STATE[_TOKENS] = burst
+                _SHARED_STATE[_UPDATED_AT] = now
+                _SHARED_STATE[_RATE] = self._clamp(self.config["rate"])
+
+            rate = _SHARED_STATE[_RATE]
+            elapsed = max(0.0, now - _SHARED_STATE[_UPDATED_AT])
+            current = min(burst, _SHARED_STATE[_TOKENS] + elapsed * rate)
+            _SHARED_STATE[_UPDATED_AT] = now
+
+            if current >= tokens:
+                _SHARED_STATE[_TOKENS] = current - tokens
+                return 0
+            _SHARED_STATE[_TOKENS] = current
+            return (tokens - current) / rate
+
+    def adjust(self, factor: float, step: float) -> float:
+        with _SHARED_LOCK:
+            rate = _SHARED_STATE[_RATE] or self.config["rate"]
+            _SHARED_STATE[_RATE] = self._clamp(rate * factor + step)
+            if factor < 1:
+                # drop the burst too, blocked requests should not be followed by a burst
+                _SHARED_STATE[_TOKENS] = 0
+            return _SHARED_STATE[_RATE]
+
+
+class RedisTokenBucket(TokenBucket):
+    """
+    Bucket state lives in redis, shared by every pod using the same redis db
+    """
+
+    def __init__(self, config: Dict):
+        super().__init__(config)
+        self.conn = get_redis_conn(ITUNES_CACHE_DB_NUMBER).conn
+        prefix = settings.CACHE["DB"][ITUNES_CACHE_DB_NUMBER]["PREFIX"]
+        self.key = f"{prefix}__itunes_rate_limit"
+        self._take_script = self.conn.register_script(_REDIS_TAKE_SCRIPT)
+        self._adjust_script = self.conn.register_script(_REDIS_ADJUST_SCRIPT)
+
+    def take(self, tokens: float = 1) -> float:
+        try:
+            return float(
+                self._take_script(
+                    keys=[self.key],
+                    args=[
+                        time.time(),
+                        self.config["burst"],
+                        self._clamp(self.config["rate"]),
+                        tokens,
+                    ],
+                )
+            )
+        except RedisError as exc:
+            # do not stop crawling because of limiter
+            logger.info("redis rate limiter error, %s", exc)
+            return 0
+
+    def adjust(self, factor: float, step: float) -> float:
+        try:
+            return float(
+                self._adjust_script(
+                    keys=[self.key],
+                    args=[
+                        self._clamp(self.config["rate"]),
+                        factor,
+                        step,
+                        self.config["min_rate"],
+                        self.config["max_rate"],
+                    ],
+                )
+            )
+        except RedisError as exc:
+            logger.info("redis rate limiter error, %s", exc)
+            return self.config["rate"]
+
+
+_BACKENDS = {"local": SharedTokenBucket, "redis": RedisTokenBucket}
+
+# one limiter per process, rebuilt when app_config rate_limit changes
+_LIMITER: Dict = {"pid": None, "config": None, "limiter": None}
+
+
+def get_rate_limiter() -> Optional[TokenBucket]:
+    """
+    Return limiter built from app_config rate_limit, None if disabled
+    """
+    config = execution.config.rate_limit
+    if not config.get("enabled", False):
+        return None
+    if _LIMITER["pid"] == os.getpid() and _LIMITER["config"] == config:
+        return _LIMITER["limiter"]
+
+    backend = _BACKENDS.get(config.get("backend", "local"))
+    if backend is None:
+        raise ValueError("unknown rate limit backend %s" % (config.get("backend"),))
+    limiter = backend(config)
+    _LIMITER.update({"pid": os.getpid(), "config": config, "limiter": limiter})
+    return limiter
@@ -12,9 +12,12 @@ from requests import HTTPError, RequestException
 from app.crawler.exceptions import (
     CrawlerBlockException,
     CrawlerNotFoundException,
+    CrawlerRateLimited,
     CrawlerUnavailable,
 )
 from app.crawler.header import create_common_header, get_random_header
+from app.crawler.rate_limiter import get_rate_limiter
+from app.crawler.stream_download import get_accept_encoding
 from log_helper.async_logger import get_async_logger
 
 logger = get_async_logger(__name__)
@@ -62,19 +65,25 @@ def get_random_adapters() -> List[type[requests.adapters.HTTPAdapter]]:
     return random.sample(adapter_list, len(adapter_list))
 
 
-def adapter_request(url: str) -> requests.Response:
+def adapter_request(url: str, stream: bool = False) -> requests.Response:
     """
     使用 adapter 存取 rss (注意這裡是 SSL ON 的)
+
+    stream: body is not read, see stream_download.iter_response_content
     """
     session_instance = requests.session()
     headers = get_random_header()
+    if stream:
+        headers["Accept-Encoding"] = get_accept_encoding()
     adapters = get_random_adapters()
 
     for adapter in adapters:
         try:
             logger.info("try %s, url: %s", type(adapter).__name__, url)
             session_instance.mount("https://", adapter())
-            return session_instance.get(url, headers=headers, verify=True)
+            return session_instance.get(
+                url, headers=headers, verify=True, stream=stream
+            )
 
         except HTTPError as exc:
             logger.info(
@@ -92,10 +101,13 @@ def adapter_request(url: str) -> requests.Response:
 
 def safe_request(url: str, retry=False, wait_interval: int = 30) -> requests.Response:
     """
-    Make a more safe request
+    Make a more safe request, every request waits for the shared rate limiter
     """
+    limiter = get_rate_limiter()
     try:
         headers = create_common_header()
+        if limiter is not None:
+            limiter.acquire()
         response = requests.get(url=url, headers=headers, verify=False)
 
         # do retry or not
@@ -107,6 +119,8 @@ def safe_request(url: str, retry=False, wait_interval: int = 30) -> requests.Res
                 url,
             )
             time.sleep(30)
+            if limiter is not None:
+                limiter.acquire()
             response = requests.get(url=url, headers=headers, verify=False)
             logger.info(
                 "requests has retried, http code: %s, url: %s",
@@ -122,16 +136,25 @@ def safe_request(url: str, retry=False, wait_interval: int = 30) -> requests.Res
             raise CrawlerNotFoundException()
 
         response.raise_for_status()
+        if limiter is not None:
+            limiter.report_success()
         return response
 
     except (CrawlerBlockException, ConnectionError) as exc:
         logger.info("requests blocked, %s", exc)
+        if limiter is not None:
+            limiter.report_block()
         raise CrawlerBlockException("Block error, %s" % (exc,)) from exc
 
     except CrawlerNotFoundException as exc:
         logger.info("requests not found, %s", exc)
         raise CrawlerNotFoundException("Not found error, %s" % (exc,)) from exc
 
+    except CrawlerRateLimited as exc:
+        # request is not sent, caller retries it later like other unavailable ones
+        logger.info("requests rate limited, url: %s, %s", url, exc)
+        raise
+
     except (Exception,) as exc:
         logger.critical("unexpected error, %s", traceback.format_exc(10))
         raise CrawlerUnavailable("Unavailable error, %s" % (exc,)) from exc
@@ -0,0 +1,166 @@
+"""
+Strip C0 control characters which make a feed not well-formed, before it is parsed
+
+feeds found dirty are remembered, the next run of the feed is cleaned with the encoding
+found last time without detecting it again
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+from collections import namedtuple
+from typing import Iterable, Iterator, Optional
+
+from app.common import metrics
+from config.constants import FEED_HINTS_PATH
+from log_helper.async_logger import get_async_logger
+
+logger = get_async_logger(__name__)
+
+# encoding is None for ascii compatible content, which is cleaned byte by byte
+FeedHint = namedtuple("FeedHint", ["sanitize", "encoding"])
+
+# C0 except \t, \n, \r, and DEL
+_C0_BYTES = bytes(range(0x00, 0x09)) + b"\x0b\x0c" + bytes(range(0x0E, 0x20)) + b"\x7f"
+_C0_TABLE = {char: None for char in _C0_BYTES}
+
+# encodings where a C0 byte can be part of a character
+_WIDE_ENCODING_MARKS = [
+    (b"\x00\x00\xfe\xff", "utf-32"),
+    (b"\xff\xfe\x00\x00", "utf-32"),
+    (b"\xfe\xff", "utf-16"),
+    (b"\xff\xfe", "utf-16"),
+    (b"\x00<\x00?", "utf-16-be"),
+    (b"<\x00?\x00", "utf-16-le"),
+]
+
+
+# bytes of the longest mark
+_WIDE_ENCODING_MARK_SIZE = 4
+
+
+def detect_wide_encoding(content: bytes) -> Optional[str]:
+    for mark, encoding in _WIDE_ENCODING_MARKS:
+        if content.startswith(mark):
+            return encoding
+    return None
+
+
+def strip_control_bytes(content: bytes, encoding: Optional[str] = None) -> bytes:
+    """
+    remove C0 characters, ascii compatible content (utf-8, big5, latin-1...) is
+    translated as bytes, only utf-16 / utf-32 content is decoded
+    """
+    if encoding is None:
+        return content.translate(None, _C0_BYTES)
+    try:
+        return content.decode(encoding).translate(_C0_TABLE).encode(encoding)
+    except (UnicodeError, LookupError) as exc:
+        logger.info("strip control characters failed, encoding: %s, %s", encoding, exc)
+        return content
+
+
+def create_hint_fp(key: str) -> str:
+    return os.path.join(
+        FEED_HINTS_PATH, f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json"
+    )
+
+
+def load_hint(key: str) -> Optional[FeedHint]:
+    fp = create_hint_fp(key)
+    if not os.path.exists(fp):
+        return None
+    try:
+        with open(fp, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        if data.get("key") != key:
+            return None
+        return FeedHint(data["sanitize"], data["encoding"])
+    except Exception as exc:
+        logger.info("load feed hint failed, key: %s, %s", key, exc)
+        return None
+
+
+def save_hint(key: str, hint: FeedHint) -> None:
+    """write to temp file then rename, like save_feed_validator"""
+    try:
+        fd, tmp_fp = tempfile.mkstemp(dir=FEED_HINTS_PATH, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump({"key": key, **hint._asdict()}, file)
+        os.replace(tmp_fp, create_hint_fp(key))
+    except Exception as exc:
+        logger.info("save feed hint failed, key: %s, %s", key, exc)
+
+
+def sanitize_feed_content(url: str, content: Optional[bytes]) -> Optional[bytes]:
+    """
+    content without C0 characters, hints are saved the first time a feed needs it
+    """
+    if not content:
+        return content
+
+    hint = load_hint(url)
+    if hint is not None and hint.sanitize:
+        metrics.incr("feed.sanitize_hinted")
+        return strip_control_bytes(content, hint.encoding)
+
+    encoding = detect_wide_encoding(content)
+    cleaned = strip_control_bytes(content, encoding)
+    if len(cleaned) == len(content):
+        return content
+
+    logger.info(
+        "control characters removed, url: %s, encoding: %s, bytes: %s",
+        url,
+        encoding,
+        len(content) - len(cleaned),
+    )
+    metrics.incr("feed.sanitized")
+    hint = FeedHint(sanitize=True, encoding=encoding)
+    save_hint(url, hint)
+    return cleaned
+
+
+def iter_sanitized_chunks(url: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Like sanitize_feed_content for a body read chunk by chunk, ascii compatible content
+    is cleaned chunk by chunk, utf-16 / utf-32 content is joined and cleaned at once
+    since a character may be split between chunks
+    """
+    chunks = iter(chunks)
+    try:
+        head = b""
+        for chunk in chunks:
+            head += chunk
+            if len(head) >= _WIDE_ENCODING_MARK_SIZE:
+                break
+        if not head:
+            return
+
+        hint = load_hint(url)
+        hinted = hint is not None and hint.sanitize
+        encoding = hint.encoding if hinted else detect_wide_encoding(head)
+        if encoding is not None:
+            yield sanitize_feed_content(url, b"".join(itertools.chain([head], chunks)))
+            return
+
+        if hinted:
+            metrics.incr("feed.sanitize_hinted")
+        removed = 0
+        for chunk in itertools.chain([head], chunks):
+            cleaned = chunk.translate(None, _C0_BYTES)
+            if not hinted and not removed and len(cleaned) != len(chunk):
+                # saved at once, reading may stop before the end
+                logger.info("control characters removed, url: %s", url)
+                metrics.incr("feed.sanitized")
+                save_hint(url, FeedHint(sanitize=True, encoding=None))
+            removed += len(chunk) - len(cleaned)
+            if cleaned:
+                yield cleaned
+    finally:
+        # e.g. iter_response_content closes its response
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,174 @@
+"""
+Feed download read chunk by chunk, with a size limit
+
+the body is decoded here instead of by requests / aiohttp, so a compressed feed is
+inflated a piece at a time and the download is aborted as soon as the decoded size
+goes over max_bytes
+
+    response = request_feed(url)  # stream=True
+    result = parse_feed_stream(iter_response_content(response, get_feed_max_bytes()))
+"""
+
+import zlib
+from typing import Iterable, Iterator, List, Optional
+
+import requests
+
+from app.crawler.exceptions import FeedException, FeedTooLargeException
+from config.loader import execution
+from log_helper.async_logger import get_async_logger
+
+try:
+    import brotli
+except ImportError:  # optional, br is not accepted without it
+    brotli = None
+
+logger = get_async_logger(__name__)
+
+DEFAULT_READ_SIZE = 64 * 1024
+
+
+def get_accept_encoding() -> str:
+    return "gzip, deflate, br" if brotli is not None else "gzip, deflate"
+
+
+def get_feed_max_bytes() -> int:
+    return int(execution.config.feed_max_bytes)
+
+
+def _is_zlib_header(data: bytes) -> bool:
+    # some servers send raw deflate for "deflate"
+    return len(data) >= 2 and data[0] & 0x0F == 8 and (data[0] << 8 | data[1]) % 31 == 0
+
+
+class ContentDecoder:
+    """
+    Incremental decoder of Content-Encoding, output is split in pieces of at most
+    read_size bytes so a small compressed chunk never inflates in one go
+    """
+
+    def __init__(
+        self, content_encoding: Optional[str], read_size: int = DEFAULT_READ_SIZE
+    ):
+        self.encoding = (content_encoding or "identity").strip().lower()
+        self.read_size = read_size
+        self._decompressor = None
+        if self.encoding in ["gzip", "x-gzip"]:
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self.encoding == "br" and brotli is not None:
+            self._decompressor = brotli.Decompressor()
+        elif self.encoding not in ["deflate", "identity", ""]:
+            raise FeedException("unsupported content encoding, %s" % (self.encoding,))
+
+    def decode(self, data: bytes) -> Iterator[bytes]:
+        if self.encoding == "deflate" and self._decompressor is None and data:
+            wbits = zlib.MAX_WBITS if _is_zlib_header(data) else -zlib.MAX_WBITS
+            self._decompressor = zlib.decompressobj(wbits)
+
+        if self._decompressor is None:
+            yield data
+        elif self.encoding == "br":
+            yield self._decompressor.process(data)
+        else:
+            yield from self._inflate(data)
+
+    def _inflate(self, data: bytes) -> Iterator[bytes]:
+        while data:
+            piece = self._decompressor.decompress(data, self.read_size)
+            data = self._decompressor.unconsumed_tail
+            if self._decompressor.eof and self._decompressor.unused_data:
+                # concatenated gzip members
+                data = self._decompressor.unused_data
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            if piece:
+                yield piece
+
+    def flush(self) -> bytes:
+        if self._decompressor is None or self.encoding == "br":
+            return b""
+        return self._decompressor.flush()
+
+
+def check_size(size: int, max_bytes: Optional[int]) -> None:
+    if max_bytes is not None and size > max_bytes:
+        raise FeedTooLargeException("feed is larger than %s bytes" % (max_bytes,))
+
+
+def check_content_length(headers, max_bytes: Optional[int]) -> None:
+    """abort before reading if the server tells the body is too large"""
+    try:
+        content_length = int(headers.get("Content-Length", 0))
+    except (TypeError, ValueError):
+        return
+    check_size(content_length, max_bytes)
+
+
+def iter_decoded_chunks(
+    raw_chunks: Iterable[bytes],
+    content_encoding: Optional[str],
+    max_bytes: Optional[int],
+    read_size: int = DEFAULT_READ_SIZE,
+) -> Iterator[bytes]:
+    """
+    Decoded body of raw_chunks, raise FeedTooLargeException once it is over max_bytes,
+    None means no limit
+    """
+    decoder = ContentDecoder(content_encoding, read_size)
+    size = 0
+    for raw_chunk in raw_chunks:
+        for chunk in decoder.decode(raw_chunk):
+            size += len(chunk)
+            check_size(size, max_bytes)
+            if chunk:
+                yield chunk
+    tail = decoder.flush()
+    if tail:
+        check_size(size + len(tail), max_bytes)
+        yield tail
+
+
+def iter_response_content(
+    response: requests.Response,
+    max_bytes: Optional[int] = None,
+    read_size: int = DEFAULT_READ_SIZE,
+) -> Iterator[bytes]:
+    """
+    Decoded body of a response requested with stream=True, closes the response at the end
+    """
+    try:
+        check_content_length(response.headers, max_bytes)
+        yield from iter_decoded_chunks(
+            response.raw.stream(read_size, decode_content=False),
+            response.headers.get("Content-Encoding"),
+            max_bytes,
+            read_size,
+        )
+    finally:
+        response.close()
+
+
+def read_response_content(
+    response: requests.Response, max_bytes: Optional[int] = None
+) -> bytes:
+    return b"".join(iter_response_content(response, max_bytes))
+
+
+async def async_read_response_content(
+    response, max_bytes: Optional[int] = None, read_size: int = DEFAULT_READ_SIZE
+) -> bytes:
+    """
+    Like read_response_content, for aiohttp response of a session with auto_decompress=False
+    """
+    check_content_length(response.headers, max_bytes)
+    decoder = ContentDecoder(response.headers.get("Content-Encoding"), read_size)
+    chunks: List[bytes] = []
+    size = 0
+    async for raw_chunk in response.content.iter_chunked(read_size):
+        for chunk in decoder.decode(raw_chunk):
+            size += len(chunk)
+            check_size(size, max_bytes)
+            chunks.append(chunk)
+    tail = decoder.flush()
+    check_size(size + len(tail), max_bytes)
+    chunks.append(tail)
+    return b"".join(chunks)
@@ -1,8 +1,9 @@
 import multiprocessing
 import os
+import threading
 import traceback
 from multiprocessing.pool import ThreadPool
-from typing import Any, Optional
+from typing import Any, List, Optional
 
 from app.crawler.exceptions import CrawlerUnavailable, FeedException
 from log_helper.async_logger import get_async_logger
@@ -10,12 +11,25 @@ from log_helper.async_logger import get_async_logger
 logger = get_async_logger(__name__)
 
 
+def _run_in_thread(func, args, threads: List[threading.Thread]) -> Any:
+    threads.append(threading.current_thread())
+    return func(*args)
+
+
 def abort_wrapper(func, *args, **kwargs) -> Optional[Any]:
+    """
+    Run func in a thread, give up waiting for it after timeout seconds
+
+    the thread is not stopped on timeout, every func of timeout_executes is called as
+    func(thread, *args) with it, e.g. to take shared resources away from it
+    """
     timeout = kwargs.get("timeout", None)
     finally_executes = kwargs.get("finally_executes", [])
+    timeout_executes = kwargs.get("timeout_executes", [])
 
     thread = ThreadPool(1)
-    res = thread.apply_async(func, args=args)
+    threads: List[threading.Thread] = []
+    res = thread.apply_async(_run_in_thread, args=(func, args, threads))
     out = None
     try:
         out = res.get(timeout)  # Wait timeout seconds for func to complete.
@@ -38,6 +52,10 @@ def abort_wrapper(func, *args, **kwargs) -> Optional[Any]:
         logger.info(
             "aborting due to timeout, func: %s, pid: %s", func.__name__, os.getpid()
         )
+        for func_dict in timeout_executes:
+            arguments = func_dict.get("args", [])
+            for abandoned in threads:
+                func_dict.get("func")(abandoned, *arguments)
 
     except Exception as _:
         logger.error(
@@ -1,15 +1,24 @@
 import functools
 
+from app.common import metrics
 from core.db import connection
 
 
 def check_conn(func):
+    """
+    Reuse the connection of the process, it is replaced when it is broken, idle too long
+    or older than CONN_MAX_AGE, not while a transaction is open
+    """
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         try:
-            connection.close_if_unusable_or_obsolete()
-            return func(*args, **kwargs)
+            if not connection.in_atomic_block:
+                connection.close_if_unusable_or_obsolete()
+            with metrics.Timer(f"db.{func.__name__}"):
+                return func(*args, **kwargs)
         finally:
-            connection.close()
+            if not connection.in_atomic_block:
+                connection.close_if_unusable_or_obsolete()
 
     return wrapper
@@ -0,0 +1,282 @@
+"""
+Bloom filter of saved itunes episodes, (program_id, i_ep_id) of products_itunes_episode
+
+an entry not in the filter is surely not saved, so the database is only asked about
+entries which may be, e.g. nothing is queried for a new program
+
+the bits live in shared memory created before the create pool / pipeline forks, workers
+read them without lock and add the episodes they insert, the filter is saved with the
+largest products_itunes_episode id read, the next run reads rows after it and rows of
+rescan_window ids below it, ids are taken before commit, so a row with a smaller id may
+be committed after the scan
+
+    prepare_episode_filter()  # before forking
+    known = KnownEpisodes(collection_id, get_episode_filter())
+    if data_uri in known:
+        ...
+"""
+
+import ctypes
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import tempfile
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from app.common import metrics
+from app.db.operations import get_itunes_episode_uris, scan_itunes_episode_keys
+from config.constants import EPISODE_FILTER_PATH
+from config.loader import execution
+from log_helper.async_logger import get_async_logger
+
+logger = get_async_logger(__name__)
+
+EPISODE_FILTER_BITS_FP = os.path.join(EPISODE_FILTER_PATH, "bloom.bin")
+EPISODE_FILTER_META_FP = os.path.join(EPISODE_FILTER_PATH, "bloom.json")
+
+
+def create_episode_key(collection_id: Union[str, int], data_uri: str) -> str:
+    return f"{collection_id}\t{data_uri}"
+
+
+class BloomFilter:
+    """
+    size bits and hashes positions per key, the bits are shared with forked processes,
+    add is locked, reading is not
+    """
+
+    def __init__(self, size: int, hashes: int):
+        self.size = size
+        self.hashes = hashes
+        self._array = multiprocessing.RawArray(ctypes.c_ubyte, (size + 7) // 8)
+        self._bits = memoryview(self._array).cast("B")
+        self._lock = multiprocessing.Lock()
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float) -> "BloomFilter":
+        size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        hashes = max(1, round(size / capacity * math.log(2)))
+        return cls(size, hashes)
+
+    def _positions(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + num * second) % self.size for num in range(self.hashes)]
+
+    def _set(self, key: str) -> None:
+        bits = self._bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def add(self, key: str) -> None:
+        with self._lock:
+            self._set(key)
+
+    def add_many(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._set(key)
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+    def dump(self, file) -> None:
+        file.write(self._bits)
+
+    def load(self, file) -> None:
+        if file.readinto(self._bits) != self.nbytes:
+            raise ValueError("bloom filter file is truncated")
+
+
+class EpisodeFilter:
+    """
+    BloomFilter of create_episode_key, watermark is the largest products_itunes_episode id added
+
+    rescan_window: ids below watermark read again by catch_up
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        error_rate: float,
+        watermark: int = 0,
+        rescan_window: int = 0,
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.watermark = watermark
+        self.rescan_window = rescan_window
+        self.count = 0
+        self.bloom = BloomFilter.for_capacity(capacity, error_rate)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.bloom
+
+    def add_rows(self, rows: List[Tuple]) -> None:
+        """rows of scan_itunes_episode_keys, rows read again are not counted"""
+        self.bloom.add_many(
+            create_episode_key(program_id, i_ep_id) for _, program_id, i_ep_id in rows
+        )
+        self.count += sum(1 for row_id, _, _ in rows if row_id > self.watermark)
+
+    def add_episodes(
+        self, collection_id: Union[str, int], data_uris: List[str]
+    ) -> None:
+        self.bloom.add_many(
+            create_episode_key(collection_id, data_uri) for data_uri in data_uris
+        )
+
+    def catch_up(self) -> None:
+        """add rows saved after watermark, and rows committed late within rescan_window"""
+        start_id = max(0, self.watermark - self.rescan_window)
+        self.watermark = max(
+            self.watermark, scan_itunes_episode_keys(start_id, self.add_rows)
+        )
+        if self.count > self.capacity:
+            logger.info(
+                "episode filter is over capacity, count: %s, capacity: %s",
+                self.count,
+                self.capacity,
+            )
+
+    def get_meta(self) -> Dict:
+        return {
+            "capacity": self.capacity,
+            "error_rate": self.error_rate,
+            "size": self.bloom.size,
+            "hashes": self.bloom.hashes,
+            "watermark": self.watermark,
+            "count": self.count,
+        }
+
+
+def load_episode_filter(
+    capacity: int, error_rate: float, rescan_window: int = 0
+) -> Optional[EpisodeFilter]:
+    """
+    None if there is no saved filter or it was made with another capacity / error_rate
+    """
+    if not os.path.exists(EPISODE_FILTER_META_FP):
+        return None
+    try:
+        with open(EPISODE_FILTER_META_FP, "r", encoding="utf-8") as file:
+            meta = json.load(file)
+        if meta["capacity"] != capacity or meta["error_rate"] != error_rate:
+            logger.info("episode filter config changed, rebuild it, %s", meta)
+            return None
+
+        episode_filter = EpisodeFilter(
+            capacity, error_rate, meta["watermark"], rescan_window
+        )
+        if (episode_filter.bloom.size, episode_filter.bloom.hashes) != (
+            meta["size"],
+            meta["hashes"],
+        ):
+            return None
+        with open(EPISODE_FILTER_BITS_FP, "rb") as file:
+            episode_filter.bloom.load(file)
+        episode_filter.count = meta["count"]
+        return episode_filter
+
+    except Exception as exc:
+        logger.info("load episode filter failed, rebuild it, %s", exc)
+        return None
+
+
+def save_episode_filter(episode_filter: EpisodeFilter) -> None:
+    """bits first then meta, each written to temp file then renamed"""
+    try:
+        fd, tmp_fp = tempfile.mkstemp(dir=EPISODE_FILTER_PATH, suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            episode_filter.bloom.dump(file)
+        os.replace(tmp_fp, EPISODE_FILTER_BITS_FP)
+
+        fd, tmp_fp = tempfile.mkstemp(dir=EPISODE_FILTER_PATH, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump(episode_filter.get_meta(), file)
+        os.replace(tmp_fp, EPISODE_FILTER_META_FP)
+    except Exception as exc:
+        logger.info("save episode filter failed, %s", exc)
+
+
+_FILTER: Dict[str, Optional[EpisodeFilter]] = {"filter": None}
+
+
+@metrics.timed("db.prepare_episode_filter")
+def prepare_episode_filter() -> Optional[EpisodeFilter]:
+    """
+    Load the saved filter and add rows saved since, or build it, by app_config episode_filter,
+    call it before forking the processes which use get_episode_filter
+    """
+    config = execution.config.episode_filter
+    if not config["enabled"]:
+        _FILTER["filter"] = None
+        return None
+
+    capacity, error_rate = int(config["capacity"]), float(config["error_rate"])
+    rescan_window = int(config["rescan_window"])
+    episode_filter = load_episode_filter(capacity, error_rate, rescan_window)
+    if episode_filter is None:
+        episode_filter = EpisodeFilter(
+            capacity, error_rate, rescan_window=rescan_window
+        )
+
+    try:
+        episode_filter.catch_up()
+    except Exception as exc:
+        # a filter missing rows would skip saved episodes, so it is not used
+        logger.error("episode filter catch up failed, %s", exc)
+        _FILTER["filter"] = None
+        return None
+
+    logger.info("episode filter ready, %s", episode_filter.get_meta())
+    save_episode_filter(episode_filter)
+    _FILTER["filter"] = episode_filter
+    return episode_filter
+
+
+def get_episode_filter() -> Optional[EpisodeFilter]:
+    return _FILTER["filter"]
+
+
+def add_saved_episodes(collection_id: Union[str, int], data_uris: List[str]) -> None:
+    episode_filter = get_episode_filter()
+    if episode_filter is not None:
+        episode_filter.add_episodes(collection_id, data_uris)
+
+
+class KnownEpisodes:
+    """
+    i_ep_id saved for a collection, the saved ones are only queried when episode filter
+    tells an entry may be saved
+    """
+
+    def __init__(
+        self, collection_id: Union[str, int], episode_filter: Optional[EpisodeFilter]
+    ):
+        self.collection_id = collection_id
+        self.episode_filter = episode_filter
+        self._uris: Optional[Set[str]] = None
+
+    def __contains__(self, data_uri: str) -> bool:
+        if (
+            self.episode_filter is not None
+            and create_episode_key(self.collection_id, data_uri)
+            not in self.episode_filter
+        ):
+            metrics.incr("episode_filter.negative")
+            return False
+        if self._uris is None:
+            self._uris = get_itunes_episode_uris(collection_id=self.collection_id)
+        return data_uri in self._uris
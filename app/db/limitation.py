@@ -1,7 +1,9 @@
 import functools
 import os
 import time
+import timeit
 
+from app.common import metrics
 from config.loader import execution
 from core.common.type_checker import is_processing_proxy
 from core.decorators.asyncio import async_safety
@@ -55,6 +57,27 @@ def sql_lock_v2(unit: int):
         return decorator
 
 
+def get_sql_lock_unit(func_name: str) -> int:
+    """count added by a call of func_name, sleep when the count is over sql_lock_limit"""
+    config = getattr(execution, "config")
+    if func_name.startswith("insert"):
+        return config.sql_lock_insert_count
+    if func_name.startswith("update"):
+        return config.sql_lock_update_count
+    if func_name.startswith("remove"):
+        # adjust to 18, because removing seems cost more db resources
+        return config.sql_lock_remove_count
+    return 0
+
+
+# set by app.db.writer, every sql_lock function it handles is sent to the writer processes
+_WRITE_SERVICE = {"service": None}
+
+
+def set_write_service(service) -> None:
+    _WRITE_SERVICE["service"] = service
+
+
 def sql_lock(func):
     @functools.wraps(func)
     def wrap(*args, **kwargs):
@@ -66,30 +89,21 @@ def sql_lock(func):
         if sleep_dict is None:
             raise TypeError("missing 1 required positional argument: 'sleep_dict'")
 
+        service = _WRITE_SERVICE["service"]
+        if service is not None and service.handles(func.__name__):
+            # the writer paces the database by itself, lock is not needed
+            return service.call(func.__name__, args, kwargs)
+
         try:
+            start_time = timeit.default_timer()
             lock.acquire()
+            metrics.observe("lock.sql_wait", timeit.default_timer() - start_time)
 
             logger.debug("%s locked, %s", os.getpid(), func.__name__)
 
-            sql_lock_insert_count = getattr(execution, "config").sql_lock_insert_count
-            sql_lock_update_count = getattr(execution, "config").sql_lock_update_count
-            sql_lock_remove_count = getattr(execution, "config").sql_lock_remove_count
-
-            if str(func.__name__).startswith("insert"):
-                sleep_dict.update(
-                    {"count": sleep_dict.get("count", 0) + sql_lock_insert_count}
-                )
-
-            if str(func.__name__).startswith("update"):
-                sleep_dict.update(
-                    {"count": sleep_dict.get("count", 0) + sql_lock_update_count}
-                )
-
-            if str(func.__name__).startswith("remove"):
-                # adjust to 18, because removing seems cost more db resources
-                sleep_dict.update(
-                    {"count": sleep_dict.get("count", 0) + sql_lock_remove_count}
-                )
+            unit = get_sql_lock_unit(func.__name__)
+            if unit:
+                sleep_dict.update({"count": sleep_dict.get("count", 0) + unit})
 
             return func(*args, **kwargs)
 
@@ -105,7 +119,8 @@ def sql_lock(func):
                     func.__name__,
                 )
 
-                time.sleep(sql_lock_sleep_time)
+                with metrics.Timer("lock.sql_sleep"):
+                    time.sleep(sql_lock_sleep_time)
                 sleep_dict.update({"count": 0})
 
             lock.release()
@@ -1,7 +1,9 @@
+import io
 import json
 import traceback
 import uuid
 from datetime import datetime
+from typing import Callable, Dict, List, Set, Tuple
 
 import psycopg2
 from psycopg2.extras import execute_values
@@ -13,6 +15,7 @@ from app.db.formatter import program_rss_data_formatter
 from app.db.limitation import sql_lock
 from app.db.utils import get_random_string
 from config.constants import DJANGO_CACHE_DB_NUMBER, ITUNES_GENRE_CACHE_TIMEOUT
+from config.loader import execution
 from core.cache.deco import apply_cache
 from core.db import connection, transaction
 from log_helper.async_logger import get_async_logger
@@ -377,6 +380,182 @@ def insert_episode(
         raise DatabaseInsertError(e)
 
 
+def _to_copy_field(value) -> str:
+    # unquoted empty field is NULL in csv COPY, quoted empty field is ""
+    if value is None:
+        return ""
+    return '"%s"' % (str(value).replace('"', '""'),)
+
+
+def _copy_rows(cursor, table: str, columns: List[str], rows: List[Tuple]) -> None:
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(",".join(_to_copy_field(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    query = 'COPY "%s" (%s) FROM STDIN WITH (FORMAT csv)' % (
+        table,
+        ", ".join(f'"{column}"' for column in columns),
+    )
+    cursor.copy_expert(query, buffer)
+
+
+def _insert_episode_rows_by_values(cursor, rows: List[Tuple], page_size: int) -> List:
+    query = """
+        INSERT INTO "products_episode" ("title", "description", "img_url", "data_uri", "duration", "program_id", "release_date", "release_status", "created", "modified", "origin", "message_count", "reviewed_user_id")
+        SELECT v.title, v.description, v.img_url, v.data_uri, v.duration, v.program_id, v.release_date, 'immediate', v.created, v.created, 'itunes', 0, -1
+        FROM (VALUES %s) AS v ("ordinal", "title", "description", "img_url", "data_uri", "duration", "program_id", "release_date", "created")
+        ORDER BY v.ordinal
+        RETURNING "products_episode"."id"
+    """
+    template = "(%s, %s::text, %s::text, %s::text, %s::text, %s::varchar, %s::integer, %s::timestamptz, %s::timestamptz)"
+
+    result = execute_values(
+        cur=cursor,
+        sql=query,
+        argslist=[(ordinal, *row) for ordinal, row in enumerate(rows)],
+        template=template,
+        page_size=page_size,
+        fetch=True,
+    )
+    # ids come from the sequence in ordinal order, RETURNING itself is not ordered
+    return sorted(episode_id for episode_id, in result)
+
+
+def _insert_episode_rows_by_copy(cursor, rows: List[Tuple]) -> List:
+    # COPY returns nothing, so ids are taken from the sequence first
+    cursor.execute(
+        """
+        SELECT nextval(pg_get_serial_sequence('"products_episode"', 'id'))
+        FROM generate_series(1, %s)
+        """,
+        (len(rows),),
+    )
+    episode_ids = sorted(episode_id for episode_id, in cursor.fetchall())
+    _copy_rows(
+        cursor,
+        "products_episode",
+        [
+            "id",
+            "title",
+            "description",
+            "img_url",
+            "data_uri",
+            "duration",
+            "program_id",
+            "release_date",
+            "release_status",
+            "created",
+            "modified",
+            "origin",
+            "message_count",
+            "reviewed_user_id",
+        ],
+        [
+            (episode_id, *row[:7], "immediate", row[7], row[7], "itunes", 0, -1)
+            for episode_id, row in zip(episode_ids, rows)
+        ],
+    )
+    return episode_ids
+
+
+@sql_lock
+@check_conn
+def insert_episodes(program_id, i_program_id, episodes: List[Dict]) -> List:
+    """
+    Insert episodes of a program in one transaction, return episode ids in the order of episodes
+
+    episodes: dicts with the arguments of insert_episode, title, description, data_uri, duration,
+    release_date, tags and img_url, batches of app_config bulk_insert copy_threshold or more
+    episodes are written by COPY
+    """
+    if not episodes:
+        return []
+
+    bulk_insert_config = execution.config.bulk_insert
+    now = datetime.now()
+    rows = [
+        (
+            episode["title"],
+            episode["description"],
+            episode["img_url"],
+            episode["data_uri"],
+            episode["duration"],
+            program_id,
+            episode["release_date"],
+            now,
+        )
+        for episode in episodes
+    ]
+    use_copy = 0 < bulk_insert_config["copy_threshold"] <= len(rows)
+
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                if use_copy:
+                    episode_ids = _insert_episode_rows_by_copy(cursor, rows)
+                else:
+                    episode_ids = _insert_episode_rows_by_values(
+                        cursor, rows, bulk_insert_config["page_size"]
+                    )
+                if len(episode_ids) != len(rows):
+                    raise DatabaseInsertError(
+                        "Insert episodes failed, %s of %s inserted"
+                        % (len(episode_ids), len(rows))
+                    )
+
+                # tag id is (id,) as returned by insert_tag
+                episode_tag_rows = [
+                    (episode_id, tag[0] if isinstance(tag, (tuple, list)) else tag)
+                    for episode_id, episode in zip(episode_ids, episodes)
+                    for tag in episode["tags"]
+                ]
+                itunes_episode_rows = [
+                    (episode["data_uri"], episode_id, i_program_id)
+                    for episode_id, episode in zip(episode_ids, episodes)
+                ]
+
+                if use_copy:
+                    _copy_rows(
+                        cursor,
+                        "products_episode_tags",
+                        ["episode_id", "tag_id"],
+                        episode_tag_rows,
+                    )
+                    _copy_rows(
+                        cursor,
+                        "products_itunes_episode",
+                        ["i_ep_id", "ep_id", "program_id"],
+                        itunes_episode_rows,
+                    )
+                else:
+                    if episode_tag_rows:
+                        execute_values(
+                            cur=cursor,
+                            sql='INSERT INTO "products_episode_tags" ("episode_id", "tag_id") VALUES %s',
+                            argslist=episode_tag_rows,
+                            page_size=bulk_insert_config["page_size"],
+                        )
+                    execute_values(
+                        cur=cursor,
+                        sql='INSERT INTO "products_itunes_episode" ("i_ep_id", "ep_id", "program_id") VALUES %s',
+                        argslist=itunes_episode_rows,
+                        page_size=bulk_insert_config["page_size"],
+                    )
+                logger.debug(
+                    "insert_episodes: %s episodes, %s tags, copy: %s",
+                    len(episode_ids),
+                    len(episode_tag_rows),
+                    use_copy,
+                )
+
+        return episode_ids
+
+    except (Exception, psycopg2.DatabaseError) as e:
+        logger.error("unexpected db error, %s", traceback.format_exc())
+        raise DatabaseInsertError(e)
+
+
 @check_conn
 def get_itunes_episode(data_uri, collection_id):
     query = """
@@ -407,6 +586,55 @@ def get_itunes_episode(data_uri, collection_id):
             return None
 
 
+@check_conn
+def get_itunes_episode_uris(collection_id) -> Set[str]:
+    """
+    i_ep_id of every immediate episode of collection, see get_itunes_episode
+    """
+    query = """
+        SELECT "products_itunes_episode"."i_ep_id"
+        FROM "products_itunes_episode"
+        INNER JOIN "products_episode" ON "products_episode"."id"="products_itunes_episode"."ep_id"
+        WHERE "products_itunes_episode"."program_id"=%s
+        AND "products_episode"."release_status"='immediate'
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(query, (collection_id,))
+        logger.debug("get_itunes_episode_uris: %s", cursor.query)
+
+        return {i_ep_id for i_ep_id, in cursor.fetchall()}
+
+
+@check_conn
+def scan_itunes_episode_keys(
+    greater_id: int, handle_rows: Callable[[List[Tuple]], None], itersize: int = 10000
+) -> int:
+    """
+    Pass (id, program_id, i_ep_id) rows with id greater than greater_id to handle_rows,
+    itersize rows at a time by a server side cursor, return the largest id
+    """
+    query = """
+        SELECT "products_itunes_episode"."id", "products_itunes_episode"."program_id", "products_itunes_episode"."i_ep_id"
+        FROM "products_itunes_episode"
+        WHERE "products_itunes_episode"."id" > %s
+        ORDER BY "products_itunes_episode"."id"
+    """
+
+    max_id = greater_id
+    with transaction.atomic():
+        with connection.chunked_cursor("scan_itunes_episode_keys") as cursor:
+            cursor.execute(query, (greater_id,))
+            while True:
+                rows = cursor.fetchmany(itersize)
+                if not rows:
+                    break
+                handle_rows(rows)
+                max_id = rows[-1][0]
+
+    return max_id
+
+
 @sql_lock
 @check_conn
 def insert_count_entries(collection_id, program_id, producer_id, episode_count):
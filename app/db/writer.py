@@ -0,0 +1,247 @@
+"""
+Database writes in dedicated writer processes
+
+while the service runs, every sql_lock function of WRITE_COMMANDS is sent to the writer
+processes instead of running under the shared lock, the caller waits for the result of
+its own command only, writers run the commands queued together in one transaction,
+one savepoint per command, and pace the database like sql_lock does
+
+    service = start_writer_service(workers=1, batch_size=50, manager=manager)
+    pool = Pool(processes=process_num)  # forked after the service, so it is inherited
+    ...
+    stop_writer_service()
+"""
+
+import inspect
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+from collections import namedtuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.common import metrics
+from app.common.exceptions import DatabaseInsertError, DatabaseWriteTimeoutError
+from app.db import operations
+from app.db.limitation import get_sql_lock_unit, set_write_service
+from config.loader import execution
+from core.db import connection, transaction
+from log_helper.async_logger import get_async_logger
+
+logger = get_async_logger(__name__)
+
+# name -> operation without sql_lock / check_conn, the writer holds the connection itself
+WRITE_COMMANDS: Dict[str, Callable] = {
+    func.__name__: inspect.unwrap(func)
+    for func in [
+        operations.insert_rank_data,
+        operations.insert_producer,
+        operations.insert_program,
+        operations.insert_tag,
+        operations.insert_episode,
+        operations.insert_episodes,
+        operations.insert_count_entries,
+        operations.update_program_latest,
+        operations.insert_itunes_program_itunes_genres,
+        operations.insert_itunes_genre,
+        operations.update_program_itunes_internal_category,
+        operations.update_program_recovery,
+    ]
+}
+
+WriteCommand = namedtuple("WriteCommand", ["id", "name", "args", "kwargs", "reply"])
+
+# value is the result of the command, or the exception it raised if ok is False
+WriteResult = namedtuple("WriteResult", ["id", "ok", "value"])
+
+# sentinel for stopping writer, must survive pickling through queue
+_STOP = None
+
+
+def _to_picklable_exception(exc: Exception) -> Exception:
+    # database errors may hold objects which can not be sent back
+    try:
+        return exc.__class__(str(exc))
+    except Exception:
+        return DatabaseInsertError(str(exc))
+
+
+def run_batch(batch: List[WriteCommand]) -> List[WriteResult]:
+    """
+    Run commands in one transaction, a failed command only rolls back its savepoint
+    """
+    connection.close_if_unusable_or_obsolete()
+    results = []
+    try:
+        with transaction.atomic():
+            for command in batch:
+                try:
+                    with transaction.atomic():
+                        value = WRITE_COMMANDS[command.name](
+                            *command.args, **command.kwargs
+                        )
+                    results.append(WriteResult(command.id, True, value))
+                except Exception as exc:
+                    logger.info("write command failed, %s, %s", command.name, exc)
+                    results.append(
+                        WriteResult(command.id, False, _to_picklable_exception(exc))
+                    )
+    except Exception as exc:
+        # nothing is saved if commit fails
+        logger.error("write batch failed, %s", traceback.format_exc(10))
+        error = DatabaseInsertError("write batch failed, %s" % (exc,))
+        results = [WriteResult(command.id, False, error) for command in batch]
+    finally:
+        connection.close_if_unusable_or_obsolete()
+    return results
+
+
+def _pace(count: int) -> int:
+    """sleep like sql_lock when count is over sql_lock_limit, return the count left"""
+    if count > execution.config.sql_lock_limit:
+        with metrics.Timer("writer.sleep"):
+            time.sleep(execution.config.sql_lock_sleep_time)
+        return 0
+    return count
+
+
+def _run_writer(commands: multiprocessing.Queue, batch_size: int) -> None:
+    logger.debug("writer start, pid: %s", os.getpid())
+    set_write_service(None)
+    count = 0
+    stop = False
+    while not stop:
+        command = commands.get()
+        if command is _STOP:
+            break
+        batch = [command]
+        while len(batch) < batch_size:
+            try:
+                command = commands.get_nowait()
+            except queue.Empty:
+                break
+            if command is _STOP:
+                stop = True
+                break
+            batch.append(command)
+
+        metrics.observe("writer.batch_size", len(batch))
+        with metrics.Timer("writer.batch"):
+            results = run_batch(batch)
+        for command, result in zip(batch, results):
+            command.reply.put(result)
+
+        count = _pace(count + sum(get_sql_lock_unit(c.name) for c in batch))
+    logger.debug("writer end, pid: %s", os.getpid())
+
+
+class WriterService:
+    """
+    Writer processes shared by every process forked after start()
+
+    workers: writer processes, each one holds its own connection
+    batch_size: commands at most in one transaction
+    manager: creates the reply queue of every calling thread
+    timeout: seconds to wait for the result of a command
+    """
+
+    def __init__(self, workers: int, batch_size: int, manager, timeout: float = 240):
+        if workers < 1:
+            raise ValueError("writer service require at least one worker")
+        self.workers = workers
+        self.batch_size = batch_size
+        self.manager = manager
+        self.timeout = timeout
+        self.commands = multiprocessing.Queue()
+        self.processes: List[multiprocessing.Process] = []
+        self._ids = itertools.count()
+        self._replies: Dict[Tuple[int, int], Any] = {}
+
+    def start(self) -> None:
+        for num in range(self.workers):
+            process = multiprocessing.Process(
+                target=_run_writer,
+                args=(self.commands, self.batch_size),
+                name=f"writer-{num}",
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+
+    def stop(self) -> None:
+        for _ in self.processes:
+            self.commands.put(_STOP)
+        for process in self.processes:
+            process.join()
+
+    def handles(self, name: str) -> bool:
+        return name in WRITE_COMMANDS
+
+    def _get_reply(self):
+        # one reply queue per thread, a thread waits for one command at a time
+        key = (os.getpid(), threading.get_ident())
+        reply = self._replies.get(key)
+        if reply is None:
+            reply = self.manager.Queue()
+            self._replies[key] = reply
+        return reply
+
+    def call(self, name: str, args: Tuple, kwargs: Dict) -> Any:
+        """
+        Run command name in a writer, return its result or raise its exception
+
+        raise DatabaseWriteTimeoutError if there is no result in timeout seconds, the
+        command may still run, it must not be retried as a failed one
+        """
+        command_id = (os.getpid(), next(self._ids))
+        reply = self._get_reply()
+        self.commands.put(WriteCommand(command_id, name, args, kwargs, reply))
+
+        with metrics.Timer("writer.wait"):
+            while True:
+                try:
+                    result = reply.get(timeout=self.timeout)
+                except queue.Empty as exc:
+                    metrics.incr("writer.timeout")
+                    raise DatabaseWriteTimeoutError(
+                        "write timeout, result unknown, command: %s" % (name,)
+                    ) from exc
+                # result of a command given up by timeout before
+                if result.id == command_id:
+                    break
+
+        if not result.ok:
+            raise result.value
+        return result.value
+
+
+_SERVICE: Dict[str, Optional[WriterService]] = {"service": None}
+
+
+def start_writer_service(
+    workers: int, batch_size: int, manager, timeout: float = 240
+) -> WriterService:
+    """
+    call it before forking the processes which write, sql_lock functions are sent to
+    the service from then on
+    """
+    service = WriterService(workers, batch_size, manager, timeout)
+    service.start()
+    _SERVICE["service"] = service
+    set_write_service(service)
+    return service
+
+
+def stop_writer_service() -> None:
+    service = _SERVICE["service"]
+    if service is not None:
+        set_write_service(None)
+        service.stop()
+        _SERVICE["service"] = None
+
+
+def get_writer_service() -> Optional[WriterService]:
+    return _SERVICE["service"]
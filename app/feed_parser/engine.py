@@ -0,0 +1,64 @@
+from typing import Optional
+
+import feedparser
+from feedparser import FeedParserDict
+
+from app.feed_parser.stream import XML_BACKENDS, parse_feed_stream
+from config.loader import execution
+from log_helper.async_logger import get_async_logger
+
+logger = get_async_logger(__name__)
+
+ENGINE_FEEDPARSER = "feedparser"
+ENGINE_ETREE = "etree"
+ENGINE_LXML = "lxml"
+
+ENGINES = [ENGINE_FEEDPARSER, ENGINE_ETREE, ENGINE_LXML]
+
+
+def get_feed_engine() -> str:
+    """
+    Return app_config feed_parser_engine, lxml falls back to etree if it is not installed
+    """
+    engine = execution.config.feed_parser_engine
+    if engine not in ENGINES:
+        raise ValueError("unknown feed parser engine %s" % (engine,))
+    if engine != ENGINE_FEEDPARSER and engine not in XML_BACKENDS:
+        logger.info("feed parser engine %s is not available, use etree", engine)
+        return ENGINE_ETREE
+    return engine
+
+
+def get_stream_backend() -> str:
+    """xml backend of streaming parse, feedparser engine can not stream"""
+    engine = get_feed_engine()
+    return ENGINE_ETREE if engine == ENGINE_FEEDPARSER else engine
+
+
+def parse_with_feedparser(content: bytes) -> FeedParserDict:
+    return feedparser.parse(
+        content,
+        response_headers={"content-type": "text/xml; charset=utf-8"},
+    )
+
+
+def parse_with_xml_backend(content: bytes, backend: str) -> FeedParserDict:
+    """
+    Extract only the fields read by helper getters, feedparser is used if content is
+    not well-formed rss
+    """
+    # whole content in one chunk, entries are all kept anyway
+    result = parse_feed_stream(content, max(len(content), 1), backend)
+    parser = result["entries"]
+    result["entries"] = list(parser)
+    # fallback may happen after the first entry
+    result["bozo"] = parser.bozo
+    result["bozo_exception"] = parser.bozo_exception
+    return result
+
+
+def parse_feed(content: bytes, engine: Optional[str] = None) -> FeedParserDict:
+    engine = engine or get_feed_engine()
+    if engine == ENGINE_FEEDPARSER:
+        return parse_with_feedparser(content)
+    return parse_with_xml_backend(content, engine)
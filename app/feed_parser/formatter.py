@@ -1,12 +1,12 @@
 import datetime
 import re
 from html import unescape
+from typing import Iterator, List, Optional, Tuple
 
 from dateutil import parser
 from past.utils import old_div
 
 from app.common.exceptions import FormatterException
-from app.feed_parser.parser import CustomizedHTMLParser
 from core.common.string import to_utf8_string, trim_string
 from log_helper.async_logger import get_async_logger
 
@@ -46,52 +46,102 @@ def remove_html_tag_formatter(string: str) -> str:
         raise FormatterException("Format error, %s" % (exc,)) from exc
 
 
-def html_to_string_formatter(html_string: str) -> str:
-    """
-    處理 Entry Content 的 Value - 該 value 可能包含 encode 的 HTML, 故增加以下處理流程，將之轉為較乾淨 text
-    """
-    try:
-        if html_string is None:
-            raise TypeError("empty string")
-        if not isinstance(html_string, str):
-            raise TypeError("unsupported type")
-
-        # decode (如果有 encode 的 HTML，先 decode). 3.4＋ 參考： https://docs.python.org/zh-tw/3.8/library/html.html
-        value = unescape(html_string)
-        value = unescape(value)  # 多 decode 一次 - 如果原 data 有二次 encode 的話
+# script / style blocks and comments are dropped with their content, other tags alone
+_HTML_TOKEN_PATTERN = re.compile(
+    r"<(?P<block>script|style)\b.*?</(?P=block)\s*>"
+    r"|<!--.*?-->"
+    r"|</?(?P<tag>[a-zA-Z!?][^\s/>]*)[^>]*>"
+    r"|(?P<space>\s+)",
+    re.IGNORECASE | re.DOTALL,
+)
+
+# tags which break the text, so the words around them are not joined
+_TAG_SEPARATORS = {
+    "br": "\n",
+    "div": "\n",
+    "li": "\n",
+    "ul": "\n",
+    "ol": "\n",
+    "tr": "\n",
+    "h1": "\n",
+    "h2": "\n",
+    "h3": "\n",
+    "h4": "\n",
+    "h5": "\n",
+    "h6": "\n",
+    "blockquote": "\n",
+    "p": "\n\n",
+}
+
+
+def _iter_html_segments(value: str) -> Iterator[Tuple[str, Optional[str]]]:
+    """yield (text, separator after it), tags are skipped"""
+    position = 0
+    for match in _HTML_TOKEN_PATTERN.finditer(value):
+        space, tag = match.group("space"), match.group("tag")
+        if space:
+            separator = _whitespace_separator(space)
+        elif tag:
+            separator = _TAG_SEPARATORS.get(tag.lower())
+        else:
+            separator = None
+        yield value[position : match.start()], separator
+        position = match.end()
+    yield value[position:], None
 
-        # 透過 html.HTMLParser 的解析過程，擷取純文字的部分. 參考 python html document: https://docs.python.org/zh-tw/3.8/library/html.parser.html， 優勢 (1) 內建 (2) 處理不完整 tag 也沒什麼問題
-        html_parser_instance = CustomizedHTMLParser()
-        html_parser_instance.feed(value)
 
-        if not hasattr(html_parser_instance, "text"):
-            # 沒有 .text property -> 有問題， raise exception
-            raise FormatterException(
-                "formatter failure - lose text, %s",
-                CustomizedHTMLParser.__class__.__name__,
-            )
+def _whitespace_separator(whitespace: str) -> str:
+    """keep paragraphs and line breaks, any other whitespace becomes one space"""
+    newline_count = whitespace.count("\n")
+    if newline_count > 1:
+        return "\n\n"
+    return "\n" if newline_count else " "
 
-        text = html_parser_instance.text
 
-        # # 需要時請自行打開註解，以觀察第一次 HTML 清除效果
-        # print(' 第一次解析: ', html_parser_instance.text)
+def html_to_text(html_string: str, max_length: int = 0) -> str:
+    """
+    處理 description / content 的 HTML, 一次掃描完成 unescape, 移除 tag (含 script, style 內容), 合併空白
 
-        # 再處理一次 - 如果有殘留 html tag 的話 (目前除了 script, style 的內容外，其他的 children)
-        # TODO: might use while loop, use re to filter <tag>
-        html_parser_instance.reset()
-        html_parser_instance.feed(text)
+    br, p, div, li 等區塊 tag 換成換行, 避免前後文字黏在一起
+    max_length: 最多保留的字數, 0 表示不限制, 達到後即停止掃描
+    """
+    if html_string is None:
+        raise TypeError("empty string")
+    if not isinstance(html_string, str):
+        raise TypeError("unsupported type")
 
-        if not hasattr(html_parser_instance, "text"):
-            # 沒有 .text property -> 有問題， raise exception
-            raise FormatterException(
-                "formatter failure again - lose text, %s",
-                CustomizedHTMLParser.__class__.__name__,
-            )
+    value = html_string
+    if "&" in value:
+        # 多 decode 一次 - 如果原 data 有二次 encode 的話
+        value = unescape(unescape(value))
+
+    parts: List[str] = []
+    length = 0
+    separator = ""
+    for text, new_separator in _iter_html_segments(value):
+        if text:
+            # separator only between text, leading / trailing whitespace is dropped
+            if separator and parts:
+                parts.append(separator)
+                length += len(separator)
+            separator = ""
+            parts.append(text)
+            length += len(text)
+            if max_length and length >= max_length:
+                break
+        if new_separator and len(new_separator) > len(separator):
+            separator = new_separator
+
+    result = "".join(parts)
+    return result[:max_length] if max_length else result
 
-        # # 需要時請自行打開註解，以觀察第一次、第二次的 HTML 清除效果
-        # print(' 第二次解析: ', html_parser_instance.text)
 
-        return html_parser_instance.text
+def html_to_string_formatter(html_string: str) -> str:
+    """
+    處理 Entry Content 的 Value - 該 value 可能包含 encode 的 HTML, 轉為較乾淨 text, 見 html_to_text
+    """
+    try:
+        return html_to_text(html_string)
 
     except (FormatterException, TypeError) as exc:
         logger.debug("format error, %s", exc)
@@ -149,40 +199,36 @@ def fix_week_alias_datetime_formatter(dt_string: str) -> str:
     return basic_datetime_formatter(new_dt_string)
 
 
+_HHMMSS_PATTERN = re.compile(r"(^\d{1,2}:\d{1,2}:\d{1,2}$)")
+_MMSS_PATTERN = re.compile(r"(^\d{1,2}:\d{1,2}$)")
+_MMMSS_PATTERN = re.compile(r"(^\d{1,3}:\d{1,2}$)")
+_HHMMSSMS_PATTERN = re.compile(r"^\d{1,2}:\d{1,2}:\d{1,2}:\d{1,2}$")
+_HHMMSS_DOT_MS_PATTERN = re.compile(r"^\d{1,2}:\d{1,2}:\d{1,2}.\d{1,2}$")
+_FLOAT_STRING_PATTERN = re.compile(r"^\d+\.\d+$")
+
+
 def is_hhmmss_format(string: str) -> bool:
-    if re.match(pattern=r"(^\d{1,2}:\d{1,2}:\d{1,2}$)", string=string):
-        return True
-    return False
+    return _HHMMSS_PATTERN.match(string) is not None
 
 
 def is_mmss_format(string: str) -> bool:
-    if re.match(pattern=r"(^\d{1,2}:\d{1,2}$)", string=string):
-        return True
-    return False
+    return _MMSS_PATTERN.match(string) is not None
 
 
 def is_mmmss_format(string: str) -> bool:
-    if re.match(pattern=r"(^\d{1,3}:\d{1,2}$)", string=string):
-        return True
-    return False
+    return _MMMSS_PATTERN.match(string) is not None
 
 
 def is_hhmmssms_format(string: str) -> bool:
-    if re.match(pattern=r"^\d{1,2}:\d{1,2}:\d{1,2}:\d{1,2}$", string=string):
-        return True
-    return False
+    return _HHMMSSMS_PATTERN.match(string) is not None
 
 
 def is_hhmmss_dot_ms_format(string: str) -> bool:
-    if re.match(pattern=r"^\d{1,2}:\d{1,2}:\d{1,2}.\d{1,2}$", string=string):
-        return True
-    return False
+    return _HHMMSS_DOT_MS_PATTERN.match(string) is not None
 
 
 def is_float_string_format(string: str) -> bool:
-    if re.match(pattern=r"^\d+\.\d+$", string=string):
-        return True
-    return False
+    return _FLOAT_STRING_PATTERN.match(string) is not None
 
 
 def duration_formatter(duration_string: str) -> str:
@@ -1,15 +1,9 @@
-from typing import Any, Callable, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 from feedparser import FeedParserDict
 
-from app.common.collection import (
-    apply_method_with_list_to_get_all_result,
-    apply_methods_to_get_all_result,
-    apply_methods_to_get_first_match_result,
-    find_item_with_key,
-)
+from app.common.collection import find_item_with_key
 from app.common.exceptions import (
-    FeedResultException,
     FeedResultFieldNotFoundError,
     FeedResultTypeError,
     FormatterException,
@@ -30,16 +24,9 @@ from app.feed_parser.field_method import (
     fetch_tags_method,
     fetch_term_method,
 )
-from app.feed_parser.formatter import (
-    basic_datetime_formatter,
-    duration_formatter,
-    fix_short_month_datetime_formatter,
-    fix_week_alias_datetime_formatter,
-    has_string,
-    html_to_string_formatter,
-    remove_html_tag_formatter,
-    string_formatter,
-)
+from app.feed_parser.formatter import has_string, html_to_text, string_formatter
+from app.feed_parser.normalizer import normalize_duration, normalize_release_date
+from config.loader import execution
 from core.common.string import (
     is_audio_url,
     is_email,
@@ -48,24 +35,87 @@ from core.common.string import (
     try_fixing_url,
 )
 from log_helper.async_logger import get_async_logger
-from log_helper.utils import dir_attrs
 
 logger = get_async_logger(__name__)
 
 
+class ExtractionPlan:
+    """
+    Remember which fetch method yielded each field of the previous entries of a feed
+
+    entries of a feed share one layout, so that method is tried first, the result is the
+    same as without a plan, a method of higher priority is only skipped when the entry
+    key it reads is absent
+
+    Usage:
+        plan = ExtractionPlan()
+        for entry in feed_entries:
+            description = get_feed_description_description(entry, plan=plan)
+    """
+
+    def __init__(self):
+        self.miss_count = 0
+        self._methods: Dict[str, Callable] = {}
+
+    def get_method(self, name: str) -> Optional[Callable]:
+        return self._methods.get(name)
+
+    def record(self, name: str, method: Callable) -> None:
+        """method yielded field name"""
+        self._methods[name] = method
+
+    def miss(self, name: str) -> None:
+        """planned method did not yield field name"""
+        self.miss_count += 1
+        self._methods.pop(name, None)
+
+
+def _is_absent(method: Callable, field: Dict) -> bool:
+    """True if method surely raises, the entry key it reads is absent"""
+    key = _METHOD_KEYS.get(method)
+    return key is not None and field.get(key) is None
+
+
+def _fetch_first_match(
+    name: str, possible_methods: List[Callable], plan: Optional[ExtractionPlan], *args
+) -> Optional[Any]:
+    """value of the first method which does not raise"""
+    field = args[0]
+    planned_method = plan.get_method(name) if plan is not None else None
+    if planned_method in possible_methods:
+        higher_methods = possible_methods[: possible_methods.index(planned_method)]
+        if all(_is_absent(method, field) for method in higher_methods):
+            try:
+                return planned_method(*args)
+            except Exception as exc:
+                logger.debug(
+                    "planned method miss, %s, %s", planned_method.__name__, exc
+                )
+        plan.miss(name)
+
+    for method in possible_methods:
+        if _is_absent(method, field):
+            continue
+        try:
+            value = method(*args)
+        except Exception as exc:
+            logger.debug("method throw error, method: %s, %s", method.__name__, exc)
+            continue
+        if plan is not None:
+            plan.record(name, method)
+        return value
+    return None
+
+
 def is_good_feed_dict(feed_dict: FeedParserDict) -> bool:
     if feed_dict is None:
         return False
     if not isinstance(feed_dict, FeedParserDict):
         raise TypeError(f"Incorrect type, feed_field: {type(feed_dict)}")
     if get_feed_field(feed_dict) is None:
-        raise FeedResultFieldNotFoundError(
-            f"Field feed not found, {dir_attrs(feed_dict)}"
-        )
+        raise FeedResultFieldNotFoundError("Field feed not found", payload=feed_dict)
     if get_feed_entries_field(feed_dict) is None:
-        raise FeedResultFieldNotFoundError(
-            f"Field entries not found, {dir_attrs(feed_dict)}"
-        )
+        raise FeedResultFieldNotFoundError("Field entries not found", payload=feed_dict)
     return True
 
 
@@ -86,36 +136,41 @@ def get_feed_img_url(feed_field: Dict) -> str:
 
 
 def _fetch_author_key_wrapper(
-    possible_methods: List[Callable], feed_dict: Dict, key: str
+    possible_methods: List[Callable],
+    feed_dict: Dict,
+    key: str,
+    plan: Optional[ExtractionPlan] = None,
 ) -> Any:
-    field = apply_methods_to_get_first_match_result(possible_methods, feed_dict, key)
+    field = _fetch_first_match(f"author_{key}", possible_methods, plan, feed_dict, key)
     if field is None:
-        raise FeedResultFieldNotFoundError(
-            f"Field {key} not found, {dir_attrs(feed_dict)}"
-        )
+        raise FeedResultFieldNotFoundError("Field %s not found", key, payload=feed_dict)
     return field
 
 
-def get_feed_author_name_field(feed_field: Dict) -> str:
+def get_feed_author_name_field(
+    feed_field: Dict, plan: Optional[ExtractionPlan] = None
+) -> str:
     possible_methods = [
         fetch_author_detail_key_method,
         fetch_authors_key_method,
         fetch_author_key_method,
     ]
-    name = _fetch_author_key_wrapper(possible_methods, feed_field, "name")
+    name = _fetch_author_key_wrapper(possible_methods, feed_field, "name", plan)
     return string_formatter(name)
 
 
-def get_feed_author_email_field(feed_field: Dict) -> str:
+def get_feed_author_email_field(
+    feed_field: Dict, plan: Optional[ExtractionPlan] = None
+) -> str:
     possible_methods = [
         fetch_author_detail_key_method,
         fetch_authors_key_method,
         fetch_author_key_method,
     ]
-    email = _fetch_author_key_wrapper(possible_methods, feed_field, "email")
+    email = _fetch_author_key_wrapper(possible_methods, feed_field, "email", plan)
     if not is_email(email):
         raise FeedResultFieldNotFoundError(
-            f"Field email is not a correct email string, email: {email}"
+            "Field email is not a correct email string, email: %s", email
         )
     return string_formatter(email)
 
@@ -125,13 +180,13 @@ def get_feed_data_uri_field(feed_field: Dict) -> str:
     enclosures = fetch_enclosures_method(feed_field)
     item = find_item_with_key(enclosures, "href")
     if item is None:
-        raise FeedResultFieldNotFoundError(f"Field href not found, {enclosures}")
+        raise FeedResultFieldNotFoundError("Field href not found", payload=enclosures)
 
     url = string_formatter(item.get("href"))
     if not is_url_string(url):
         url = try_fixing_url(url)
     if not is_audio_url(url):
-        raise FeedResultTypeError(f"Field href validate error, {url}")
+        raise FeedResultTypeError("Field href validate error, %s", url)
     return url
 
 
@@ -139,9 +194,7 @@ def get_feed_title_field(feed_field: Dict) -> str:
     """entry"""
     title = feed_field.get("title")
     if title is None:
-        raise FeedResultFieldNotFoundError(
-            f"Field title not found, {dir_attrs(feed_field)}"
-        )
+        raise FeedResultFieldNotFoundError("Field title not found", payload=feed_field)
     return string_formatter(title)
 
 
@@ -165,78 +218,137 @@ def _fetch_content_value_method(feed_entry: Union[FeedParserDict, Dict]) -> str:
     content = fetch_content_method(feed_entry)
     item = find_item_with_key(content, "value")
     if item is None:
-        raise FeedResultFieldNotFoundError(
-            f"Field value not found, {[{i: d.keys()} for i, d in enumerate(content, 1)]}"
-        )
-    return html_to_string_formatter(item.get("value"))
+        raise FeedResultFieldNotFoundError("Field value not found", payload=content)
+    return item.get("value")
 
 
-def _try_multiple_methods_for_description(
-    feed_entry: Union[FeedParserDict, Dict],
-) -> List[str]:
-    matched_methods = [
-        fetch_subtitle_method,
-        fetch_summary_method,
-        fetch_description_method,
-        _fetch_content_value_method,
-    ]
-    return apply_methods_to_get_all_result(matched_methods, feed_entry)
+_DESCRIPTION_METHODS = [
+    fetch_subtitle_method,
+    fetch_summary_method,
+    fetch_description_method,
+    _fetch_content_value_method,
+]
+
+# entry key read by a fetch method, the method raises if it is None
+_METHOD_KEYS = {
+    fetch_author_detail_key_method: "author_detail",
+    fetch_authors_key_method: "authors",
+    fetch_author_key_method: "author",
+    fetch_published_method: "published",
+    fetch_pub_date_method: "pubDate",
+    fetch_subtitle_method: "subtitle",
+    fetch_summary_method: "summary",
+    fetch_description_method: "description",
+    _fetch_content_value_method: "content",
+}
+
+
+def get_description_max_length() -> int:
+    """app_config description_max_length, characters kept of a description, 0 means no limit"""
+    return int(execution.config.description_max_length)
+
+
+def _fetch_description_candidates(
+    feed_entry: Union[FeedParserDict, Dict], plan: Optional[ExtractionPlan]
+) -> List[Tuple[int, Callable, str]]:
+    """
+    (priority, method, raw value) of every method which yields a string, the planned
+    method first, then the longer raw values first
+    """
+    planned_method = plan.get_method("description") if plan is not None else None
+    candidates = []
+    for priority, method in enumerate(_DESCRIPTION_METHODS):
+        if _is_absent(method, feed_entry):
+            continue
+        try:
+            value = method(feed_entry)
+        except Exception as exc:
+            logger.debug("method throw error, method: %s, %s", method.__name__, exc)
+            continue
+        if isinstance(value, str) and value:
+            candidates.append((priority, method, value))
+    candidates.sort(key=lambda item: (item[1] is not planned_method, -len(item[2])))
+    return candidates
+
+
+def get_feed_description_description(
+    feed_field: Dict,
+    max_length: Optional[int] = None,
+    plan: Optional[ExtractionPlan] = None,
+) -> str:
+    """
+    entry, the longest candidate after html_to_text, the one of higher priority in
+    _DESCRIPTION_METHODS if several are as long
 
+    html_to_text never makes a text longer, so a candidate is not formatted if its raw
+    value is not longer than the longest one found, a plan only changes the order
 
-def get_feed_description_description(feed_field: Dict) -> str:
-    """entry"""
-    description_list = _try_multiple_methods_for_description(feed_field)
-    if len(description_list) == 0:
+    max_length: characters kept, None means app_config description_max_length
+    """
+    if max_length is None:
+        max_length = get_description_max_length()
+
+    longest_priority, longest_method, longest = None, None, ""
+    for priority, method, value in _fetch_description_candidates(feed_field, plan):
+        if longest_method is not None and (
+            len(value) < len(longest)
+            or (len(value) == len(longest) and priority > longest_priority)
+        ):
+            continue
+        description = html_to_text(value, max_length)
+        if len(description) > len(longest) or (
+            description
+            and len(description) == len(longest)
+            and priority < longest_priority
+        ):
+            longest_priority, longest_method, longest = priority, method, description
+
+    if longest_method is None:
         raise FeedResultFieldNotFoundError(
-            f"Field description not found, {dir_attrs(feed_field)}"
+            "Field description not found", payload=feed_field
         )
-    formatted_description_list = apply_method_with_list_to_get_all_result(
-        description_list, string_formatter
-    )
-    formatted_description_list = apply_method_with_list_to_get_all_result(
-        formatted_description_list, remove_html_tag_formatter
-    )
-    sorted_description_list = sorted(formatted_description_list, key=len, reverse=True)
-    return sorted_description_list[0]
+    if plan is not None:
+        plan.record("description", longest_method)
+    return longest
 
 
-def _try_multiple_methods_for_release_date(feed_field: Dict) -> List[str]:
-    matched_methods = [fetch_published_method, fetch_pub_date_method]
-    return apply_methods_to_get_all_result(matched_methods, feed_field)
-
+def get_feed_description_list(
+    feed_entries: List[Dict], max_length: Optional[int] = None
+) -> List[str]:
+    """description of every entry, empty string if not found"""
+    if max_length is None:
+        max_length = get_description_max_length()
 
-def _convert_release_date(release_date: str) -> str:
-    covert_funcs = [
-        basic_datetime_formatter,
-        fix_short_month_datetime_formatter,
-        fix_week_alias_datetime_formatter,
-    ]
-    for func in covert_funcs:
+    plan = ExtractionPlan()
+    description_list = []
+    for feed_entry in feed_entries:
         try:
-            return func(release_date)
-        except FormatterException as exc:
-            logger.debug("formatter error, function: %s, %s", func.__name__, exc)
-        except Exception as exc:
-            logger.error("unexpected error, %s", exc)
-            raise Exception(f"Unexpected error, {exc}") from exc
-    raise FeedResultFieldNotFoundError("Convert error, cant parse release_date")
-
-
-def get_feed_release_date_field(feed_field: Dict) -> str:
-    release_date_list = _try_multiple_methods_for_release_date(feed_field)
-    if len(release_date_list) == 0:
+            description_list.append(
+                get_feed_description_description(feed_entry, max_length, plan)
+            )
+        except FeedResultFieldNotFoundError as exc:
+            logger.debug("description not found, %s", exc)
+            description_list.append("")
+    return description_list
+
+
+def get_feed_release_date_field(
+    feed_field: Dict, plan: Optional[ExtractionPlan] = None
+) -> str:
+    possible_methods = [fetch_published_method, fetch_pub_date_method]
+    release_date = _fetch_first_match(
+        "release_date", possible_methods, plan, feed_field
+    )
+    if release_date is None:
         raise FeedResultFieldNotFoundError(
-            f"Field release_date is empty, {dir_attrs(feed_field)}"
+            "Field release_date is empty", payload=feed_field
         )
-    release_date = release_date_list[0]
-    release_date = string_formatter(release_date)
-    release_date = _convert_release_date(release_date)
-    return release_date
+    return normalize_release_date(string_formatter(release_date))
 
 
 def get_feed_duration_field(feed_field: Dict) -> str:
     duration = fetch_itunes_duration_method(feed_field)
-    return duration_formatter(trim_string(duration))
+    return normalize_duration(trim_string(duration))
 
 
 def _convert_tag(term_string: str) -> List[str]:
@@ -257,9 +369,7 @@ def _convert_tag(term_string: str) -> List[str]:
 def get_feed_tag_field(feed_field: Dict) -> List[str]:
     tag_list = fetch_tags_method(feed_field)
     if len(tag_list) == 0:
-        raise FeedResultFieldNotFoundError(
-            f"Field tags is empty, {dir_attrs(feed_field)}"
-        )
+        raise FeedResultFieldNotFoundError("Field tags is empty", payload=feed_field)
     if not isinstance(tag_list, list):
         return []
     tags = []
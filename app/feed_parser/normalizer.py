@@ -0,0 +1,157 @@
+"""
+Release date and duration normalization of feed entries
+
+the podcast date formats seen in feeds, RFC 822 and RFC 3339, are parsed by hand,
+anything else goes through the dateutil formatters, results are the same as
+basic_datetime_formatter / duration_formatter, recent raw strings are memoized
+"""
+
+import datetime
+import re
+from functools import lru_cache
+from typing import List, Optional
+
+from app.common.exceptions import FeedResultFieldNotFoundError, FormatterException
+from app.feed_parser.formatter import (
+    basic_datetime_formatter,
+    duration_formatter,
+    fix_short_month_datetime_formatter,
+    fix_week_alias_datetime_formatter,
+)
+from log_helper.async_logger import get_async_logger
+
+logger = get_async_logger(__name__)
+
+MEMO_SIZE = 4096
+
+RELEASE_DATE_FORMAT = "%Y/%m/%d %H:%M:%S"
+
+_MONTHS = {
+    name: num
+    for num, name in enumerate(
+        ["jan", "feb", "mar", "apr", "may", "jun"]
+        + ["jul", "aug", "sep", "oct", "nov", "dec"],
+        1,
+    )
+}
+_WEEKDAYS = {"mon", "tue", "wed", "thu", "fri", "sat", "sun"}
+
+# e.g. Mon, 06 Mar 2023 10:00:00 +0800
+_RFC822_PATTERN = re.compile(
+    r"^(?:(?P<weekday>[A-Za-z]{3}),?\s+)?"
+    r"(?P<day>\d{1,2})\s+(?P<month>[A-Za-z]{3})\s+(?P<year>\d{4})\s+"
+    r"(?P<hour>\d{1,2}):(?P<minute>\d{2})(?::(?P<second>\d{2}))?"
+    r"(?:\s*(?P<zone>[+-]\d{2}:?\d{2}|GMT|UTC|Z))?$"
+)
+# e.g. 2023-03-06T10:00:00.000+08:00
+_RFC3339_PATTERN = re.compile(
+    r"^(?P<year>\d{4})-(?P<month>\d{2})-(?P<day>\d{2})[T ]"
+    r"(?P<hour>\d{2}):(?P<minute>\d{2})(?::(?P<second>\d{2})(?:\.\d+)?)?"
+    r"(?P<zone>[+-]\d{2}:?\d{2}|Z)?$"
+)
+
+
+def _parse_zone(zone: Optional[str]) -> Optional[datetime.tzinfo]:
+    if zone is None:
+        return None
+    if zone in ["GMT", "UTC", "Z"]:
+        return datetime.timezone.utc
+    hours, minutes = int(zone[1:3]), int(zone[-2:])
+    if hours > 23 or minutes > 59:
+        raise ValueError("offset out of range, %s" % (zone,))
+    offset = datetime.timedelta(hours=hours, minutes=minutes)
+    return datetime.timezone(-offset if zone[0] == "-" else offset)
+
+
+def _to_release_date(match, month: int) -> str:
+    dt = datetime.datetime(
+        int(match.group("year")),
+        month,
+        int(match.group("day")),
+        int(match.group("hour")),
+        int(match.group("minute")),
+        int(match.group("second") or 0),
+        tzinfo=_parse_zone(match.group("zone")),
+    )
+    # without timezone the time is treated as UTC, like basic_datetime_formatter
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(datetime.timezone.utc)
+    return dt.strftime(RELEASE_DATE_FORMAT)
+
+
+def _fast_release_date(release_date: str) -> Optional[str]:
+    """None if release_date is not a format handled here"""
+    try:
+        match = _RFC822_PATTERN.match(release_date)
+        if match is not None:
+            weekday = match.group("weekday")
+            month = _MONTHS.get(match.group("month").lower())
+            if month is None or (weekday and weekday.lower() not in _WEEKDAYS):
+                return None
+            return _to_release_date(match, month)
+
+        match = _RFC3339_PATTERN.match(release_date)
+        if match is not None:
+            return _to_release_date(match, int(match.group("month")))
+    except ValueError as exc:
+        # e.g. day out of range, left to dateutil
+        logger.debug("fast release date parse error, %s", exc)
+    return None
+
+
+def _convert_release_date(release_date: str) -> str:
+    covert_funcs = [
+        basic_datetime_formatter,
+        fix_short_month_datetime_formatter,
+        fix_week_alias_datetime_formatter,
+    ]
+    for func in covert_funcs:
+        try:
+            return func(release_date)
+        except FormatterException as exc:
+            logger.debug("formatter error, function: %s, %s", func.__name__, exc)
+        except Exception as exc:
+            logger.error("unexpected error, %s", exc)
+            raise Exception(f"Unexpected error, {exc}") from exc
+    raise FeedResultFieldNotFoundError("Convert error, cant parse release_date")
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def normalize_release_date(release_date: str) -> str:
+    """
+    release date string to %Y/%m/%d %H:%M:%S in UTC
+    """
+    result = _fast_release_date(release_date)
+    if result is None:
+        result = _convert_release_date(release_date)
+    return result
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def normalize_duration(duration: str) -> str:
+    """see duration_formatter"""
+    return duration_formatter(duration)
+
+
+def normalize_release_date_list(release_dates: List[str]) -> List[Optional[str]]:
+    """normalize_release_date of every item, None for an item can not be parsed"""
+    result = []
+    for release_date in release_dates:
+        try:
+            result.append(normalize_release_date(release_date))
+        except (FeedResultFieldNotFoundError, TypeError) as exc:
+            logger.debug("release date error, %s", exc)
+            result.append(None)
+    return result
+
+
+def normalize_duration_list(durations: List[str]) -> List[Optional[str]]:
+    """normalize_duration of every item, None for an item can not be parsed"""
+    result = []
+    for duration in durations:
+        try:
+            result.append(normalize_duration(duration))
+        except (FormatterException, TypeError) as exc:
+            logger.debug("duration error, %s", exc)
+            result.append(None)
+    return result
@@ -0,0 +1,315 @@
+"""
+Feed parsing in dedicated worker processes
+
+fetching processes hand raw feed bytes to the parser workers, a feed is parsed once by
+one worker, which converts entries to EpisodeRecord and sends them back in chunks of
+chunk_size entries as it goes, so the caller starts on the first chunk while the rest
+is parsed, and the worker stops early when the caller stops reading
+
+    service = start_parse_service(workers=2, chunk_size=200, manager=manager)
+    pool = Pool(processes=process_num)  # forked after the service, so it is inherited
+    ...
+    stop_parse_service()
+"""
+
+import multiprocessing
+import os
+import queue
+import traceback
+from collections import namedtuple
+from typing import Dict, Iterator, List, Optional, Union
+
+from feedparser import FeedParserDict
+
+from app.common import metrics
+from app.common.exceptions import (
+    FeedResultException,
+    FeedResultFieldNotFoundError,
+    FormatterException,
+)
+from app.feed_parser.helper import (
+    ExtractionPlan,
+    get_description_max_length,
+    get_feed_data_uri_field,
+    get_feed_description_description,
+    get_feed_duration_field,
+    get_feed_img_url,
+    get_feed_release_date_field,
+    get_feed_tag_field,
+    get_feed_title_field,
+)
+from app.feed_parser.stream import DEFAULT_CHUNK_SIZE, parse_feed_stream
+from log_helper.async_logger import get_async_logger
+
+logger = get_async_logger(__name__)
+
+# fields handle_new_entry needs, img_url is None if entry has no image
+EpisodeRecord = namedtuple(
+    "EpisodeRecord",
+    ["data_uri", "title", "release_date", "duration", "description", "img_url", "tags"],
+)
+
+# feed is only set in the first chunk, records hold EpisodeRecord or the exception of an entry
+ParsedChunk = namedtuple("ParsedChunk", ["index", "feed", "bozo", "records", "done"])
+
+# cancel is set by the caller when it stops reading entries
+ParseRequest = namedtuple(
+    "ParseRequest", ["content", "chunk_size", "backend", "reply", "cancel"]
+)
+
+# sentinel for stopping parser worker, must survive pickling through queue
+_STOP = None
+
+
+def create_episode_record(
+    entry: Dict,
+    plan: Optional[ExtractionPlan] = None,
+    description_max_length: Optional[int] = None,
+) -> EpisodeRecord:
+    """
+    raise FeedResultException / FormatterException if a required field is missing
+    """
+    # require fields
+    data_uri = get_feed_data_uri_field(entry)
+    title = get_feed_title_field(entry)
+    release_date = get_feed_release_date_field(entry, plan=plan)
+    duration = get_feed_duration_field(entry)
+
+    # allow empty fields
+    try:
+        description = get_feed_description_description(
+            entry, description_max_length, plan
+        )
+    except FeedResultFieldNotFoundError as exc:
+        logger.debug("description not found, %s", exc)
+        description = ""
+
+    try:
+        img_url = get_feed_img_url(feed_field=entry)
+    except FeedResultFieldNotFoundError as exc:
+        logger.debug("img_url not found, %s", exc)
+        img_url = None
+
+    try:
+        tags = get_feed_tag_field(entry)
+    except (FeedResultFieldNotFoundError, FormatterException) as exc:
+        logger.debug("tags not found, %s", exc)
+        tags = []
+
+    return EpisodeRecord(
+        data_uri, title, release_date, duration, description, img_url, tags
+    )
+
+
+def iter_episode_records(
+    feed_entries, plan: Optional[ExtractionPlan] = None
+) -> Iterator[Union[EpisodeRecord, Exception]]:
+    """
+    EpisodeRecord of every entry, or the exception which stopped converting it
+    """
+    plan = plan or ExtractionPlan()
+    # read once per feed, config may be reloaded on every access
+    description_max_length = get_description_max_length()
+    for entry in feed_entries:
+        try:
+            yield create_episode_record(entry, plan, description_max_length)
+        except (FeedResultException, FormatterException) as exc:
+            yield exc
+
+
+def iter_parsed_chunks(
+    content: bytes, chunk_size: int, backend: str = "etree"
+) -> Iterator[ParsedChunk]:
+    """
+    Parse the feed once, yield its EpisodeRecord in chunks of chunk_size, the last one is done
+    """
+    result = parse_feed_stream(content, DEFAULT_CHUNK_SIZE, backend)
+
+    index = 0
+    records: List = []
+    for record in iter_episode_records(result.entries):
+        if isinstance(record, Exception):
+            # drop the payload, only the message is sent back
+            record = record.__class__(str(record))
+        records.append(record)
+        if len(records) >= chunk_size:
+            yield ParsedChunk(
+                index, result.feed if index == 0 else None, result.bozo, records, False
+            )
+            index += 1
+            records = []
+
+    yield ParsedChunk(
+        index, result.feed if index == 0 else None, result.bozo, records, True
+    )
+
+
+def handle_parse_request(request: ParseRequest) -> None:
+    """
+    Send chunks of the feed to request.reply until the last one, or the caller cancels
+    """
+    index = 0
+    try:
+        for chunk in iter_parsed_chunks(
+            request.content, request.chunk_size, request.backend
+        ):
+            request.reply.put(chunk)
+            index = chunk.index + 1
+            if not chunk.done and request.cancel.is_set():
+                metrics.incr("feed.parse_cancel")
+                return
+    except Exception as exc:
+        logger.error("parser worker unexpected error, %s", traceback.format_exc(10))
+        request.reply.put(
+            ParsedChunk(index, None, 1, [FeedResultException(str(exc))], True)
+        )
+
+
+def _run_parser_worker(requests: multiprocessing.Queue) -> None:
+    logger.debug("parser worker start, pid: %s", os.getpid())
+    while True:
+        request = requests.get()
+        if request is _STOP:
+            break
+        with metrics.Timer("feed.parse_worker"):
+            handle_parse_request(request)
+    logger.debug("parser worker end, pid: %s", os.getpid())
+
+
+class ParsedEntries:
+    """
+    EpisodeRecord of a feed parsed by ParseService, in feed order, can only be iterated once
+
+    bool() is True if the feed has any entry, it waits for the first chunk, the worker
+    is told to stop when iterating stops before the last chunk
+    """
+
+    def __init__(self, reply, cancel, timeout: float):
+        self.reply = reply
+        self.cancel = cancel
+        self.timeout = timeout
+        self._first_chunk: Optional[ParsedChunk] = None
+        self._next_index = 0
+
+    def _get_chunk(self) -> ParsedChunk:
+        try:
+            chunk = self.reply.get(timeout=self.timeout)
+        except queue.Empty as exc:
+            raise FeedResultException(
+                "parse timeout, chunk %s" % (self._next_index,)
+            ) from exc
+        self._next_index += 1
+        return chunk
+
+    def get_first_chunk(self) -> ParsedChunk:
+        if self._first_chunk is None:
+            self._first_chunk = self._get_chunk()
+        return self._first_chunk
+
+    def close(self) -> None:
+        self.cancel.set()
+
+    def __bool__(self) -> bool:
+        return bool(self.get_first_chunk().records)
+
+    def __iter__(self) -> Iterator[Union[EpisodeRecord, Exception]]:
+        chunk = self.get_first_chunk()
+        try:
+            while True:
+                yield from chunk.records
+                if chunk.done:
+                    return
+                chunk = self._get_chunk()
+        finally:
+            if not chunk.done:
+                # caller stopped reading, e.g. EntryStopper
+                self.close()
+
+
+class ParseService:
+    """
+    Parser worker processes shared by every process forked after start()
+
+    workers: parser processes, sized independently of the fetching processes
+    chunk_size: entries per chunk sent back, the caller starts on the first one
+    manager: creates the reply queue and cancel event of every request
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        chunk_size: int,
+        manager,
+        backend: str = "etree",
+        timeout: float = 60,
+    ):
+        if workers < 1:
+            raise ValueError("parse service require at least one worker")
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.manager = manager
+        self.backend = backend
+        self.timeout = timeout
+        self.requests = multiprocessing.Queue()
+        self.processes: List[multiprocessing.Process] = []
+
+    def start(self) -> None:
+        for num in range(self.workers):
+            process = multiprocessing.Process(
+                target=_run_parser_worker,
+                args=(self.requests,),
+                name=f"parser-{num}",
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+
+    def stop(self) -> None:
+        for _ in self.processes:
+            self.requests.put(_STOP)
+        for process in self.processes:
+            process.join()
+
+    def parse(self, content: bytes) -> FeedParserDict:
+        """
+        Same shape as feedparser result, entries is ParsedEntries of EpisodeRecord
+        """
+        reply = self.manager.Queue()
+        cancel = self.manager.Event()
+        self.requests.put(
+            ParseRequest(content, self.chunk_size, self.backend, reply, cancel)
+        )
+
+        entries = ParsedEntries(reply, cancel, self.timeout)
+        first_chunk = entries.get_first_chunk()
+        return FeedParserDict(
+            feed=first_chunk.feed,
+            entries=entries,
+            bozo=first_chunk.bozo,
+        )
+
+
+_SERVICE: Dict[str, Optional[ParseService]] = {"service": None}
+
+
+def start_parse_service(
+    workers: int, chunk_size: int, manager, backend: str = "etree", timeout: float = 60
+) -> ParseService:
+    """
+    call it before forking the processes which use get_parse_service
+    """
+    service = ParseService(workers, chunk_size, manager, backend, timeout)
+    service.start()
+    _SERVICE["service"] = service
+    return service
+
+
+def stop_parse_service() -> None:
+    service = _SERVICE["service"]
+    if service is not None:
+        service.stop()
+        _SERVICE["service"] = None
+
+
+def get_parse_service() -> Optional[ParseService]:
+    return _SERVICE["service"]
@@ -0,0 +1,435 @@
+import io
+import itertools
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+import feedparser
+from feedparser import FeedParserDict
+
+from log_helper.async_logger import get_async_logger
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # optional, etree backend is used without it
+    lxml_etree = None
+
+logger = get_async_logger(__name__)
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# namespace uri (lower case) -> prefix used in tag names, e.g. itunes:duration
+_NAMESPACES = {
+    "http://www.itunes.com/dtds/podcast-1.0.dtd": "itunes",
+    "http://purl.org/rss/1.0/modules/content/": "content",
+    "http://purl.org/dc/elements/1.1/": "dc",
+    "http://www.w3.org/2005/atom": "atom",
+    "http://search.yahoo.com/mrss/": "media",
+}
+
+
+class StreamParseError(Exception):
+    pass
+
+
+class StreamSourceError(Exception):
+    """reading chunks of the content failed, e.g. download aborted"""
+
+    pass
+
+
+# create_parser returns a pull parser with feed / read_events / close
+XmlBackend = namedtuple("XmlBackend", ["name", "create_parser", "tostring", "errors"])
+
+
+def _create_etree_parser():
+    return ET.XMLPullParser(events=("start", "end"))
+
+
+def _create_lxml_parser():
+    return lxml_etree.XMLPullParser(
+        events=("start", "end"),
+        resolve_entities=False,
+        no_network=True,
+    )
+
+
+XML_BACKENDS = {
+    "etree": XmlBackend("etree", _create_etree_parser, ET.tostring, (ET.ParseError,)),
+}
+if lxml_etree is not None:
+    XML_BACKENDS["lxml"] = XmlBackend(
+        "lxml", _create_lxml_parser, lxml_etree.tostring, (lxml_etree.ParseError,)
+    )
+
+
+def get_xml_backend(name: str) -> XmlBackend:
+    backend = XML_BACKENDS.get(name)
+    if backend is None:
+        logger.info("xml backend %s is not available, use etree", name)
+        backend = XML_BACKENDS["etree"]
+    return backend
+
+
+def _local_name(tag) -> str:
+    if not isinstance(tag, str):
+        # comment or processing instruction of lxml
+        return ""
+    if not tag.startswith("{"):
+        return tag
+    uri, name = tag[1:].split("}", 1)
+    prefix = _NAMESPACES.get(uri.lower())
+    return f"{prefix}:{name}" if prefix else name
+
+
+def _inner_text(element, tostring) -> Optional[str]:
+    """text with serialized child elements, html in description is not always escaped"""
+    if not len(element):
+        return element.text
+    parts = [element.text or ""]
+    for child in element:
+        parts.append(tostring(child, encoding="unicode"))
+    return "".join(parts)
+
+
+def _add_keywords(tags: List[Dict], keywords: Optional[str]) -> None:
+    for term in (keywords or "").split(","):
+        if term.strip():
+            tags.append({"term": term.strip(), "scheme": None, "label": None})
+
+
+def _convert_entry(item, tostring) -> FeedParserDict:
+    """
+    Build entry with the keys feedparser uses, so helper getters work on both
+    """
+    entry = FeedParserDict()
+    links: List[Dict] = []
+    tags: List[Dict] = []
+    summary = None
+
+    for child in item:
+        name = _local_name(child.tag)
+        if name == "title":
+            entry["title"] = child.text or ""
+        elif name == "description":
+            summary = _inner_text(child, tostring)
+        elif name == "itunes:summary" and summary is None:
+            summary = child.text
+        elif name == "itunes:subtitle":
+            entry["subtitle"] = child.text
+        elif name == "content:encoded":
+            entry["content"] = [
+                {"type": "text/html", "value": _inner_text(child, tostring)}
+            ]
+        elif name in ["pubDate", "dc:date"] and "published" not in entry:
+            entry["published"] = (child.text or "").strip()
+        elif name == "itunes:duration":
+            entry["itunes_duration"] = child.text
+        elif name == "enclosure":
+            enclosure = {"rel": "enclosure", **child.attrib}
+            if "url" in enclosure:
+                enclosure["href"] = enclosure.pop("url")
+            links.append(enclosure)
+        elif name == "link":
+            entry["link"] = (child.text or "").strip()
+        elif name == "guid":
+            entry["id"] = (child.text or "").strip()
+        elif name == "itunes:image" and child.get("href"):
+            entry["image"] = {"href": child.get("href")}
+        elif name == "category" and child.text:
+            tags.append({"term": child.text.strip(), "scheme": None, "label": None})
+        elif name == "itunes:keywords":
+            _add_keywords(tags, child.text)
+
+    if summary is not None:
+        entry["summary"] = summary
+    if links:
+        entry["links"] = links
+    if tags:
+        entry["tags"] = tags
+    return entry
+
+
+def _convert_channel(channel, tostring) -> FeedParserDict:
+    feed = FeedParserDict()
+    author = {}
+    owner = {}
+    tags: List[Dict] = []
+    for child in channel:
+        name = _local_name(child.tag)
+        if name == "title":
+            feed["title"] = child.text or ""
+        elif name == "link" and child.text:
+            feed["link"] = child.text.strip()
+        elif name == "description":
+            feed["subtitle"] = _inner_text(child, tostring)
+        elif name == "itunes:image" and child.get("href"):
+            feed["image"] = {"href": child.get("href")}
+        elif name == "image" and "image" not in feed:
+            url = child.find("url")
+            if url is not None and url.text:
+                feed["image"] = {"href": url.text.strip()}
+        elif name == "itunes:author" and child.text:
+            feed["author"] = child.text.strip()
+            author.setdefault("name", feed["author"])
+        elif name == "itunes:owner":
+            for owner_child in child:
+                owner_name = _local_name(owner_child.tag)
+                if owner_name == "itunes:name" and owner_child.text:
+                    owner["name"] = owner_child.text.strip()
+                elif owner_name == "itunes:email" and owner_child.text:
+                    owner["email"] = owner_child.text.strip()
+        elif name == "itunes:category" and child.get("text"):
+            tags.append({"term": child.get("text"), "scheme": None, "label": None})
+        elif name == "itunes:keywords":
+            _add_keywords(tags, child.text)
+
+    # like feedparser, owner overrides itunes:author in author_detail
+    author.update(owner)
+    if author:
+        feed["author_detail"] = author
+        feed["authors"] = [author]
+        feed.setdefault("author", author.get("name"))
+    if tags:
+        feed["tags"] = tags
+    return feed
+
+
+class StreamFeedParser:
+    """
+    Parse rss items one at a time, parsed items are dropped as soon as they are yielded
+
+    the channel fields are parsed when the first item starts, so feed fields placed
+    after items are not seen, feedparser is used instead if content is not rss 2.0 or
+    not well-formed
+
+    content can also be an iterable of chunks, e.g. stream_download.iter_response_content,
+    chunks are only kept until the first entry, an error after it ends the entries with
+    bozo instead of using feedparser, StreamSourceError is raised if reading the chunks
+    fails before the first entry, and sets incomplete after it, close() closes the chunks
+
+    Usage:
+        parser = StreamFeedParser(content)
+        feed = parser.feed
+        for entry in parser:
+            ...
+    """
+
+    def __init__(
+        self,
+        content: Union[bytes, Iterable[bytes]],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        backend: str = "etree",
+    ):
+        self.content = content
+        self.chunk_size = chunk_size
+        self._chunks: Optional[Iterator[bytes]] = None
+        self._head: Optional[List[bytes]] = None
+        if not isinstance(content, bytes):
+            self._chunks = iter(content)
+            self._head = []
+        self.backend = get_xml_backend(backend)
+        self.bozo = 0
+        self.bozo_exception: Optional[str] = None
+        self.incomplete = False
+        self._feed: Optional[FeedParserDict] = None
+        self._fallback: Optional[FeedParserDict] = None
+        self._pending: List[FeedParserDict] = []
+        self._yielded = 0
+        self._events = self._iter_events()
+
+    @property
+    def feed(self) -> FeedParserDict:
+        while self._feed is None:
+            entry = self._next_entry()
+            if entry is None:
+                break
+            self._pending.append(entry)
+        return self._feed if self._feed is not None else FeedParserDict()
+
+    def __bool__(self) -> bool:
+        """True if there is any entry, reads the first one if needed"""
+        if not self._pending and not self._yielded:
+            entry = self._next_entry()
+            if entry is not None:
+                self._pending.append(entry)
+        return bool(self._pending) or self._yielded > 0
+
+    def __iter__(self) -> Iterator[FeedParserDict]:
+        while True:
+            if self._pending:
+                entry = self._pending.pop(0)
+            else:
+                entry = self._next_entry()
+            if entry is None:
+                return
+            self._yielded += 1
+            yield entry
+
+    def _next_entry(self) -> Optional[FeedParserDict]:
+        if self._fallback is not None:
+            return self._next_fallback_entry()
+        try:
+            return next(self._events)
+        except StopIteration:
+            return None
+        except StreamSourceError as exc:
+            self._events = iter(())
+            if not self._pending and not self._yielded:
+                raise
+            logger.info("stream read error, entries end here, %s", exc)
+            self.bozo = 1
+            self.bozo_exception = str(exc)
+            self.incomplete = True
+            return None
+        except self.backend.errors + (StreamParseError,) as exc:
+            if self._chunks is not None and self._head is None:
+                logger.info("stream parse error, entries end here, %s", exc)
+                self.bozo = 1
+                self.bozo_exception = str(exc)
+                self._events = iter(())
+                return None
+            logger.info("stream parse error, use feedparser instead, %s", exc)
+            self._use_fallback()
+            return self._next_fallback_entry()
+
+    def _next_fallback_entry(self) -> Optional[FeedParserDict]:
+        # entries already yielded by stream parsing are skipped
+        entries = self._fallback.get("entries", [])
+        index = self._yielded + len(self._pending)
+        return entries[index] if index < len(entries) else None
+
+    def _use_fallback(self) -> None:
+        content = self.content
+        if self._chunks is not None:
+            try:
+                content = b"".join(itertools.chain(self._head, self._chunks))
+            except Exception as exc:
+                raise StreamSourceError("read content failed, %s" % (exc,)) from exc
+            self._head = None
+        self._fallback = feedparser.parse(
+            content,
+            response_headers={"content-type": "text/xml; charset=utf-8"},
+        )
+        self.bozo = self._fallback.get("bozo", 0)
+        if self.bozo:
+            self.bozo_exception = str(
+                self._fallback.get("bozo_exception", "bozo error")
+            )
+        if self._feed is None:
+            self._feed = self._fallback.get("feed", FeedParserDict())
+
+    def close(self) -> None:
+        """stop reading chunks, e.g. close the response of a streamed download"""
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()
+
+    def _iter_chunks(self) -> Iterator[bytes]:
+        if self._chunks is None:
+            stream = io.BytesIO(self.content)
+            yield from iter(lambda: stream.read(self.chunk_size), b"")
+            return
+        while True:
+            try:
+                chunk = next(self._chunks, None)
+            except Exception as exc:
+                raise StreamSourceError("read content failed, %s" % (exc,)) from exc
+            if chunk is None:
+                return
+            if self._head is not None:
+                self._head.append(chunk)
+            if chunk:
+                yield chunk
+
+    def _iter_events(self) -> Iterator[FeedParserDict]:
+        pull_parser = self.backend.create_parser()
+        tostring = self.backend.tostring
+        chunks = self._iter_chunks()
+        path: List = []
+        channel = None
+
+        while True:
+            chunk = next(chunks, b"")
+            if chunk:
+                pull_parser.feed(chunk)
+            else:
+                pull_parser.close()
+
+            for event, element in pull_parser.read_events():
+                if event == "start":
+                    if not path and _local_name(element.tag) != "rss":
+                        raise StreamParseError("not rss, root: %s" % (element.tag,))
+                    path.append(element)
+                    name = _local_name(element.tag)
+                    if name == "channel" and len(path) == 2:
+                        channel = element
+                    elif name == "item" and channel is not None and self._feed is None:
+                        self._feed = _convert_channel(channel, tostring)
+                    continue
+
+                path.pop()
+                if element is channel and self._feed is None:
+                    # feed without item
+                    self._feed = _convert_channel(channel, tostring)
+                elif _local_name(element.tag) == "item" and len(path) == 2:
+                    entry = _convert_entry(element, tostring)
+                    # keep memory flat, parsed item is not needed anymore
+                    path[-1].remove(element)
+                    self._head = None
+                    yield entry
+
+            if not chunk:
+                return
+
+
+def parse_feed_stream(
+    content: Union[bytes, Iterable[bytes]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    backend: str = "etree",
+) -> FeedParserDict:
+    """
+    Same shape as feedparser result, but entries is a StreamFeedParser which can only be iterated once
+    """
+    parser = StreamFeedParser(content, chunk_size, backend)
+    feed = parser.feed
+    return FeedParserDict(
+        feed=feed,
+        entries=parser,
+        bozo=parser.bozo,
+        bozo_exception=parser.bozo_exception,
+    )
+
+
+class EntryStopper:
+    """
+    Decide when to stop reading a newest first feed
+
+    max_known: stop after this many consecutive entries already saved, 0 means never
+    watermark: stop at the first new entry released before it, format of get_feed_release_date_field
+    track_watermark: raise watermark to the newest already saved entry
+    """
+
+    def __init__(
+        self,
+        max_known: int = 0,
+        watermark: Optional[str] = None,
+        track_watermark: bool = False,
+    ):
+        self.max_known = max_known
+        self.watermark = watermark
+        self.track_watermark = track_watermark
+        self.known_count = 0
+
+    def add_known(self, release_date: Optional[str]) -> bool:
+        """count an already saved entry, return True if reading should stop"""
+        self.known_count += 1
+        if self.track_watermark and release_date:
+            if self.watermark is None or release_date > self.watermark:
+                self.watermark = release_date
+        return 0 < self.max_known <= self.known_count
+
+    def add_new(self, release_date: Optional[str]) -> bool:
+        """count a new entry, return True if it is before watermark and reading should stop"""
+        self.known_count = 0
+        return bool(self.watermark and release_date and release_date < self.watermark)
@@ -1,6 +1,5 @@
 from __future__ import absolute_import
 
-import copy
 import datetime
 import gc
 import io
@@ -10,7 +9,7 @@ import traceback
 from functools import partial
 from multiprocessing import Manager, Pool
 from multiprocessing.managers import BaseProxy, DictProxy
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Container, Dict, List, Optional, Tuple, Union
 
 from feedparser import FeedParserDict
 from redis.exceptions import RedisError
@@ -30,9 +29,11 @@ from app.collector.itunes_collection_handler import (
     write_itunes_data,
 )
 from app.collector.itunes_tag_handler import find_itunes_tag, update_itunes_tag_data
-from app.common.collection import is_empty_dict, sort_list_by_key
+from app.common import metrics
+from app.common.collection import chunk_list, is_empty_dict, sort_list_by_key
 from app.common.comparsion import check_equal_string
 from app.common.exceptions import (
+    DatabaseInsertError,
     ExcludeItemError,
     FeedResultException,
     FeedResultFieldNotFoundError,
@@ -40,8 +41,38 @@ from app.common.exceptions import (
     ItunesDataError,
 )
 from app.common.inspect import calc_deco, diff_time
-from app.concurrency_task import get_detail, get_top
-from app.crawler import abort_wrapper, crawl_feeder
+from app.concurrency_task import (
+    collect_unique_collection_ids,
+    fetch_stage,
+    get_detail,
+    get_detail_batch,
+    get_details_concurrently,
+    get_top_list,
+    get_top_lists_concurrently,
+    lookup_stage,
+    parse_stage,
+    top_stage,
+)
+from app.crawler import (
+    abort_wrapper,
+    close_feeder_content,
+    crawl_feeder_content_cached,
+    parse_feeder_content,
+    parse_feeder_content_pooled,
+    parse_feeder_content_stream,
+)
+from app.crawler.feed_cache import (
+    FeedValidator,
+    get_cache_stats,
+    reset_cache_stats,
+    save_feed_validator,
+)
+from app.db.episode_filter import (
+    KnownEpisodes,
+    add_saved_episodes,
+    get_episode_filter,
+    prepare_episode_filter,
+)
 from app.db.operations import (
     get_all_deleted_itunes_program,
     get_all_episode_by_program_v3,
@@ -55,6 +86,7 @@ from app.db.operations import (
     get_rssimport_program_by_rss_data,
     insert_count_entries,
     insert_episode,
+    insert_episodes,
     insert_itunes_genre,
     insert_itunes_program_itunes_genres,
     insert_producer,
@@ -65,25 +97,34 @@ from app.db.operations import (
     update_program_latest,
     update_program_recovery,
 )
+from app.db.writer import start_writer_service, stop_writer_service
+from app.feed_parser.engine import get_stream_backend
 from app.feed_parser.formatter import string_formatter
 from app.feed_parser.helper import (
     get_feed_author_email_field,
     get_feed_author_name_field,
     get_feed_data_uri_field,
-    get_feed_description_description,
-    get_feed_duration_field,
     get_feed_entries_field,
     get_feed_field,
     get_feed_img_url,
-    get_feed_release_date_field,
-    get_feed_tag_field,
-    get_feed_title_field,
     is_good_feed_dict,
 )
+from app.feed_parser.parse_pool import (
+    EpisodeRecord,
+    ParsedEntries,
+    get_parse_service,
+    iter_episode_records,
+    start_parse_service,
+    stop_parse_service,
+)
+from app.feed_parser.stream import EntryStopper
+from app.pipeline import Pipeline, Stage
+from app.retry_scheduler import KIND_GENRE, KIND_LOOKUP, RetryScheduler
 from config.constants import ITUNES_COLLECTION_PATH, ITUNES_TAGS_FILE_PATH, PROJECT_PATH
 from config.loader import execution
 from core.common.fs_utils import read_file, write_file
 from core.common.string import is_empty_string, to_utf8_string, trim_string
+from core.db import connection
 from core.db.utils import Error as DBError
 from log_helper.async_logger import get_async_logger
 
@@ -108,6 +149,7 @@ def get_exclude_program_list(file_path: str) -> List[str]:
         raise Exception("Unexpected error, %s" % (exc,)) from exc
 
 
+@metrics.timed("file.update_exclude_program_list")
 def update_exclude_program_list(file_path: str, program_string: str) -> str:
     exclusion_list = write_file(file_path, program_string, mode="a")
     return str(exclusion_list)
@@ -227,16 +269,24 @@ def create_start_message() -> str:
 
 @calc_deco()
 def entry_point():
+    if execution.runner.pipeline_mode:
+        return entry_point_pipeline()
+
     itunes_tags_fp = ITUNES_TAGS_FILE_PATH
     process_num = execution.runner.process_num
 
     logger.info(create_start_message())
 
+    reset_cache_stats()
+    metrics.start_run()
+    run_start_time = timeit.default_timer()
+
     manager = Manager()
 
     collection_dict = manager.dict()
     retry_dict = manager.dict()
     cost_list = manager.list()
+    top_cost_list = manager.list()
     producer_dict = manager.dict()
     sleep_dict = manager.dict()
 
@@ -260,16 +310,16 @@ def entry_point():
         logger.info("itunes genre empty")
         return
 
-    func = partial(get_top, collection_dict, retry_dict, cost_list, collection_list)
-    pool = Pool(processes=process_num)
-    results = pool.map(func, genre_ids)
-    pool.close()
-    pool.join()
-
-    logger.info(
-        "LOG SPOT 117 - crawl_cost: %s",
-        str(sort_list_by_key(list(cost_list), "cost_time", 0, True)),
-    )
+    # top lists only, lookup is dispatched once per unique collection id afterwards
+    use_async = execution.runner.fetch_engine == "async"
+    if use_async:
+        results = get_top_lists_concurrently(top_cost_list, genre_ids)
+    else:
+        func = partial(get_top_list, top_cost_list)
+        pool = Pool(processes=process_num)
+        results = pool.map(func, genre_ids)
+        pool.close()
+        pool.join()
 
     # check results, if any genre_id"s data empty, arrange it into lost_genres
     lost_genres = []
@@ -283,33 +333,81 @@ def entry_point():
     logger.info("LOG SPOT 132 - exec gc %s", gc.collect())
     logger.info("LOG SPOT 115 - retry top_data count: %s", str(len(lost_genres)))
 
-    while len(lost_genres) > 0:
-        logger.info("LOG SPOT 116 - retry top_data: %s", str(lost_genres))
-        for genre_id in copy.copy(lost_genres):
-            logger.info("LOG SPOT 121 - retry genre_id: %s", str(genre_id))
-            result = get_top(
-                collection_dict, retry_dict, cost_list, collection_list, genre_id
+    retry_scheduler = RetryScheduler.from_config()
+    for genre_id in lost_genres:
+        retry_scheduler.schedule(KIND_GENRE, genre_id)
+
+    while retry_scheduler:
+        for item in retry_scheduler.wait_due():
+            logger.info(
+                "LOG SPOT 121 - retry genre_id: %s, attempt: %s", item.key, item.attempt
             )
-            if result:
-                logger.info("LOG SPOT 122 - %s retry ok", str(genre_id))
-                results.append({genre_id: result})
-                lost_genres[:] = [g_id for g_id in lost_genres if g_id != genre_id]
+            result = get_top_list(top_cost_list, item.key)
+            if result.get(item.key):
+                logger.info("LOG SPOT 122 - %s retry ok", str(item.key))
+                results.append(result)
+            else:
+                retry_scheduler.schedule(KIND_GENRE, item.key)
+
+    logger.info(
+        "LOG SPOT 139 - top_cost: %s",
+        str(sort_list_by_key(list(top_cost_list), "cost_time", 0, True)),
+    )
+
+    # lookup block, every collection id is looked up once even if it charts in several genres
+    genre_dict = collect_unique_collection_ids(results, collection_list)
+    collection_ids = list(genre_dict)
+    logger.info("LOG SPOT 137 - unique collection count: %s", len(collection_ids))
+
+    if use_async:
+        get_details_concurrently(
+            collection_dict,
+            retry_dict,
+            collection_ids,
+            cost_list=cost_list,
+            genre_dict=genre_dict,
+        )
+    else:
+        func_batch = partial(
+            get_detail_batch,
+            collection_dict,
+            retry_dict,
+            cost_list=cost_list,
+            genre_dict=genre_dict,
+        )
+        pool = Pool(processes=process_num)
+        # each process takes chunks for all of its lookup threads at once
+        slice_size = (
+            execution.config.lookup_batch_size * execution.runner.lookup_thread_num
+        )
+        pool.map(func_batch, chunk_list(collection_ids, slice_size))
+        pool.close()
+        pool.join()
+
+    logger.info(
+        "LOG SPOT 117 - crawl_cost: %s",
+        str(sort_list_by_key(list(cost_list), "cost_time", 0, True)),
+    )
 
     # retry block for collection
     logger.info("LOG SPOT 110 - retry_dict count: %s", len(retry_dict))
 
     if retry_dict:
         logger.info("LOG SPOT 111 - retry_dict happen %s", str(retry_dict))
-        retry_count = 3
-        while retry_count > 0:
-            logger.info("LOG SPOT 120 - retry_count %s", str(retry_count))
-            func_detail = partial(get_detail, collection_dict, retry_dict)
-            retry_list = [c_id for c_id, _ in list(retry_dict.items())]
-            pool = Pool(processes=process_num)
+        func_detail = partial(get_detail, collection_dict, retry_dict)
+        pool = Pool(processes=process_num)
+        while True:
+            for collection_id in drain_retry_dict(retry_dict):
+                retry_scheduler.schedule(KIND_LOOKUP, collection_id)
+            if not retry_scheduler:
+                break
+            retry_list = [item.key for item in retry_scheduler.wait_due()]
+            logger.info("LOG SPOT 120 - retry lookup count %s", len(retry_list))
             pool.map(func_detail, retry_list)
-            pool.close()
-            pool.join()
-            retry_count -= 1
+        pool.close()
+        pool.join()
+
+    logger.info("LOG SPOT 138 - retry report: %s", retry_scheduler.report())
 
     logger.info("LOG SPOT 133 - exec gc %s", gc.collect())
     logger.info("LOG SPOT 113 - save rank data")
@@ -340,6 +438,28 @@ def entry_point():
     logger.info("LOG SPOT 134 - exec gc %s", gc.collect())
     logger.info("LOG SPOT 114 - save new program")
 
+    # parser workers are forked before the create pool, which inherits the service
+    if execution.runner.parse_workers > 0:
+        start_parse_service(
+            execution.runner.parse_workers,
+            execution.runner.parse_chunk_size,
+            manager,
+            get_stream_backend(),
+            execution.config.fetch_rss_timeout,
+        )
+
+    # writers are forked before the create pool as well, see parse service
+    if execution.runner.writer_workers > 0:
+        start_writer_service(
+            execution.runner.writer_workers,
+            execution.runner.writer_batch_size,
+            manager,
+            execution.config.insert_episode_timeout,
+        )
+
+    # shared with the create pool as well
+    prepare_episode_filter()
+
     async_dict = {}
     pool = Pool(processes=process_num)
     for collection_id in collection_ids:
@@ -371,6 +491,208 @@ def entry_point():
                 str(e),
             )
 
+    stop_parse_service()
+    stop_writer_service()
+
+    logger.info("LOG SPOT 136 - feed cache stats: %s", get_cache_stats())
+    finish_run_metrics(run_start_time, retry_scheduler)
+
+
+def finish_run_metrics(run_start_time: float, retry_scheduler: RetryScheduler):
+    """
+    Add run level values, then log and save the summary of all processes
+    """
+    metrics.observe("run.total", timeit.default_timer() - run_start_time)
+    for name, value in get_cache_stats().items():
+        metrics.gauge(f"feed_cache.{name}", value)
+    metrics.gauge("retry.dropped", len(retry_scheduler.dropped))
+    metrics.end_run()
+
+
+def drain_retry_dict(retry_dict: DictProxy) -> List:
+    """
+    Move failed collection ids out of retry_dict, retry_scheduler counts attempts instead
+    """
+    collection_ids = list(retry_dict.keys())
+    for collection_id in collection_ids:
+        retry_dict.pop(collection_id, None)
+    return collection_ids
+
+
+def entry_point_pipeline():
+    """
+    Streaming mode: top -> lookup -> fetch -> parse -> persist, every stage runs concurrently,
+    a collection starts ingesting as soon as its lookup returns
+    """
+    itunes_tags_fp = ITUNES_TAGS_FILE_PATH
+    pipeline_workers = execution.runner.pipeline_workers
+    queue_size = execution.runner.pipeline_queue_size
+
+    logger.info(create_start_message())
+
+    reset_cache_stats()
+    metrics.start_run()
+    run_start_time = timeit.default_timer()
+
+    manager = Manager()
+
+    retry_dict = manager.dict()
+    producer_dict = manager.dict()
+    sleep_dict = manager.dict()
+    seen_dict = manager.dict()
+    lost_genres = manager.list()
+    sql_lock = manager.Lock()
+
+    logger.info("LOG SPOT 119 - get program and producer")
+
+    collection_list = set(get_collection_list_by_itunes_program())
+
+    deleted_collection_ids = get_deleted_collection_id_list_by_itunes_program()
+
+    producer_dict.update(create_itunes_producer_dict(get_all_itunes_producer()))
+
+    logger.info("update tag file")
+    sync_tag_data_from_db(itunes_tags_fp)
+
+    genre_ids = get_available_itunes_genre_id_list()
+    if not genre_ids:
+        logger.info("itunes genre empty")
+        return
+
+    pipeline = Pipeline(
+        [
+            Stage(
+                "top",
+                partial(
+                    top_stage,
+                    lost_genres,
+                    seen_dict,
+                    collection_list,
+                    sql_lock,
+                    sleep_dict,
+                ),
+                pipeline_workers.get("top", 1),
+                queue_size,
+            ),
+            Stage(
+                "lookup",
+                partial(lookup_stage, retry_dict),
+                pipeline_workers.get("lookup", 1),
+                queue_size,
+            ),
+            Stage(
+                "fetch",
+                partial(fetch_stage, deleted_collection_ids),
+                pipeline_workers.get("fetch", 1),
+                queue_size,
+            ),
+            Stage("parse", parse_stage, pipeline_workers.get("parse", 1), queue_size),
+            Stage(
+                "persist",
+                partial(
+                    persist_stage,
+                    sql_lock,
+                    sleep_dict,
+                    collection_list,
+                    producer_dict,
+                    deleted_collection_ids,
+                ),
+                pipeline_workers.get("persist", 1),
+                queue_size,
+            ),
+        ]
+    )
+    top, lookup, fetch, parse, persist = pipeline.stages
+    retry_scheduler = RetryScheduler.from_config()
+
+    logger.info("crawl itunes data start (pipeline)")
+
+    prepare_episode_filter()
+    if execution.runner.writer_workers > 0:
+        start_writer_service(
+            execution.runner.writer_workers,
+            execution.runner.writer_batch_size,
+            manager,
+            execution.config.insert_episode_timeout,
+        )
+    pipeline.start()
+    try:
+        for genre_id in genre_ids:
+            top.put(genre_id)
+
+        # retry block, failed genres and collections go through retry_scheduler,
+        # fetch / parse / persist keep working meanwhile
+        while True:
+            pipeline.wait_settled(lookup)
+
+            retry_genres = list(lost_genres)
+            del lost_genres[:]
+            for genre_id in retry_genres:
+                retry_scheduler.schedule(KIND_GENRE, genre_id)
+            for collection_id in drain_retry_dict(retry_dict):
+                retry_scheduler.schedule(KIND_LOOKUP, collection_id)
+
+            if not retry_scheduler:
+                break
+
+            retry_items = retry_scheduler.wait_due()
+            retry_collection_ids = []
+            # items are ordered by priority, genres first
+            for item in retry_items:
+                if item.kind == KIND_GENRE:
+                    logger.info("LOG SPOT 116 - retry genre_id: %s", item.key)
+                    top.put(item.key)
+                else:
+                    retry_collection_ids.append(item.key)
+            logger.info(
+                "LOG SPOT 120 - retry lookup count %s", len(retry_collection_ids)
+            )
+            for chunk in chunk_list(
+                retry_collection_ids, execution.config.lookup_batch_size
+            ):
+                lookup.put(chunk)
+
+        pipeline.join(top)
+        pipeline.join(lookup)
+
+        for stage in (fetch, parse, persist):
+            pipeline.join(stage)
+
+    finally:
+        pipeline.terminate()
+        stop_writer_service()
+
+    logger.info("LOG SPOT 135 - pipeline end")
+    logger.info("LOG SPOT 138 - retry report: %s", retry_scheduler.report())
+    logger.info("LOG SPOT 136 - feed cache stats: %s", get_cache_stats())
+    finish_run_metrics(run_start_time, retry_scheduler)
+
+
+def persist_stage(
+    lock: BaseProxy,
+    sleep_dict: DictProxy,
+    collection_list,
+    producer_dict: DictProxy,
+    deleted_collection_ids: List,
+    item: Tuple,
+    emit,
+) -> None:
+    """
+    Pipeline stage: save parsed feed as a new program, the last stage
+    """
+    collection_id, detail, feed_result, feed_validator = item
+    handle_create_timeout(
+        lock,
+        sleep_dict,
+        {collection_id: detail},
+        collection_list,
+        producer_dict,
+        collection_id,
+        deleted_collection_ids,
+        feed_result,
+        feed_validator,
+    )
+
 
 def handle_create_timeout(
     lock: BaseProxy,
@@ -380,6 +702,8 @@ def handle_create_timeout(
     producer_dict: DictProxy,
     collection_id: str,
     deleted_collection_ids,
+    feed_result: Optional[FeedParserDict] = None,
+    feed_validator: Optional[FeedValidator] = None,
 ):
     timeout = execution.config.create_program_timeout
 
@@ -394,12 +718,17 @@ def handle_create_timeout(
         producer_dict,
         collection_id,
         deleted_collection_ids,
+        feed_result,
+        feed_validator,
         timeout=timeout,
+        # the abandoned thread may be inside a transaction of the shared connection
+        timeout_executes=[{"func": connection.discard}],
     )
 
     return None
 
 
+@metrics.timed("stage.create_program")
 def handle_create(
     lock: BaseProxy,
     sleep_dict: DictProxy,
@@ -408,7 +737,13 @@ def handle_create(
     producer_dict: DictProxy,
     collection_id: str,
     deleted_collection_ids: List,
+    feed_result: Optional[FeedParserDict] = None,
+    feed_validator: Optional[FeedValidator] = None,
 ):
+    """
+    feed_result: already parsed feed (pipeline mode), crawl feed by itself if None
+    feed_validator: saved when the feed reaches a final outcome, so the unchanged feed is skipped next run
+    """
     try:
         rss_time_limit = execution.config.fetch_rss_timeout
         insert_time_limit = execution.config.insert_episode_timeout
@@ -460,12 +795,45 @@ def handle_create(
             feed_url,
         )
 
-        feed_result: FeedParserDict = crawl_feeder(url=feed_url)
+        if feed_result is None:
+            # entries are parsed while the body is read, unless they all are needed anyway
+            stream = (
+                collection_id not in deleted_collection_ids
+                and get_parse_service() is None
+                and execution.config.stream_parse["enabled"]
+            )
+            # a deleted program is recovered from the feed even if it is unchanged
+            download = crawl_feeder_content_cached(
+                url=feed_url,
+                use_cache=collection_id not in deleted_collection_ids,
+                stream=stream,
+            )
+            if download is not None and download.not_modified:
+                logger.info(
+                    "feed_not_modified! %s skip, feed_url %s", collection_id, feed_url
+                )
+                return None
+            if download is not None:
+                # recovery needs every entry, the others only read entries until known ones
+                if collection_id in deleted_collection_ids:
+                    feed_result = parse_feeder_content(download.content)
+                elif get_parse_service() is not None:
+                    feed_result = parse_feeder_content_pooled(download.content)
+                elif stream:
+                    feed_result = parse_feeder_content_stream(download.content)
+                else:
+                    feed_result = parse_feeder_content(download.content)
+                # the body of a failed streamed download is not known yet
+                if feed_result is not None:
+                    feed_validator = download.validator
+
         if not is_good_feed_dict(feed_result):
             logger.info("crawl_feeder func something error")
+            save_feed_validator(feed_validator)
             return None
 
         if not feed_result.entries:
+            save_feed_validator(feed_validator)
             raise Exception("ep_empty! %s does not have episode" % (collection_id,))
 
         logger.info(
@@ -564,16 +932,46 @@ def handle_create(
         if collection_id not in deleted_collection_ids:
             # 只在一般 insert flow 進行，如果是已刪除的 itunes program, 因為不會用到這包 episode_list 故不再浪費時間跑這段
             # -------------------- start convert episode --------------------
-            for entry in feed_entries:
+            stream_parse_config = execution.config.stream_parse
+            entry_stopper = EntryStopper(
+                max_known=stream_parse_config["max_known_entries"],
+                track_watermark=stream_parse_config["stop_at_watermark"],
+            )
+            # saved episodes are queried once, only if the episode filter can not rule them out
+            known_uris = KnownEpisodes(collection_id, get_episode_filter())
+            # entries parsed by parse service are already converted
+            if isinstance(feed_entries, ParsedEntries):
+                episode_records = feed_entries
+            else:
+                episode_records = iter_episode_records(feed_entries)
+            for record in episode_records:
                 try:
+                    if isinstance(record, Exception):
+                        raise record
                     episode_dict = handle_new_entry(
                         lock=lock,
                         sleep_dict=sleep_dict,
-                        entry=entry,
+                        record=record,
                         collection_id=collection_id,
                         feed_image=feed_image,
+                        known_uris=known_uris,
                     )
-                    if episode_dict is not None:
+                    if episode_dict is None:
+                        if entry_stopper.add_known(record.release_date):
+                            logger.info(
+                                "known_entries! %s stop after %s known entries",
+                                collection_id,
+                                entry_stopper.known_count,
+                            )
+                            break
+                    elif entry_stopper.add_new(episode_dict["release_date"]):
+                        logger.info(
+                            "known_entries! %s stop before watermark %s",
+                            collection_id,
+                            entry_stopper.watermark,
+                        )
+                        break
+                    else:
                         episode_list.append(episode_dict)
 
                 except FeedResultException as exc:
@@ -602,11 +1000,17 @@ def handle_create(
                     break
             # -------------------- end convert episode --------------------
 
+            if getattr(feed_entries, "incomplete", False):
+                # the body was cut off, read the whole feed again next run
+                logger.info("feed_incomplete! %s entries end early", collection_id)
+                feed_validator = None
+
             if not episode_list:
                 logger.info(
                     "empty_episode_error! %s does not have invalid episode",
                     collection_id,
                 )
+                save_feed_validator(feed_validator)
                 return None
 
         # -------------------- start insert program --------------------
@@ -656,16 +1060,19 @@ def handle_create(
                 message="%s (Rss Import Program Id %s)(insert daemon)"
                 % (rssimport_program_title, rssimport_program_id),
             )
+            save_feed_validator(feed_validator)
             return None
 
         if collection_id in deleted_collection_ids:
             # try recovery process
-            return recovery_one_itunes_program(
+            recovery_result = recovery_one_itunes_program(
                 collection_id=collection_id,
                 feed_entries=feed_entries,
                 lock=lock,
                 sleep_dict=sleep_dict,
             )
+            save_feed_validator(feed_validator)
+            return recovery_result
 
         program_id, itunes_program_id = insert_program(
             producer_id=producer_id,
@@ -776,45 +1183,77 @@ def handle_create(
         file_episode_list = []
 
         # -------------------- start insert episode --------------------
-        for epi in episode_list:
-            try:
-                ep_id = insert_episode(
-                    title=epi.get("episode_title"),
-                    description=epi.get("episode_description"),
-                    data_uri=epi.get("data_uri"),
-                    program_id=program_id,
-                    i_program_id=collection_id,
-                    duration=epi.get("duration"),
-                    release_date=epi.get("release_date"),
-                    tags=epi.get("tags"),
-                    img_url=epi.get("img_url"),
-                    lock=lock,
-                    sleep_dict=sleep_dict,
-                )
-                logger.info("LOG SPOT 106 - insert_episode, ep_id: %s", str(ep_id))
-
-                file_episode_list.append(
+        try:
+            ep_ids = insert_episodes(
+                program_id=program_id,
+                i_program_id=collection_id,
+                episodes=[
                     {
-                        "ep_id": ep_id,
+                        "title": epi.get("episode_title"),
+                        "description": epi.get("episode_description"),
                         "data_uri": epi.get("data_uri"),
-                        "episode_title": epi.get("episode_title"),
-                        "episode_description": epi.get("episode_description"),
-                        "img_url": epi.get("img_url"),
+                        "duration": epi.get("duration"),
                         "release_date": epi.get("release_date"),
+                        "tags": epi.get("tags"),
+                        "img_url": epi.get("img_url"),
                     }
-                )
+                    for epi in episode_list
+                ],
+                lock=lock,
+                sleep_dict=sleep_dict,
+            )
+            logger.info("LOG SPOT 106 - insert_episodes, count: %s", len(ep_ids))
+            inserted_episodes = list(zip(ep_ids, episode_list))
 
-                # the compare second should be less than aborting second subtract sql lock second, e.g 300 - (30 x 2)
-                if timeit.default_timer() - start_time > insert_time_limit:
-                    break
+        except DatabaseInsertError as exc:
+            logger.info(
+                "insert_episodes_error! %s, insert one by one: %s", collection_id, exc
+            )
+            inserted_episodes = []
+            for epi in episode_list:
+                try:
+                    ep_id = insert_episode(
+                        title=epi.get("episode_title"),
+                        description=epi.get("episode_description"),
+                        data_uri=epi.get("data_uri"),
+                        program_id=program_id,
+                        i_program_id=collection_id,
+                        duration=epi.get("duration"),
+                        release_date=epi.get("release_date"),
+                        tags=epi.get("tags"),
+                        img_url=epi.get("img_url"),
+                        lock=lock,
+                        sleep_dict=sleep_dict,
+                    )
+                    logger.info("LOG SPOT 106 - insert_episode, ep_id: %s", str(ep_id))
+                    inserted_episodes.append((ep_id, epi))
 
-            except Exception as e:
-                logger.info(
-                    "insert_episode_error! %s, %s insert error: %s",
-                    collection_id,
-                    epi.get("data_uri"),
-                    str(e),
-                )
+                    # the compare second should be less than aborting second subtract sql lock second, e.g 300 - (30 x 2)
+                    if timeit.default_timer() - start_time > insert_time_limit:
+                        break
+
+                except Exception as e:
+                    logger.info(
+                        "insert_episode_error! %s, %s insert error: %s",
+                        collection_id,
+                        epi.get("data_uri"),
+                        str(e),
+                    )
+
+        add_saved_episodes(
+            collection_id, [epi.get("data_uri") for _, epi in inserted_episodes]
+        )
+        for ep_id, epi in inserted_episodes:
+            file_episode_list.append(
+                {
+                    "ep_id": ep_id,
+                    "data_uri": epi.get("data_uri"),
+                    "episode_title": epi.get("episode_title"),
+                    "episode_description": epi.get("episode_description"),
+                    "img_url": epi.get("img_url"),
+                    "release_date": epi.get("release_date"),
+                }
+            )
         # -------------------- end insert episode --------------------
 
         # -------------------- start insert itunes statistic --------------------
@@ -866,12 +1305,15 @@ def handle_create(
             )
         # -------------------- end generate file --------------------
 
+        save_feed_validator(feed_validator)
+
         logger.info(
             "end_collection! %s cost %s sec", collection_id, diff_time(start_time)
         )
 
     except FeedResultException as exc:
         logger.info("feed result error, collection_id: %s, %s", collection_id, exc)
+        save_feed_validator(feed_validator)
 
     except ItunesDataError as exc:
         logger.info("itunes data error, collection_id: %s, %s", collection_id, exc)
@@ -895,41 +1337,40 @@ def handle_create(
             traceback.format_exc(10),
         )
 
+    finally:
+        # entries may stop before the end of a streamed body, release its connection
+        if feed_result is not None:
+            close_feeder_content(feed_result.get("entries"))
+
 
 # fix - add feed.image arg for compare entry.image
 def handle_new_entry(
-    lock, sleep_dict, entry, collection_id, feed_image
+    lock,
+    sleep_dict,
+    record: EpisodeRecord,
+    collection_id,
+    feed_image,
+    known_uris: Optional[Container[str]] = None,
 ) -> Optional[Dict]:
+    """
+    known_uris: i_ep_id already saved for collection, queried per entry if None
+    """
     itunes_tags_file_path = ITUNES_TAGS_FILE_PATH
 
-    # require fields
-    data_uri = get_feed_data_uri_field(entry)
-    title = get_feed_title_field(entry)
-    release_date = get_feed_release_date_field(entry)
-    duration = get_feed_duration_field(entry)
-
-    # allow empty fields
-    try:
-        description = get_feed_description_description(entry)
-    except (FeedResultFieldNotFoundError, IndexError) as exc:
-        logger.debug("description not found, %s", exc)
-        description = ""
-
-    try:
-        # compare entry.image is same as feed.image, if not, then entry has alone episode cover.
-        img_url = get_feed_img_url(feed_field=entry)
-        image_url = img_url if img_url != feed_image else None
-    except FeedResultFieldNotFoundError as exc:
-        logger.debug("img_url not found, %s", exc)
+    data_uri = record.data_uri
+    tags = record.tags
+    # compare entry.image is same as feed.image, if not, then entry has alone episode cover.
+    if record.img_url is None:
         image_url = feed_image
-
-    try:
-        tags = get_feed_tag_field(entry)
-    except (FeedResultFieldNotFoundError, FormatterException) as exc:
-        logger.debug("tags not found, %s", exc)
-        tags = []
-
-    itunes_episode = get_itunes_episode(data_uri=data_uri, collection_id=collection_id)
+    else:
+        image_url = record.img_url if record.img_url != feed_image else None
+
+    if known_uris is not None:
+        itunes_episode = data_uri in known_uris
+    else:
+        itunes_episode = get_itunes_episode(
+            data_uri=data_uri, collection_id=collection_id
+        )
     if itunes_episode:
         logger.info(
             "exist data_uri, collection_id: %s, data_uri: %s", collection_id, data_uri
@@ -971,10 +1412,10 @@ def handle_new_entry(
 
     return {
         "data_uri": data_uri,
-        "episode_title": title,
-        "episode_description": description,
-        "duration": duration,
-        "release_date": release_date,
+        "episode_title": record.title,
+        "episode_description": record.description,
+        "duration": record.duration,
+        "release_date": record.release_date,
         "tags": list(tag_ids),
         "img_url": image_url,
     }
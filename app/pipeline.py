@@ -0,0 +1,157 @@
+import multiprocessing
+import os
+import time
+import traceback
+from typing import Any, Callable, List, Optional
+
+from app.common import metrics
+from log_helper.async_logger import get_async_logger
+
+logger = get_async_logger(__name__)
+
+# sentinel for stopping stage worker, must survive pickling through queue
+_STOP = None
+
+
+class Stage:
+    """
+    A group of worker processes that consume items from one bounded queue
+
+    handler(item, emit) process one item, emit(item) submit an item to the next stage
+    """
+
+    def __init__(
+        self, name: str, handler: Callable, workers: int = 1, queue_size: int = 100
+    ):
+        if workers < 1:
+            raise ValueError("stage %s require at least one worker" % (name,))
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue = multiprocessing.Queue(maxsize=queue_size)
+        # number of items put but not processed completely yet
+        self.pending = multiprocessing.Value("i", 0)
+        self.next: Optional["Stage"] = None
+        self.processes: List[multiprocessing.Process] = []
+        self.stopped = False
+
+    def put(self, item: Any) -> None:
+        # count first, so stage never looks idle while an item is in flight
+        with self.pending.get_lock():
+            self.pending.value += 1
+        self.queue.put(item)
+
+    def emit(self, item: Any) -> None:
+        if self.next is not None:
+            self.next.put(item)
+
+    def task_done(self) -> None:
+        with self.pending.get_lock():
+            self.pending.value -= 1
+
+    def is_idle(self) -> bool:
+        return self.pending.value <= 0
+
+    def start(self) -> None:
+        for num in range(self.workers):
+            process = multiprocessing.Process(
+                target=_run_stage_worker,
+                args=(self,),
+                name=f"{self.name}-{num}",
+            )
+            process.start()
+            self.processes.append(process)
+
+    def stop(self) -> None:
+        for _ in self.processes:
+            self.queue.put(_STOP)
+        for process in self.processes:
+            process.join()
+        self.stopped = True
+
+
+def _run_stage_worker(stage: Stage) -> None:
+    logger.debug("stage worker start, stage: %s, pid: %s", stage.name, os.getpid())
+    while True:
+        item = stage.queue.get()
+        if item is _STOP:
+            break
+        try:
+            with metrics.Timer(f"pipeline.{stage.name}"):
+                stage.handler(item, stage.emit)
+        except Exception as _:
+            metrics.incr(f"pipeline.{stage.name}.error")
+            logger.error(
+                "stage handler unexpected error, stage: %s, %s",
+                stage.name,
+                traceback.format_exc(10),
+            )
+        finally:
+            stage.task_done()
+    logger.debug("stage worker end, stage: %s, pid: %s", stage.name, os.getpid())
+
+
+class Pipeline:
+    """
+    Stages linked by bounded queues, every stage works concurrently
+
+    Usage:
+        pipeline = Pipeline([Stage("a", ...), Stage("b", ...)])
+        pipeline.start()
+        pipeline.stages[0].put(item)
+        for stage in pipeline.stages:
+            pipeline.join(stage)
+    """
+
+    def __init__(self, stages: List[Stage], poll_interval: float = 0.5):
+        if not stages:
+            raise ValueError("pipeline require at least one stage")
+        self.stages = stages
+        self.poll_interval = poll_interval
+        for current_stage, next_stage in zip(stages, stages[1:]):
+            current_stage.next = next_stage
+
+    def get_stage(self, name: str) -> Stage:
+        stage = next((stage for stage in self.stages if stage.name == name), None)
+        if stage is None:
+            raise KeyError("stage %s not found" % (name,))
+        return stage
+
+    def start(self) -> None:
+        for stage in self.stages:
+            stage.start()
+
+    def _check_upstream_stopped(self, stage: Stage) -> None:
+        for upstream in self.stages[: self.stages.index(stage)]:
+            if not upstream.stopped:
+                raise RuntimeError(
+                    "upstream stage %s still running, can not drain %s"
+                    % (upstream.name, stage.name)
+                )
+
+    def wait_idle(self, stage: Stage) -> None:
+        """block until stage has no pending item, upstream must be stopped"""
+        self._check_upstream_stopped(stage)
+        while not stage.is_idle():
+            time.sleep(self.poll_interval)
+
+    def wait_settled(self, stage: Stage) -> None:
+        """
+        block until stage and all upstream stages have no pending item, upstream may keep
+        running, caller must be the only one who puts into them
+        """
+        for current_stage in self.stages[: self.stages.index(stage) + 1]:
+            while not current_stage.is_idle():
+                time.sleep(self.poll_interval)
+
+    def join(self, stage: Stage) -> None:
+        """drain stage and stop its workers"""
+        self.wait_idle(stage)
+        stage.stop()
+        logger.info("stage %s finished", stage.name)
+
+    def terminate(self) -> None:
+        for stage in self.stages:
+            for process in stage.processes:
+                if process.is_alive():
+                    process.terminate()
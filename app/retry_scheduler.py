@@ -0,0 +1,115 @@
+import heapq
+import itertools
+import random
+import time
+from collections import namedtuple
+from typing import Any, Dict, List, Optional
+
+from config.loader import execution
+from log_helper.async_logger import get_async_logger
+
+logger = get_async_logger(__name__)
+
+# lower value runs first, genre top data is needed before its collections can be looked up
+PRIORITY_GENRE = 0
+PRIORITY_LOOKUP = 1
+
+KIND_GENRE = "genre"
+KIND_LOOKUP = "lookup"
+
+_PRIORITIES = {KIND_GENRE: PRIORITY_GENRE, KIND_LOOKUP: PRIORITY_LOOKUP}
+
+RetryItem = namedtuple("RetryItem", ["kind", "key", "attempt", "priority", "due"])
+
+
+class RetryScheduler:
+    """
+    Delay queue for failed work, lives in the main process
+
+    every key is retried with jittered exponential backoff until max_attempts,
+    then it is dropped and shows in report()
+
+    Usage:
+        scheduler.schedule(KIND_GENRE, genre_id)
+        while scheduler:
+            for item in scheduler.wait_due():
+                ...
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 2.0,
+        max_delay: float = 60.0,
+        jitter: float = 0.5,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self._heap: List = []
+        self._counter = itertools.count()
+        self._attempts: Dict = {}
+        self.retried = 0
+        self.dropped: List[Dict] = []
+
+    @classmethod
+    def from_config(cls) -> "RetryScheduler":
+        config = execution.config.retry_scheduler
+        return cls(
+            max_attempts=config["max_attempts"],
+            base_delay=config["base_delay"],
+            max_delay=config["max_delay"],
+            jitter=config["jitter"],
+        )
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def compute_delay(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return delay * (1 - self.jitter * random.random())
+
+    def schedule(self, kind: str, key: Any, priority: Optional[int] = None) -> bool:
+        """
+        Add a failed key, return False if it runs out of attempts and is dropped
+        """
+        attempt = self._attempts.get((kind, key), 0) + 1
+        self._attempts[(kind, key)] = attempt
+
+        if attempt > self.max_attempts:
+            logger.info("retry dropped, kind: %s, key: %s", kind, key)
+            self.dropped.append({"kind": kind, "key": key, "attempts": attempt - 1})
+            return False
+
+        if priority is None:
+            priority = _PRIORITIES.get(kind, PRIORITY_LOOKUP)
+        due = time.time() + self.compute_delay(attempt)
+        item = RetryItem(kind, key, attempt, priority, due)
+        heapq.heappush(self._heap, (due, priority, next(self._counter), item))
+        return True
+
+    def pop_due(self, now: Optional[float] = None) -> List[RetryItem]:
+        """pop every due item, ordered by priority"""
+        now = time.time() if now is None else now
+        items = []
+        while self._heap and self._heap[0][0] <= now:
+            items.append(heapq.heappop(self._heap)[-1])
+        self.retried += len(items)
+        return sorted(items, key=lambda item: (item.priority, item.due))
+
+    def wait_due(self) -> List[RetryItem]:
+        """block until the earliest item is due, then pop every due item"""
+        if not self._heap:
+            return []
+        wait = self._heap[0][0] - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        return self.pop_due()
+
+    def report(self) -> Dict:
+        return {
+            "pending": len(self._heap),
+            "retried": self.retried,
+            "dropped": list(self.dropped),
+        }
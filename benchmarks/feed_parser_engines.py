@@ -0,0 +1,178 @@
+"""
+Side by side correctness and speed of feed parser engines, feedparser is the reference
+
+    PROD=local python -m benchmarks.feed_parser_engines --episodes 10 100 1000
+    PROD=local python -m benchmarks.feed_parser_engines --feeds-dir data/feed_archive
+
+correctness compares the output of every get_feed_* helper, field by field, so a
+mismatch means handle_create would save something different
+"""
+
+import argparse
+import glob
+import gzip
+import os
+import timeit
+from typing import Callable, Dict, List, Tuple
+
+from rich.console import Console
+from rich.table import Table
+
+from benchmarks.stand_in import StandInConfig, create_feed
+
+os.environ.setdefault("PROD", "local")
+
+ENTRY_GETTER_NAMES = [
+    "get_feed_data_uri_field",
+    "get_feed_title_field",
+    "get_feed_release_date_field",
+    "get_feed_duration_field",
+    "get_feed_description_description",
+    "get_feed_img_url",
+    "get_feed_tag_field",
+]
+FEED_GETTER_NAMES = [
+    "get_feed_img_url",
+    "get_feed_author_name_field",
+    "get_feed_author_email_field",
+]
+
+
+def load_feeds(args: argparse.Namespace) -> Dict[str, bytes]:
+    feeds = {}
+    for episodes in args.episodes:
+        config = StandInConfig(episodes=episodes)
+        feeds[f"generated_{episodes}"] = create_feed(config, "http://127.0.0.1", 1)
+    if args.feeds_dir:
+        for fp in sorted(glob.glob(os.path.join(args.feeds_dir, "*.xml"))):
+            with open(fp, "rb") as file:
+                feeds[os.path.basename(fp)] = file.read()
+        # blobs of app.crawler.feed_archive
+        pattern = os.path.join(args.feeds_dir, "**", "*.xml.gz")
+        for fp in sorted(glob.glob(pattern, recursive=True)):
+            with gzip.open(fp, "rb") as file:
+                feeds[os.path.basename(fp)] = file.read()
+    return feeds
+
+
+def call_getter(getter: Callable, field: Dict):
+    try:
+        return getter(field)
+    except Exception as exc:
+        # the same exception type is also a match
+        return exc.__class__.__name__
+
+
+def compare_result(name: str, expected, actual) -> List[Tuple]:
+    from app.feed_parser import helper
+
+    mismatches = []
+    for getter_name in FEED_GETTER_NAMES:
+        getter = getattr(helper, getter_name)
+        left, right = call_getter(getter, expected.feed), call_getter(
+            getter, actual.feed
+        )
+        if left != right:
+            mismatches.append((name, "feed", getter_name, left, right))
+
+    actual_entries = list(actual.entries)
+    if len(expected.entries) != len(actual_entries):
+        mismatches.append(
+            (name, "entries", "count", len(expected.entries), len(actual_entries))
+        )
+    for num, (left_entry, right_entry) in enumerate(
+        zip(expected.entries, actual_entries)
+    ):
+        for getter_name in ENTRY_GETTER_NAMES:
+            getter = getattr(helper, getter_name)
+            left, right = call_getter(getter, left_entry), call_getter(
+                getter, right_entry
+            )
+            if left != right:
+                mismatches.append((name, f"entry {num}", getter_name, left, right))
+    return mismatches
+
+
+def measure(engine: str, content: bytes, repeat: int) -> float:
+    from app.feed_parser.engine import parse_feed
+
+    return min(
+        timeit.repeat(lambda: parse_feed(content, engine), number=1, repeat=repeat)
+    )
+
+
+def run_benchmark(args: argparse.Namespace) -> Tuple[List[Dict], List[Tuple]]:
+    from app.feed_parser.engine import ENGINE_FEEDPARSER, ENGINES, parse_feed
+    from app.feed_parser.stream import XML_BACKENDS
+
+    engines = [
+        engine
+        for engine in ENGINES
+        if engine == ENGINE_FEEDPARSER or engine in XML_BACKENDS
+    ]
+    feeds = load_feeds(args)
+    size = sum(len(content) for content in feeds.values())
+
+    mismatches = []
+    elapsed = {engine: 0.0 for engine in engines}
+    entry_count = 0
+    for name, content in feeds.items():
+        expected = parse_feed(content, ENGINE_FEEDPARSER)
+        entry_count += len(expected.entries)
+        for engine in engines:
+            elapsed[engine] += measure(engine, content, args.repeat)
+            if engine != ENGINE_FEEDPARSER:
+                actual = parse_feed(content, engine)
+                mismatches.extend(
+                    (engine, *mismatch)
+                    for mismatch in compare_result(name, expected, actual)
+                )
+
+    results = []
+    for engine in engines:
+        results.append(
+            {
+                "engine": engine,
+                "feeds": len(feeds),
+                "entries": entry_count,
+                "seconds": round(elapsed[engine], 4),
+                "mb_per_sec": round(size / 1e6 / elapsed[engine], 2),
+                "entries_per_sec": round(entry_count / elapsed[engine]),
+                "speedup": round(elapsed[ENGINE_FEEDPARSER] / elapsed[engine], 2),
+                "mismatches": len([m for m in mismatches if m[0] == engine]),
+            }
+        )
+    return results, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="feed parser engine benchmark")
+    parser.add_argument("--episodes", type=int, nargs="*", default=[10, 100, 1000])
+    parser.add_argument(
+        "--feeds-dir", help="directory of saved *.xml or archived *.xml.gz feeds"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="best of n runs")
+    parser.add_argument("--show", type=int, default=20, help="mismatches to print")
+    args = parser.parse_args()
+
+    results, mismatches = run_benchmark(args)
+
+    console = Console(width=160)
+    table = Table(title="feed parser engines")
+    for column in results[0].keys():
+        table.add_column(column)
+    for result in results:
+        table.add_row(*[str(value) for value in result.values()])
+    console.print(table)
+
+    if mismatches:
+        table = Table(title=f"mismatches (first {args.show})")
+        for column in ["engine", "feed", "item", "getter", "feedparser", "result"]:
+            table.add_column(column)
+        for mismatch in mismatches[: args.show]:
+            table.add_row(*[str(value)[:60] for value in mismatch])
+        console.print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+End to end benchmark, run entry_point against the stand-in and the benchmark database
+for several process_num, see benchmarks/README.md
+
+    python -m benchmarks.run_entry_point --process-num 1 2 4 --episodes 50
+
+every round runs in its own interpreter, so peak rss and module state do not leak between rounds
+"""
+
+import argparse
+import glob
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from typing import Dict, List
+
+from rich.console import Console
+from rich.table import Table
+
+from benchmarks.stand_in import StandInConfig, start_stand_in
+
+# rounds drop tables and local data, never run them with a PROD exported by the shell
+os.environ["PROD"] = "test"
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema.sql")
+
+
+def check_benchmark_settings() -> None:
+    """refuse to reset anything unless settings of test are loaded"""
+    from core.conf import settings
+
+    if settings.PROD != "test":
+        raise RuntimeError(
+            "benchmark only runs with test settings, PROD: %s" % (settings.PROD,)
+        )
+
+
+def reset_database() -> None:
+    import psycopg2
+
+    from core.conf import settings
+
+    check_benchmark_settings()
+    with open(SCHEMA_PATH, "r", encoding="utf-8") as file:
+        schema = file.read()
+    conn = psycopg2.connect(settings.DATABASE["DSN"])
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(schema)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def reset_cache() -> None:
+    """
+    Drop local state of previous round, ids of a reset database do not match it
+    """
+    from config.constants import (
+        DJANGO_CACHE_DB_NUMBER,
+        EPISODE_FILTER_PATH,
+        FEED_CACHE_PATH,
+        ITUNES_COLLECTION_PATH,
+        ITUNES_TAGS_PATH,
+        check_and_create_path,
+    )
+    from core.cache.conn import get_redis_conn
+    from core.conf import settings
+
+    check_benchmark_settings()
+    for path in [
+        FEED_CACHE_PATH,
+        EPISODE_FILTER_PATH,
+        ITUNES_COLLECTION_PATH,
+        ITUNES_TAGS_PATH,
+    ]:
+        shutil.rmtree(path, ignore_errors=True)
+    check_and_create_path()
+
+    prefix = settings.CACHE["DB"][DJANGO_CACHE_DB_NUMBER]["PREFIX"]
+    conn = get_redis_conn(DJANGO_CACHE_DB_NUMBER).conn
+    keys = conn.keys(f"{prefix}__itunes_genre__*")
+    if keys:
+        conn.delete(*keys)
+
+
+def count_rows() -> Dict:
+    import psycopg2
+
+    from core.conf import settings
+
+    conn = psycopg2.connect(settings.DATABASE["DSN"])
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM products_itunes_program")
+            collections = cursor.fetchone()[0]
+            cursor.execute("SELECT count(*) FROM products_itunes_episode")
+            episodes = cursor.fetchone()[0]
+    finally:
+        conn.close()
+    return {"collections": collections, "episodes": episodes}
+
+
+def load_metrics_summary(since: float) -> Dict:
+    from config.constants import METRICS_PATH
+
+    files = [
+        fp
+        for fp in glob.glob(os.path.join(METRICS_PATH, "*.json"))
+        if os.path.getmtime(fp) >= since
+    ]
+    if not files:
+        return {}
+    with open(max(files, key=os.path.getmtime), "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def run_round(args: argparse.Namespace) -> Dict:
+    """
+    One entry_point run, called in a fresh interpreter
+    """
+    from app.main import entry_point
+    from config.loader import execution
+
+    reset_database()
+    reset_cache()
+
+    # freeze the json config, then override it for this round
+    execution.dynamic = False
+    execution.runner.process_num = args.process_num
+    execution.runner.pipeline_mode = args.pipeline
+    execution.runner.fetch_engine = args.fetch_engine
+    execution.config.itunes_api_host = args.host
+    execution.config.rate_limit = {**execution.config.rate_limit, "enabled": False}
+
+    since = timeit.default_timer()
+    wall_start = time.time()
+    entry_point()
+    elapsed = timeit.default_timer() - since
+
+    rows = count_rows()
+    rss_self = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {
+        "process_num": args.process_num,
+        "pipeline": args.pipeline,
+        "fetch_engine": args.fetch_engine,
+        "elapsed": round(elapsed, 3),
+        **rows,
+        "collections_per_min": round(rows["collections"] / elapsed * 60, 2),
+        "episodes_per_sec": round(rows["episodes"] / elapsed, 2),
+        # ru_maxrss is KB on linux
+        "peak_rss_mb": round(max(rss_self, rss_children) / 1024, 1),
+        "metrics": load_metrics_summary(wall_start),
+    }
+
+
+def create_result_table(results: List[Dict]) -> Table:
+    columns = [
+        "process_num",
+        "fetch_engine",
+        "elapsed",
+        "collections",
+        "episodes",
+        "collections_per_min",
+        "episodes_per_sec",
+        "peak_rss_mb",
+    ]
+    table = Table(title="entry_point benchmark")
+    for column in columns:
+        table.add_column(column)
+    for result in results:
+        table.add_row(*[str(result[column]) for column in columns])
+    return table
+
+
+def create_stage_table(result: Dict, limit: int) -> Table:
+    columns = ["count", "total", "p50", "p95", "max"]
+    table = Table(title=f"stage breakdown, process_num {result['process_num']}")
+    for column in ["name"] + columns:
+        table.add_column(column)
+    histograms = result["metrics"].get("histograms", {})
+    for name, values in sorted(
+        histograms.items(), key=lambda item: item[1]["total"], reverse=True
+    )[:limit]:
+        table.add_row(name, *[str(values[column]) for column in columns])
+    return table
+
+
+def run_benchmark(args: argparse.Namespace) -> List[Dict]:
+    config = StandInConfig(
+        collections=args.collections,
+        overlap=args.overlap,
+        episodes=args.episodes,
+        description_size=args.description_size,
+        latency=args.latency,
+        feed_latency=args.feed_latency,
+    )
+    server = start_stand_in(config)
+    host = "http://%s:%s" % server.server_address[:2]
+
+    results = []
+    try:
+        for process_num in args.process_num:
+            with tempfile.NamedTemporaryFile(suffix=".json") as result_file:
+                command = [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.run_entry_point",
+                    "--round",
+                    "--process-num",
+                    str(process_num),
+                    "--fetch-engine",
+                    args.fetch_engine,
+                    "--host",
+                    host,
+                    "--result",
+                    result_file.name,
+                ]
+                if args.pipeline:
+                    command.append("--pipeline")
+                subprocess.run(command, check=True)
+                with open(result_file.name, "r", encoding="utf-8") as file:
+                    results.append(json.load(file))
+    finally:
+        server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="entry_point benchmark")
+    parser.add_argument("--process-num", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--pipeline", action="store_true")
+    parser.add_argument("--fetch-engine", choices=["sync", "async"], default="sync")
+    parser.add_argument("--collections", type=int, default=200)
+    parser.add_argument("--overlap", type=float, default=0.3)
+    parser.add_argument("--episodes", type=int, default=50)
+    parser.add_argument("--description-size", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--feed-latency", type=float, default=0.1)
+    parser.add_argument("--stages", type=int, default=12, help="rows of stage table")
+    parser.add_argument("--output", help="save results as json")
+    # used by run_benchmark for every round
+    parser.add_argument("--round", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--host", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    check_benchmark_settings()
+
+    if args.round:
+        args.process_num = args.process_num[0]
+        with open(args.result, "w", encoding="utf-8") as file:
+            json.dump(run_round(args), file)
+        return
+
+    results = run_benchmark(args)
+    console = Console(width=160)
+    console.print(create_result_table(results))
+    for result in results:
+        console.print(create_stage_table(result, args.stages))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
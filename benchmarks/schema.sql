@@ -0,0 +1,199 @@
+-- minimal schema for benchmark database, only the tables and columns used by app/db/operations.py
+-- run by benchmarks/run_entry_point.py before every round, everything is dropped and seeded again
+
+DROP TABLE IF EXISTS
+    products_program_subscription,
+    products_itunes_program_itunes_genres,
+    products_itunes_internal_category,
+    products_itunes_collectionstatistics,
+    products_itunes_episode,
+    products_episode_tags,
+    products_episode,
+    products_program_rss_data,
+    products_itunes_program,
+    products_program_tags,
+    products_program,
+    products_itunes_producer,
+    products_producer,
+    auth_user,
+    products_itunes_rank,
+    products_itunes_genre,
+    products_tag
+CASCADE;
+
+CREATE TABLE products_tag (
+    id serial PRIMARY KEY,
+    name varchar(255) NOT NULL,
+    created timestamp with time zone NOT NULL,
+    modified timestamp with time zone NOT NULL
+);
+
+CREATE TABLE products_itunes_genre (
+    id serial PRIMARY KEY,
+    genre_id varchar(32) NOT NULL,
+    name varchar(255) NOT NULL,
+    enable boolean NOT NULL DEFAULT true,
+    created timestamp with time zone NOT NULL DEFAULT now(),
+    modified timestamp with time zone NOT NULL DEFAULT now()
+);
+
+CREATE TABLE products_itunes_rank (
+    id serial PRIMARY KEY,
+    category_id varchar(32) NOT NULL,
+    data text NOT NULL
+);
+
+CREATE TABLE auth_user (
+    id serial PRIMARY KEY,
+    password varchar(128) NOT NULL,
+    last_login timestamp with time zone,
+    is_superuser boolean NOT NULL,
+    username varchar(150) NOT NULL UNIQUE,
+    first_name varchar(150) NOT NULL,
+    last_name varchar(150) NOT NULL,
+    email varchar(254) NOT NULL,
+    is_staff boolean NOT NULL,
+    is_active boolean NOT NULL,
+    date_joined timestamp with time zone NOT NULL
+);
+
+CREATE TABLE products_producer (
+    id serial PRIMARY KEY,
+    auth_user_id integer NOT NULL REFERENCES auth_user (id),
+    user_account varchar(255) NOT NULL,
+    nick_name varchar(255) NOT NULL,
+    image_url text NOT NULL,
+    created timestamp with time zone NOT NULL,
+    modified timestamp with time zone NOT NULL,
+    been_validate boolean NOT NULL,
+    been_onboarding boolean NOT NULL,
+    been_promote boolean NOT NULL,
+    origin varchar(32) NOT NULL,
+    been_mini_onboarding boolean NOT NULL
+);
+
+CREATE TABLE products_itunes_producer (
+    id serial PRIMARY KEY,
+    i_p_id varchar(64) NOT NULL,
+    p_id integer NOT NULL REFERENCES products_producer (id)
+);
+
+CREATE TABLE products_program (
+    id serial PRIMARY KEY,
+    title text NOT NULL,
+    description text NOT NULL,
+    image_url text NOT NULL,
+    producer_id integer NOT NULL REFERENCES products_producer (id),
+    created timestamp with time zone NOT NULL,
+    modified timestamp with time zone NOT NULL,
+    origin varchar(32) NOT NULL,
+    listen_count integer NOT NULL,
+    message_count integer NOT NULL,
+    episode_count integer NOT NULL,
+    subscription_count integer NOT NULL,
+    rss_listen_count integer NOT NULL,
+    release_status varchar(32) NOT NULL,
+    mini_listen_count integer NOT NULL,
+    latest_episode_id integer,
+    latest_episode_released timestamp with time zone,
+    itunes_internal_category_id integer
+);
+
+CREATE TABLE products_program_tags (
+    id serial PRIMARY KEY,
+    program_id integer NOT NULL REFERENCES products_program (id),
+    tag_id integer NOT NULL REFERENCES products_tag (id)
+);
+
+CREATE TABLE products_itunes_program (
+    id serial PRIMARY KEY,
+    i_p_id varchar(64) NOT NULL,
+    p_id integer NOT NULL REFERENCES products_program (id),
+    producer_id integer NOT NULL REFERENCES products_producer (id)
+);
+
+CREATE TABLE products_program_rss_data (
+    id serial PRIMARY KEY,
+    program_id integer NOT NULL REFERENCES products_program (id),
+    rss_url text NOT NULL,
+    email varchar(254),
+    producer_name varchar(255),
+    created timestamp with time zone NOT NULL,
+    modified timestamp with time zone NOT NULL
+);
+
+CREATE TABLE products_episode (
+    id serial PRIMARY KEY,
+    title text NOT NULL,
+    description text NOT NULL,
+    img_url text,
+    data_uri text NOT NULL,
+    duration varchar(32),
+    program_id integer NOT NULL REFERENCES products_program (id),
+    release_date timestamp with time zone,
+    release_status varchar(32) NOT NULL,
+    created timestamp with time zone NOT NULL,
+    modified timestamp with time zone NOT NULL,
+    origin varchar(32) NOT NULL,
+    message_count integer NOT NULL,
+    reviewed_user_id integer NOT NULL
+);
+
+CREATE TABLE products_episode_tags (
+    id serial PRIMARY KEY,
+    episode_id integer NOT NULL REFERENCES products_episode (id),
+    tag_id integer NOT NULL REFERENCES products_tag (id)
+);
+
+CREATE TABLE products_itunes_episode (
+    id serial PRIMARY KEY,
+    i_ep_id text NOT NULL,
+    ep_id integer NOT NULL REFERENCES products_episode (id),
+    program_id varchar(64) NOT NULL
+);
+CREATE INDEX products_itunes_episode_i_ep_id ON products_itunes_episode (i_ep_id);
+
+CREATE TABLE products_itunes_collectionstatistics (
+    id serial PRIMARY KEY,
+    i_p_id varchar(64) NOT NULL,
+    p_id integer NOT NULL REFERENCES products_program (id),
+    producer_id integer NOT NULL REFERENCES products_producer (id),
+    episode_count integer NOT NULL,
+    last_update timestamp with time zone NOT NULL
+);
+
+CREATE TABLE products_itunes_program_itunes_genres (
+    id serial PRIMARY KEY,
+    itunesprogram_id integer NOT NULL REFERENCES products_itunes_program (id),
+    itunesgenre_id integer NOT NULL REFERENCES products_itunes_genre (id)
+);
+
+CREATE TABLE products_itunes_internal_category (
+    id serial PRIMARY KEY,
+    tag_id integer NOT NULL REFERENCES products_tag (id),
+    itunes_genre_id integer REFERENCES products_itunes_genre (id)
+);
+
+CREATE TABLE products_program_subscription (
+    id serial PRIMARY KEY,
+    program_id integer NOT NULL REFERENCES products_program (id)
+);
+
+-- seed, genre ids must match benchmarks/stand_in.py GENRES
+INSERT INTO products_tag (name, created, modified) VALUES
+    ('Talk', now(), now()),
+    ('Arts', now(), now()),
+    ('Comedy', now(), now()),
+    ('Education', now(), now()),
+    ('News', now(), now());
+
+INSERT INTO products_itunes_genre (genre_id, name) VALUES
+    ('1301', 'Arts'),
+    ('1303', 'Comedy'),
+    ('1304', 'Education'),
+    ('1489', 'News');
+
+INSERT INTO products_itunes_internal_category (tag_id, itunes_genre_id)
+SELECT t.id, g.id
+FROM products_tag AS t
+JOIN products_itunes_genre AS g ON g.name = t.name;
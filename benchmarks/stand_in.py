@@ -0,0 +1,223 @@
+"""
+Local stand-in of the iTunes top charts, lookup and RSS endpoints
+
+every response is generated from the collection id, so the same config always serves
+the same data, e.g.
+
+    python -m benchmarks.stand_in --port 8765 --collections 200 --episodes 50
+"""
+
+import argparse
+import email.utils
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+# genre id -> name, must match benchmarks/schema.sql, 26 is always crawled by entry_point
+GENRES = {
+    "26": "Podcasts",
+    "1301": "Arts",
+    "1303": "Comedy",
+    "1304": "Education",
+    "1489": "News",
+}
+
+_FIRST_COLLECTION_ID = 1000000000
+_EPOCH = 1700000000
+
+
+@dataclass
+class StandInConfig:
+    """
+    collections: charted collections per genre
+    overlap: share of a genre's chart also charted by the next genre, 0 - 1
+    episodes: items per feed
+    latency: seconds slept before every response
+    """
+
+    collections: int = 200
+    overlap: float = 0.3
+    episodes: int = 50
+    description_size: int = 1000
+    latency: float = 0.0
+    feed_latency: float = 0.0
+
+
+def get_collection_ids(config: StandInConfig, genre_id: str) -> List[int]:
+    step = max(1, int(config.collections * (1 - config.overlap)))
+    start = _FIRST_COLLECTION_ID + list(GENRES).index(genre_id) * step
+    return list(range(start, start + config.collections))
+
+
+def create_top_data(config: StandInConfig, genre_id: str) -> Dict:
+    entry = [
+        {
+            "id": {"attributes": {"im:id": str(collection_id)}},
+            "im:name": {"label": f"Program {collection_id}"},
+        }
+        for collection_id in get_collection_ids(config, genre_id)
+    ]
+    return {"feed": {"entry": entry}}
+
+
+def get_genre_id(collection_id: int) -> str:
+    genre_ids = [genre_id for genre_id in GENRES if genre_id != "26"]
+    return genre_ids[collection_id % len(genre_ids)]
+
+
+def create_lookup_result(host: str, collection_id: int) -> Dict:
+    genre_id = get_genre_id(collection_id)
+    return {
+        "wrapperType": "track",
+        "kind": "podcast",
+        "collectionId": collection_id,
+        "artistName": f"Artist {collection_id}",
+        "collectionName": f"Program {collection_id}",
+        "feedUrl": f"{host}/feeds/{collection_id}.xml",
+        "artworkUrl600": f"{host}/images/{collection_id}.jpg",
+        "genreIds": [genre_id, "26"],
+        "genres": [GENRES[genre_id], "Podcasts"],
+    }
+
+
+def create_lookup_data(host: str, collection_ids: List[int]) -> Dict:
+    results = [create_lookup_result(host, c_id) for c_id in collection_ids]
+    return {"resultCount": len(results), "results": results}
+
+
+def create_feed(config: StandInConfig, host: str, collection_id: int) -> bytes:
+    description = escape(
+        ("<p>Episode notes &amp; links</p> " * 40)[: config.description_size]
+    )
+    items = []
+    for num in range(config.episodes):
+        pub_date = email.utils.formatdate(_EPOCH - num * 86400, usegmt=True)
+        items.append(
+            f"""
+    <item>
+      <title>Episode {num} of {collection_id}</title>
+      <description>{description}</description>
+      <pubDate>{pub_date}</pubDate>
+      <guid>{host}/audio/{collection_id}/{num}</guid>
+      <enclosure url="{host}/audio/{collection_id}/{num}.mp3" length="1024" type="audio/mpeg"/>
+      <itunes:duration>00:{num % 60:02d}:30</itunes:duration>
+      <itunes:keywords>bench,tag{num % 3}</itunes:keywords>
+    </item>"""
+        )
+    feed = f"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd">
+  <channel>
+    <title>Program {collection_id}</title>
+    <link>{host}/programs/{collection_id}</link>
+    <description>Benchmark program {collection_id}</description>
+    <itunes:author>Artist {collection_id}</itunes:author>
+    <itunes:owner>
+      <itunes:name>Artist {collection_id}</itunes:name>
+      <itunes:email>artist{collection_id}@example.com</itunes:email>
+    </itunes:owner>
+    <itunes:image href="{host}/images/{collection_id}.jpg"/>{"".join(items)}
+  </channel>
+</rss>
+"""
+    return feed.encode("utf-8")
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    config: StandInConfig = StandInConfig()
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    @property
+    def host(self) -> str:
+        return "http://%s:%s" % self.server.server_address[:2]
+
+    def send_body(self, body: bytes, content_type: str, headers: Optional[Dict] = None):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, data: Dict) -> None:
+        self.send_body(json.dumps(data).encode("utf-8"), "application/json")
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if url.path.startswith("/feeds/"):
+            time.sleep(self.config.feed_latency)
+            return self.handle_feed(url.path)
+
+        time.sleep(self.config.latency)
+        if url.path.startswith("/tw/rss/toppodcasts/genre="):
+            genre_id = url.path.split("genre=")[1].split("/")[0]
+            if genre_id not in GENRES:
+                return self.send_error(404)
+            return self.send_json(create_top_data(self.config, genre_id))
+
+        if url.path == "/lookup":
+            ids = parse_qs(url.query).get("id", [""])[0]
+            collection_ids = [int(c_id) for c_id in ids.split(",") if c_id]
+            return self.send_json(create_lookup_data(self.host, collection_ids))
+
+        self.send_error(404)
+
+    def handle_feed(self, path: str) -> None:
+        collection_id = int(path.rsplit("/", 1)[-1].split(".")[0])
+        body = create_feed(self.config, self.host, collection_id)
+        etag = '"%s"' % (hashlib.md5(body).hexdigest(),)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_body(body, "application/rss+xml", {"ETag": etag})
+
+
+def start_stand_in(config: StandInConfig, port: int = 0) -> ThreadingHTTPServer:
+    """
+    Serve in a daemon thread, port 0 picks a free port, see server.server_address
+    """
+    handler = type("ConfiguredHandler", (StandInHandler,), {"config": config})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="iTunes / RSS stand-in server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--collections", type=int, default=200)
+    parser.add_argument("--overlap", type=float, default=0.3)
+    parser.add_argument("--episodes", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--feed-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = StandInConfig(
+        collections=args.collections,
+        overlap=args.overlap,
+        episodes=args.episodes,
+        latency=args.latency,
+        feed_latency=args.feed_latency,
+    )
+    server = start_stand_in(config, args.port)
+    print("stand-in serving on http://%s:%s" % server.server_address[:2])
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,12 @@ ITUNES_COLLECTION_PATH = os.path.join(DATA_PATH, "itunes_data")
 ITUNES_TAGS_PATH = os.path.join(DATA_PATH, "tag_data")
 ITUNES_TAGS_FILE_PATH = os.path.join(ITUNES_TAGS_PATH, "tags.json")
 
-FEED_DATA_PATH = os.path.join(DATA_PATH, "feed_data")
+FEED_ARCHIVE_PATH = os.path.join(DATA_PATH, "feed_archive")
+FEED_CACHE_PATH = os.path.join(DATA_PATH, "feed_cache")
+FEED_HINTS_PATH = os.path.join(DATA_PATH, "feed_hints")
+
+METRICS_PATH = os.path.join(DATA_PATH, "metrics")
+EPISODE_FILTER_PATH = os.path.join(DATA_PATH, "episode_filter")
 
 # created by code
 
@@ -23,7 +28,11 @@ waited_creating_list = [
     DATA_PATH,
     ITUNES_COLLECTION_PATH,
     ITUNES_TAGS_PATH,
-    FEED_DATA_PATH,
+    FEED_ARCHIVE_PATH,
+    FEED_CACHE_PATH,
+    FEED_HINTS_PATH,
+    METRICS_PATH,
+    EPISODE_FILTER_PATH,
     LOG_PATH,
 ]
 
@@ -9,11 +9,6 @@ from typing import AnyStr, Dict, List, Union
 from core.common.string import is_byte_string
 from core.utils.exceptions import FileHandleError
 
-try:
-    import xml.etree.cElementTree as ET
-except ImportError:
-    import xml.etree.ElementTree as ET
-
 
 def read_file(fp: str) -> str:
     with open(fp, "r", encoding="utf-8") as file:
@@ -69,12 +64,3 @@ def write_json(fp: str, data: Union[List, Dict], indent: int = None) -> None:
 
     except Exception as exc:
         raise FileHandleError(f"Unexpected error, {exc}") from exc
-
-
-def write_xml_with_et(fp: str, string: AnyStr) -> None:
-    try:
-        root = ET.fromstring(string)
-        tree = ET.ElementTree(root)
-        tree.write(fp)
-    except Exception as exc:
-        raise FileHandleError(f"Unexpected error, {exc}") from exc
@@ -19,6 +19,17 @@ _LAYERS = {
             "fetch_rss_timeout",
             "insert_episode_timeout",
             "exclude_program_list_file_path",
+            "itunes_api_host",
+            "async_http",
+            "lookup_batch_size",
+            "rate_limit",
+            "retry_scheduler",
+            "stream_parse",
+            "feed_parser_engine",
+            "feed_max_bytes",
+            "description_max_length",
+            "bulk_insert",
+            "episode_filter",
         ],
     },
     "runner_config": {
@@ -29,6 +40,15 @@ _LAYERS = {
             "prepare_interval",
             "post_interval",
             "process_num",
+            "pipeline_mode",
+            "pipeline_queue_size",
+            "pipeline_workers",
+            "fetch_engine",
+            "lookup_thread_num",
+            "parse_workers",
+            "parse_chunk_size",
+            "writer_workers",
+            "writer_batch_size",
         ],
     },
     "logging_config": {"name": "logger", "instant": False},
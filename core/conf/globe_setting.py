@@ -3,6 +3,7 @@ APP_NAME = "insert_itunes_collector"
 DATABASE = {
     "APPLICATION_NAME": "insert_itunes_collector",
     "CONN_MAX_AGE": 300,
+    "CONN_HEALTH_CHECK_IDLE": 30,
     "ISOLATION_LEVEL": None,
     "AUTOCOMMIT": True,
 }
@@ -1,13 +1,14 @@
 # pylint: disable=no-name-in-module, consider-using-f-string, no-member, inconsistent-return-statements, no-else-return
 # type: ignore
 import _thread
+import multiprocessing.util
 import os
 import re
 import threading
 import time
 from contextlib import contextmanager
 from functools import cached_property
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from core.db.cursor_wrapper import CursorWrapper
 from core.db.transaction import TransactionManagementError
@@ -25,6 +26,11 @@ except ImportError as exc:
     raise ImproperlyConfigured(f"Error loading psycopg2 module: {exc}") from exc
 
 
+# connections inherited from the parent process, closing them in a forked child would
+# also end the session of the parent, so they are only kept referenced until exit
+_INHERITED_CONNECTIONS: List[DatabaseConnection] = []
+
+
 # Note: no use async_unsafe function, cause already control single thread outside
 class DatabaseManager(metaclass=SingletonInstance):
     connection: Optional[DatabaseConnection] = None
@@ -58,6 +64,12 @@ class DatabaseManager(metaclass=SingletonInstance):
         self._thread_sharing_lock = threading.Lock()
         self._thread_sharing_count = 0
         self._thread_ident = _thread.get_ident()
+        # threads abandoned while using the connection, see discard
+        self._discarded_threads = set()
+
+        self.used_at = None
+        self._finalizer_pid = None
+        os.register_at_fork(after_in_child=self._after_fork_in_child)
 
     def check_config_dict(self) -> bool:
         if not isinstance(self.config_dict, dict):
@@ -71,6 +83,7 @@ class DatabaseManager(metaclass=SingletonInstance):
 
     def ensure_connection(self):
         """Guarantee that a connection to the database is established."""
+        self.validate_not_discarded()
         if self.connection is None:
             with self.wrap_database_errors:
                 self.connect()
@@ -93,6 +106,65 @@ class DatabaseManager(metaclass=SingletonInstance):
         self.set_autocommit(self.config_dict["AUTOCOMMIT"])
         self.init_connection_state()
         self.run_on_commit = []
+        self.used_at = time.monotonic()
+        # close it when a multiprocessing worker exits, finalizers are per process
+        if self._finalizer_pid != os.getpid():
+            multiprocessing.util.Finalize(self, self.close_at_exit, exitpriority=10)
+            self._finalizer_pid = os.getpid()
+
+    def close_at_exit(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except self.Database.Error:
+                pass
+            self.connection = None
+
+    def _after_fork_in_child(self):
+        """
+        Drop the connection of the parent, the child connects by itself when needed
+        """
+        if self.connection is not None:
+            _INHERITED_CONNECTIONS.append(self.connection)
+        self._reset_connection_state()
+        # held by another thread of the parent maybe
+        self._thread_sharing_lock = threading.Lock()
+        self._thread_ident = _thread.get_ident()
+        self._discarded_threads = set()
+
+    def _reset_connection_state(self):
+        self.connection = None
+        self.in_atomic_block = False
+        self.savepoint_state = 0
+        self.savepoint_ids = []
+        self.needs_rollback = False
+        self.commit_on_exit = True
+        self.close_at = None
+        self.closed_in_transaction = False
+        self.errors_occurred = False
+        self.run_on_commit = []
+        self.used_at = None
+
+    def discard(self, thread: threading.Thread):
+        """
+        Drop the connection used by a thread which is abandoned, e.g. aborted by timeout
+
+        the thread may still be running, maybe in an atomic block, its query is cancelled
+        and the server rolls back its transaction, it can not use the connection anymore,
+        the next call of other threads connects again
+        """
+        self._discarded_threads = {
+            discarded for discarded in self._discarded_threads if discarded.is_alive()
+        }
+        self._discarded_threads.add(thread)
+        connection = self.connection
+        self._reset_connection_state()
+        if connection is not None:
+            try:
+                connection.cancel()
+                connection.close()
+            except self.Database.Error:
+                pass
 
     # def close(self):
     #     if self.connection is not None:
@@ -123,12 +195,13 @@ class DatabaseManager(metaclass=SingletonInstance):
         try:
             # Use a psycopg cursor directly, bypassing Django's utilities.
             self.connection.cursor().execute("SELECT 1")
-        except Error:
+        except (Error, self.Database.Error):
             return False
         else:
             return True
 
     def close_if_unusable_or_obsolete(self):
+        self.validate_not_discarded()
         if self.connection is not None:
             # If the application didn't restore the original autocommit setting,
             # don't take chances, drop the connection.
@@ -149,6 +222,19 @@ class DatabaseManager(metaclass=SingletonInstance):
                 self.close()
                 return
 
+            # a connection idle for a while may be closed by the server or network
+            idle = self.config_dict.get("CONN_HEALTH_CHECK_IDLE")
+            now = time.monotonic()
+            if (
+                idle is not None
+                and self.used_at is not None
+                and now - self.used_at >= idle
+                and not self.is_usable()
+            ):
+                self.close()
+                return
+            self.used_at = now
+
     def get_isolation_level(self) -> int:
         return self.connection.isolation_level
 
@@ -198,6 +284,17 @@ class DatabaseManager(metaclass=SingletonInstance):
                 )
             self._thread_sharing_count -= 1
 
+    def is_discarded_thread(self) -> bool:
+        return threading.current_thread() in self._discarded_threads
+
+    def validate_not_discarded(self):
+        """Raise an error if the current thread was abandoned by discard()."""
+        if self.is_discarded_thread():
+            raise DatabaseError(
+                "The connection was discarded, thread id %s can not use it anymore."
+                % (_thread.get_ident(),)
+            )
+
     def validate_thread_sharing(self):
         """
         Validate that the connection isn't accessed by another thread than the
@@ -205,6 +302,7 @@ class DatabaseManager(metaclass=SingletonInstance):
         authorized to be shared between threads (via the `inc_thread_sharing()`
         method). Raise an exception if the validation fails.
         """
+        self.validate_not_discarded()
         if not (self.allow_thread_sharing or self._thread_ident == _thread.get_ident()):
             raise DatabaseError(
                 "DatabaseWrapper objects created in a "
@@ -258,6 +356,12 @@ class DatabaseManager(metaclass=SingletonInstance):
         """Create a cursor, opening a connection if necessary."""
         return self._cursor()
 
+    def chunked_cursor(self, name: str) -> CursorWrapper:
+        """
+        Create a server side cursor, rows are sent as they are fetched, use it in a transaction
+        """
+        return self._cursor(name)
+
     def commit(self):
         """Commit a transaction and reset the dirty flag."""
         self.validate_thread_sharing()
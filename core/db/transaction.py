@@ -22,6 +22,7 @@ class Atomic(ContextDecorator):
 
     def __enter__(self):
         connection = get_connection()
+        connection.validate_not_discarded()
 
         if not connection.in_atomic_block:
             # Reset state when entering an outermost atomic block.
@@ -52,6 +53,9 @@ class Atomic(ContextDecorator):
 
     def __exit__(self, exc_type, exc_value, traceback):
         connection = get_connection()
+        if connection.is_discarded_thread():
+            # the state belongs to the threads using the connection after discard
+            return
         sid = None
 
         if connection.savepoint_ids:
@@ -58,6 +58,25 @@ def init_arg() -> argparse.Namespace:
         required=False,
         help="modify multiple process using process number",
     )
+    parser.add_argument(
+        "--pipeline_mode",
+        type=str2bool,
+        required=False,
+        help="run streaming pipeline instead of phase by phase",
+    )
+    parser.add_argument(
+        "--fetch_engine",
+        type=str,
+        choices=["sync", "async"],
+        required=False,
+        help="fetch top / lookup by process pool (sync) or one event loop (async)",
+    )
+    parser.add_argument(
+        "--lookup_thread_num",
+        type=int,
+        required=False,
+        help="modify thread number of lookup executor in each process",
+    )
     return parser.parse_args()
 
 
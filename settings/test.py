@@ -0,0 +1,25 @@
+from core.conf.helper import get_env
+
+PROD = "test"
+
+AWS_ACCESS_KEY_ID = get_env("AWS_ACCESS_KEY_ID", required=False)
+AWS_SECRET_ACCESS_KEY = get_env("AWS_SECRET_ACCESS_KEY", required=False)
+REGION_NAME = get_env("REGION", "us-west-2", required=False)
+
+DATABASE = {
+    # local benchmark database, see benchmarks/README.md
+    "DSN": get_env(
+        "BENCH_DSN",
+        "host='localhost' dbname='insert_itunes_bench' user='postgres' password='postgres' port=5432",
+        required=False,
+    ),
+}
+
+CACHE = {
+    "ENDPOINT": get_env("CACHE_ENDPOINT", "127.0.0.1", required=False),
+    "DB": {
+        # number must map real redis db
+        0: {"NAME": "django", "PREFIX": ""},
+        1: {"NAME": "insert_itunes_collector", "PREFIX": "insert_itunes_collector"},
+    },
+}
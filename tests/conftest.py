@@ -0,0 +1,103 @@
+import os
+import sys
+
+import psycopg2
+import pytest
+
+PROJECT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# execution/<PROD>.setting.json is read from the working directory on first import
+os.environ.setdefault("PROD", "test")
+os.chdir(PROJECT_PATH)
+if PROJECT_PATH not in sys.path:
+    sys.path.insert(0, PROJECT_PATH)
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql, params=None):
+        if self.connection.broken or self.connection.closed:
+            raise psycopg2.OperationalError("server closed the connection")
+        self.connection.executed.append(sql)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """psycopg2 connection in memory, no server is needed"""
+
+    isolation_level = None
+
+    def __init__(self):
+        self.autocommit = False
+        self.broken = False
+        self.closed = False
+        self.cancelled = False
+        self.executed = []
+
+    def set_client_encoding(self, encoding):
+        pass
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.executed.append("COMMIT")
+
+    def rollback(self):
+        self.executed.append("ROLLBACK")
+
+    def cancel(self):
+        self.cancelled = True
+
+    def close(self):
+        self.closed = True
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    from core.db import manager as db_manager
+
+    clock = Clock()
+    monkeypatch.setattr(db_manager, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def manager(monkeypatch, clock):
+    """DatabaseManager of FakeConnection, used as the connection of the process"""
+    import core.db
+    from app.db import deco
+    from core.db.manager import DatabaseManager
+
+    # a subclass per test, DatabaseManager is a singleton per class
+    class Manager(DatabaseManager):
+        def get_new_connection(self, connection_params):
+            connection = FakeConnection()
+            self.connections.append(connection)
+            return connection
+
+    manager = Manager(
+        {
+            "DSN": "dbname=test",
+            "CONN_MAX_AGE": 300,
+            "CONN_HEALTH_CHECK_IDLE": 30,
+            "AUTOCOMMIT": True,
+        }
+    )
+    manager.connections = []
+    manager.inc_thread_sharing()
+    monkeypatch.setattr(deco, "connection", manager)
+    monkeypatch.setattr(core.db, "connection", manager)
+    return manager
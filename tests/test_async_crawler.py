@@ -0,0 +1,184 @@
+import asyncio
+import threading
+import timeit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app import concurrency_task
+from app.crawler import (
+    async_request_handler,
+    crawl_details_concurrently,
+    crawl_feeder_contents_cached,
+    crawl_tops_concurrently,
+    feed_cache,
+    itunes_api,
+)
+from app.crawler.async_feed_handler import async_feeder_download_conditional
+from app.crawler.async_itunes_api import (
+    async_get_lookup_api_result,
+    async_get_lookup_api_results,
+    async_get_top_api_result,
+)
+from app.crawler.async_request_handler import AsyncFetchEngine
+from app.crawler.exceptions import CrawlerNotFoundException, CrawlerUnavailable
+from benchmarks.stand_in import StandInConfig, get_collection_ids, start_stand_in
+
+STAGE_CONFIG = {
+    "top": {"concurrency": 4, "timeout": 5},
+    "lookup": {"concurrency": 4, "timeout": 5},
+    "feed": {"concurrency": 4, "timeout": 5},
+}
+
+
+def start_server(config: StandInConfig):
+    server = start_stand_in(config)
+    return server, "http://%s:%s" % server.server_address[:2]
+
+
+@pytest.fixture
+def stand_in(monkeypatch, tmp_path):
+    server, host = start_server(StandInConfig(collections=5, episodes=3))
+    monkeypatch.setattr(itunes_api, "get_itunes_api_host", lambda: host)
+    monkeypatch.setattr(async_request_handler, "get_rate_limiter", lambda: None)
+    monkeypatch.setattr(feed_cache, "FEED_CACHE_PATH", str(tmp_path))
+    yield host
+    server.shutdown()
+
+
+class EmptyBodyHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+@pytest.fixture
+def empty_body_host(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), EmptyBodyHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = "http://%s:%s" % server.server_address[:2]
+    monkeypatch.setattr(itunes_api, "get_itunes_api_host", lambda: host)
+    monkeypatch.setattr(async_request_handler, "get_rate_limiter", lambda: None)
+    yield host
+    server.shutdown()
+
+
+async def with_engine(func, *args, stage_config=None):
+    async with AsyncFetchEngine(stage_config or STAGE_CONFIG) as engine:
+        return await func(engine, *args)
+
+
+def test_top_and_lookup_results(stand_in):
+    top_data = asyncio.run(with_engine(async_get_top_api_result, "1301"))
+    expected = [str(c_id) for c_id in get_collection_ids(StandInConfig(5), "1301")]
+    assert [entry["id"]["attributes"]["im:id"] for entry in top_data.entry] == expected
+
+    lookup_data = asyncio.run(with_engine(async_get_lookup_api_result, expected[0]))
+    assert lookup_data.resultCount == 1
+    assert lookup_data.results[0]["feedUrl"] == f"{stand_in}/feeds/{expected[0]}.xml"
+
+    lookup_data = asyncio.run(with_engine(async_get_lookup_api_results, expected))
+    assert [str(r["collectionId"]) for r in lookup_data.results] == expected
+
+
+def test_unknown_genre_is_not_found(stand_in):
+    with pytest.raises(CrawlerNotFoundException):
+        asyncio.run(with_engine(async_get_top_api_result, "9999"))
+
+
+def test_empty_body_raises_crawler_exception_like_sync_path(empty_body_host):
+    with pytest.raises(CrawlerUnavailable):
+        asyncio.run(with_engine(async_get_lookup_api_result, "1"))
+    with pytest.raises(CrawlerUnavailable):
+        itunes_api.get_lookup_api_result("1")
+
+
+def test_lookup_data_without_results_is_unavailable():
+    with pytest.raises(CrawlerUnavailable):
+        itunes_api.load_api_data(b"")
+    with pytest.raises(CrawlerUnavailable):
+        itunes_api.load_api_data(b"[]")
+    with pytest.raises(CrawlerUnavailable):
+        itunes_api.create_lookup_data({"errorMessage": "Invalid value(s) for key(s)"})
+
+
+def test_stage_timeout_is_unavailable(monkeypatch):
+    server, host = start_server(StandInConfig(collections=1, latency=0.5))
+    monkeypatch.setattr(itunes_api, "get_itunes_api_host", lambda: host)
+    monkeypatch.setattr(async_request_handler, "get_rate_limiter", lambda: None)
+    stage_config = {"lookup": {"concurrency": 1, "timeout": 0.1}}
+    try:
+        with pytest.raises(CrawlerUnavailable):
+            asyncio.run(
+                with_engine(async_get_lookup_api_result, "1", stage_config=stage_config)
+            )
+    finally:
+        server.shutdown()
+
+
+@pytest.mark.parametrize("concurrency, min_elapsed", [(2, 0.38), (4, 0.18)])
+def test_stage_concurrency_is_limited(monkeypatch, concurrency, min_elapsed):
+    server, host = start_server(StandInConfig(collections=1, latency=0.2))
+    monkeypatch.setattr(itunes_api, "get_itunes_api_host", lambda: host)
+    monkeypatch.setattr(async_request_handler, "get_rate_limiter", lambda: None)
+    stage_config = {"lookup": {"concurrency": concurrency, "timeout": 5}}
+
+    async def lookup_all(engine):
+        return await asyncio.gather(
+            *[async_get_lookup_api_result(engine, c_id) for c_id in range(4)]
+        )
+
+    try:
+        start_time = timeit.default_timer()
+        asyncio.run(with_engine(lookup_all, stage_config=stage_config))
+        elapsed = timeit.default_timer() - start_time
+    finally:
+        server.shutdown()
+    assert min_elapsed <= elapsed < min_elapsed + 0.2
+
+
+def test_feed_download_is_conditional(stand_in):
+    url = f"{stand_in}/feeds/1001.xml"
+    download = asyncio.run(with_engine(async_feeder_download_conditional, url, None))
+    assert not download.not_modified
+    assert b"<title>Program 1001</title>" in download.content
+    assert download.validator.etag
+
+    download = asyncio.run(
+        with_engine(async_feeder_download_conditional, url, download.validator)
+    )
+    assert download.not_modified and download.content is None
+
+
+def test_crawl_concurrently(stand_in):
+    results = crawl_tops_concurrently(["1301", "9999"])
+    assert len(results["1301"].result) == 5
+    assert isinstance(results["9999"].result, CrawlerNotFoundException)
+
+    chunks = [results["1301"].result[:3], results["1301"].result[3:]]
+    details = crawl_details_concurrently(chunks)
+    assert [set(crawl_result.result) for crawl_result in details] == [
+        set(chunk) for chunk in chunks
+    ]
+
+    url = f"{stand_in}/feeds/1001.xml"
+    downloads = crawl_feeder_contents_cached([url, f"{stand_in}/missing.xml"])
+    assert downloads[url].content and downloads[f"{stand_in}/missing.xml"] is None
+
+
+def test_get_details_concurrently_saves_details_and_cost(stand_in):
+    collection_dict, retry_dict, cost_list = {}, {}, []
+    collection_ids = ["1001", "1002", "1003"]
+    concurrency_task.get_details_concurrently(
+        collection_dict, retry_dict, collection_ids, cost_list, {"1001": 26}
+    )
+    assert set(collection_dict) == set(collection_ids)
+    assert not retry_dict
+    assert [cost["collection_id"] for cost in cost_list] == collection_ids
+    assert cost_list[0]["genre_id"] == 26
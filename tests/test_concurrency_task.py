@@ -0,0 +1,46 @@
+import time
+
+from app import concurrency_task
+from app.concurrency_task import (
+    collect_unique_collection_ids,
+    get_detail_chunk,
+    get_top_list,
+)
+
+
+def test_collect_unique_collection_ids_keeps_first_genre():
+    results = [{26: ["1", "2", "3"]}, {1301: ["2", "4"]}, {1302: []}]
+    assert collect_unique_collection_ids(results, ["3"]) == {
+        "1": 26,
+        "2": 26,
+        "4": 1301,
+    }
+
+
+def test_lookup_cost_is_shared_by_ids_of_a_chunk(monkeypatch):
+    def crawl_details(collection_ids):
+        time.sleep(0.04)
+        return {c_id: {"collectionId": c_id} for c_id in collection_ids if c_id != "3"}
+
+    monkeypatch.setattr(concurrency_task, "crawl_details", crawl_details)
+    collection_dict, retry_dict, cost_list = {}, {}, []
+    get_detail_chunk(
+        collection_dict, retry_dict, cost_list, {"1": 26, "2": 1301}, ["1", "2", "3"]
+    )
+
+    assert set(collection_dict) == {"1", "2"}
+    assert retry_dict == {"3": 3}
+    assert [(c["collection_id"], c["genre_id"]) for c in cost_list] == [
+        ("1", 26),
+        ("2", 1301),
+        ("3", None),
+    ]
+    assert all(0.01 <= c["cost_time"] < 0.04 for c in cost_list)
+
+
+def test_top_cost_is_recorded_per_genre(monkeypatch):
+    monkeypatch.setattr(concurrency_task, "crawl_top", lambda genre_id: ["1", "2"])
+    top_cost_list = []
+    assert get_top_list(top_cost_list, 26) == {26: ["1", "2"]}
+    assert [cost["genre_id"] for cost in top_cost_list] == [26]
+    assert "collection_id" not in top_cost_list[0]
@@ -0,0 +1,151 @@
+import os
+import threading
+
+import pytest
+
+from app.crawler.wrapper import abort_wrapper
+from app.db.deco import check_conn
+from core.db import manager as db_manager
+from core.db import transaction
+from core.db.utils import DatabaseError
+
+
+@check_conn
+def select(manager):
+    with manager.cursor() as cursor:
+        cursor.execute("SELECT 2")
+
+
+def test_check_conn_reuses_connection(manager, clock):
+    select(manager)
+    clock.now += 10
+    select(manager)
+    assert len(manager.connections) == 1
+    assert "SELECT 1" not in manager.connections[0].executed
+
+
+def test_check_conn_replaces_connection_older_than_max_age(manager, clock):
+    select(manager)
+    for _ in range(15):
+        clock.now += 25
+        select(manager)
+    assert len(manager.connections) == 2
+    assert manager.connections[0].closed
+    assert not manager.connections[1].closed
+
+
+def test_check_conn_checks_idle_connection(manager, clock):
+    select(manager)
+    clock.now += 31
+    select(manager)
+    # healthy, kept
+    assert len(manager.connections) == 1
+    assert "SELECT 1" in manager.connections[0].executed
+
+    manager.connections[0].broken = True
+    clock.now += 31
+    select(manager)
+    assert len(manager.connections) == 2
+    assert manager.connections[0].closed
+
+
+def test_check_conn_skips_check_in_atomic_block(manager, clock):
+    with transaction.atomic():
+        select(manager)
+        clock.now += 400
+        select(manager)
+        assert len(manager.connections) == 1
+    select(manager)
+    assert len(manager.connections) == 2
+
+
+def test_thread_sharing_is_validated(manager):
+    manager.dec_thread_sharing()
+    select(manager)
+    errors = []
+
+    def select_in_thread():
+        try:
+            select(manager)
+        except DatabaseError as exc:
+            errors.append(exc)
+
+    thread = threading.Thread(target=select_in_thread)
+    thread.start()
+    thread.join()
+    assert len(errors) == 1
+
+    manager.inc_thread_sharing()
+    errors.clear()
+    thread = threading.Thread(target=select_in_thread)
+    thread.start()
+    thread.join()
+    assert not errors
+
+
+def test_after_fork_in_child_drops_parent_connection(manager):
+    select(manager)
+    parent_connection = manager.connection
+    manager.in_atomic_block = True
+    manager.savepoint_ids = ["s1_x1"]
+    manager._after_fork_in_child()
+    assert manager.connection is None
+    assert not manager.in_atomic_block and not manager.savepoint_ids
+    assert not parent_connection.closed
+    assert parent_connection in db_manager._INHERITED_CONNECTIONS
+
+    select(manager)
+    assert manager.connection is manager.connections[-1]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork is not supported")
+def test_forked_child_connects_by_itself(manager):
+    select(manager)
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # child, the hook registered by DatabaseManager already ran
+        os.close(read_fd)
+        os.write(write_fd, b"1" if manager.connection is None else b"0")
+        os._exit(0)
+    os.close(write_fd)
+    result = os.read(read_fd, 1)
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    assert result == b"1"
+    assert manager.connection is manager.connections[0]
+    assert not manager.connections[0].closed
+
+
+def test_abort_timeout_discards_connection_of_abandoned_thread(manager):
+    entered = threading.Event()
+    resume = threading.Event()
+    errors = []
+
+    def insert():
+        with transaction.atomic():
+            select(manager)
+            entered.set()
+            resume.wait(5)
+            try:
+                select(manager)
+            except DatabaseError as exc:
+                errors.append(exc)
+
+    abort_wrapper(insert, timeout=0.5, timeout_executes=[{"func": manager.discard}])
+    assert entered.is_set()
+    abandoned_connection = manager.connections[0]
+    assert abandoned_connection.cancelled and abandoned_connection.closed
+    assert manager.connection is None and not manager.in_atomic_block
+
+    # the next task gets a new connection and its own transaction
+    with transaction.atomic():
+        select(manager)
+        resume.set()
+        for thread in manager._discarded_threads:
+            thread.join(5)
+        assert manager.in_atomic_block
+    assert len(errors) == 1
+    assert len(manager.connections) == 2
+    assert manager.connections[1].executed[-1] == "COMMIT"
+    assert not manager.in_atomic_block
@@ -0,0 +1,50 @@
+import pytest
+
+from app.feed_parser.engine import (
+    ENGINE_ETREE,
+    ENGINE_FEEDPARSER,
+    ENGINE_LXML,
+    parse_feed,
+)
+
+FEED = (
+    b'<?xml version="1.0" encoding="UTF-8"?>'
+    b'<rss version="2.0" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd">'
+    b"<channel><title>podcast</title><link>http://example.com</link>"
+    b'<itunes:image href="http://example.com/cover.jpg"/>'
+    b"<item><title>episode 1</title><guid>1</guid>"
+    b"<pubDate>Mon, 06 Mar 2023 10:00:00 +0800</pubDate>"
+    b"<itunes:duration>10:00</itunes:duration>"
+    b"<description>&lt;p&gt;show notes&lt;/p&gt;</description>"
+    b'<enclosure url="http://example.com/1.mp3" type="audio/mpeg" length="1"/>'
+    b"</item></channel></rss>"
+)
+
+ENTRY_KEYS = ["title", "id", "published", "itunes_duration", "summary"]
+
+
+def get_enclosure_href(entry) -> str:
+    return next(link["href"] for link in entry["links"] if link["rel"] == "enclosure")
+
+
+@pytest.mark.parametrize("engine", [ENGINE_ETREE, ENGINE_LXML])
+def test_xml_engine_matches_feedparser(engine):
+    expected = parse_feed(FEED, ENGINE_FEEDPARSER)
+    result = parse_feed(FEED, engine)
+
+    assert result["bozo"] == 0
+    assert result["feed"]["title"] == expected["feed"]["title"]
+    assert result["feed"]["image"]["href"] == expected["feed"]["image"]["href"]
+    (entry,) = result["entries"]
+    (expected_entry,) = expected["entries"]
+    for key in ENTRY_KEYS:
+        assert entry[key] == expected_entry[key]
+    assert get_enclosure_href(entry) == get_enclosure_href(expected_entry)
+
+
+@pytest.mark.parametrize("engine", [ENGINE_ETREE, ENGINE_LXML])
+def test_xml_engine_falls_back_on_malformed_feed(engine):
+    content = FEED.replace(b"</item>", b"<broken></item>")
+    result = parse_feed(content, engine)
+    assert result["bozo"] == 1
+    assert result["feed"]["title"] == "podcast"
@@ -0,0 +1,105 @@
+import multiprocessing
+
+import pytest
+
+from app.db import episode_filter
+from app.db.episode_filter import (
+    BloomFilter,
+    EpisodeFilter,
+    KnownEpisodes,
+    create_episode_key,
+    load_episode_filter,
+    save_episode_filter,
+)
+
+
+@pytest.fixture
+def filter_path(monkeypatch, tmp_path):
+    monkeypatch.setattr(episode_filter, "EPISODE_FILTER_PATH", str(tmp_path))
+    monkeypatch.setattr(
+        episode_filter, "EPISODE_FILTER_BITS_FP", str(tmp_path / "bloom.bin")
+    )
+    monkeypatch.setattr(
+        episode_filter, "EPISODE_FILTER_META_FP", str(tmp_path / "bloom.json")
+    )
+    return tmp_path
+
+
+def fake_scan(rows):
+    def scan(greater_id, handle_rows):
+        selected = sorted(row for row in rows if row[0] > greater_id)
+        if not selected:
+            return greater_id
+        handle_rows(selected)
+        return selected[-1][0]
+
+    return scan
+
+
+def test_bloom_filter_has_no_false_negative_and_few_false_positives():
+    bloom = BloomFilter.for_capacity(10000, 0.01)
+    bloom.add_many(f"key-{num}" for num in range(10000))
+    assert all(f"key-{num}" in bloom for num in range(10000))
+
+    false_positives = sum(f"other-{num}" in bloom for num in range(10000))
+    assert false_positives < 200
+
+
+def _add_in_child(bloom):
+    bloom.add("from-child")
+
+
+def test_bloom_filter_adds_of_forked_process_are_shared():
+    bloom = BloomFilter.for_capacity(100, 0.01)
+    process = multiprocessing.get_context("fork").Process(
+        target=_add_in_child, args=(bloom,)
+    )
+    process.start()
+    process.join()
+    assert "from-child" in bloom
+
+
+def test_save_and_load(filter_path):
+    saved = EpisodeFilter(1000, 0.01, watermark=42)
+    saved.add_episodes("1", ["a", "b"])
+    save_episode_filter(saved)
+
+    loaded = load_episode_filter(1000, 0.01)
+    assert loaded.watermark == 42
+    assert create_episode_key("1", "a") in loaded
+    assert load_episode_filter(2000, 0.01) is None
+
+
+def test_catch_up_reads_rows_committed_late_within_window(monkeypatch):
+    rows = [(num, "1", f"uri-{num}") for num in range(1, 101) if num != 95]
+    monkeypatch.setattr(episode_filter, "scan_itunes_episode_keys", fake_scan(rows))
+
+    built = EpisodeFilter(1000, 0.01, rescan_window=10)
+    built.catch_up()
+    assert (built.watermark, built.count) == (100, 99)
+    assert create_episode_key("1", "uri-95") not in built
+
+    rows.append((95, "1", "uri-95"))
+    built.catch_up()
+    assert built.watermark == 100
+    assert built.count == 99
+    assert create_episode_key("1", "uri-95") in built
+
+
+def test_known_episodes_skips_query_on_filter_negative(monkeypatch):
+    calls = []
+
+    def get_uris(collection_id):
+        calls.append(collection_id)
+        return {"saved"}
+
+    monkeypatch.setattr(episode_filter, "get_itunes_episode_uris", get_uris)
+    built = EpisodeFilter(1000, 0.01)
+    built.add_episodes("1", ["saved"])
+
+    known = KnownEpisodes("1", built)
+    assert "new" not in known
+    assert calls == []
+    assert "saved" in known
+    assert "saved" in known
+    assert calls == ["1"]
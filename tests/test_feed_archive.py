@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from app.crawler import feed_archive
+from app.crawler.feed_archive import (
+    archive_feed,
+    create_blob_fp,
+    load_archive_index,
+    read_archived_feed,
+)
+
+
+@pytest.fixture(autouse=True)
+def archive_path(monkeypatch, tmp_path):
+    monkeypatch.setattr(feed_archive, "ARCHIVE_BLOB_PATH", str(tmp_path / "blobs"))
+    monkeypatch.setattr(feed_archive, "ARCHIVE_INDEX_FP", str(tmp_path / "index.tsv"))
+    monkeypatch.setattr(feed_archive, "_INDEX", {})
+    return tmp_path
+
+
+def read_index_lines(archive_path):
+    with open(archive_path / "index.tsv", "r", encoding="utf-8") as file:
+        return file.read().splitlines()
+
+
+def test_archive_feed_dedups_content(archive_path):
+    first = archive_feed("1", b"<rss>a</rss>")
+    assert archive_feed("1", b"<rss>a</rss>") == first
+    assert archive_feed(2, b"<rss>a</rss>") == first
+
+    assert os.path.exists(create_blob_fp(first))
+    assert len(os.listdir(os.path.dirname(create_blob_fp(first)))) == 1
+    assert read_index_lines(archive_path) == [f"1\t{first}", f"2\t{first}"]
+
+
+def test_index_gets_a_line_per_change(archive_path):
+    first = archive_feed("1", b"<rss>a</rss>")
+    second = archive_feed("1", b"<rss>b</rss>")
+    archive_feed("1", b"<rss>b</rss>")
+
+    assert read_index_lines(archive_path) == [f"1\t{first}", f"1\t{second}"]
+    assert load_archive_index() == {"1": second}
+
+
+def test_read_archived_feed():
+    archive_feed("1", b"<rss>a</rss>")
+    assert read_archived_feed(1) == b"<rss>a</rss>"
+    assert read_archived_feed("2") is None
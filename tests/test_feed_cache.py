@@ -0,0 +1,53 @@
+import pytest
+
+from app.crawler import feed_cache
+from app.crawler.feed_cache import (
+    create_conditional_headers,
+    create_feed_validator,
+    has_http_validator,
+    is_unchanged_content,
+    load_feed_validator,
+    save_feed_validator,
+)
+
+URL = "http://example.com/feed"
+
+
+@pytest.fixture(autouse=True)
+def cache_path(monkeypatch, tmp_path):
+    monkeypatch.setattr(feed_cache, "FEED_CACHE_PATH", str(tmp_path))
+
+
+def test_conditional_headers():
+    assert create_conditional_headers(None) == {}
+    validator = create_feed_validator(
+        URL, {"ETag": '"v1"', "Last-Modified": "Mon, 06 Mar 2023 10:00:00 GMT"}, b"a"
+    )
+    assert create_conditional_headers(validator) == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Mon, 06 Mar 2023 10:00:00 GMT",
+    }
+
+
+def test_save_and_load_validator():
+    assert load_feed_validator(URL) is None
+    validator = create_feed_validator(URL, {"ETag": '"v1"'}, b"<rss/>")
+    save_feed_validator(validator)
+    assert load_feed_validator(URL) == validator
+    assert load_feed_validator(URL + "?other") is None
+
+
+def test_is_unchanged_content():
+    validator = create_feed_validator(URL, {}, b"<rss/>")
+    assert is_unchanged_content(validator, b"<rss/>")
+    assert not is_unchanged_content(validator, b"<rss></rss>")
+    assert not is_unchanged_content(None, b"<rss/>")
+
+
+def test_streamed_validator_has_no_content_hash():
+    validator = create_feed_validator(URL, {"ETag": '"v1"'}, None)
+    assert validator.content_hash is None
+    assert not is_unchanged_content(validator, b"<rss/>")
+    assert has_http_validator({"ETag": '"v1"'})
+    assert has_http_validator({"Last-Modified": "Mon, 06 Mar 2023 10:00:00 GMT"})
+    assert not has_http_validator({})
@@ -0,0 +1,48 @@
+import pytest
+
+from app.common.exceptions import FormatterException
+from app.feed_parser.formatter import html_to_string_formatter, html_to_text
+
+
+@pytest.mark.parametrize(
+    "html_string, expected",
+    [
+        ("<div>line1<br/>line2</div>", "line1\nline2"),
+        ("<p>first</p><p>second</p>", "first\n\nsecond"),
+        ("<ul><li>a</li><li>b</li></ul>", "a\nb"),
+        ("say <b>bold</b>ly", "say boldly"),
+        ("  a \t b  ", "a b"),
+        ("a\n\n\n\nb", "a\n\nb"),
+        ("x<script>var a = '<p>';</script>y<style>p {}</style>", "xy"),
+        ("x<!-- <p>hidden</p> -->y", "xy"),
+        ("&amp;lt;b&amp;gt;x&amp;lt;/b&amp;gt;", "x"),
+        ("Tom &amp; Jerry", "Tom & Jerry"),
+        ("", ""),
+    ],
+)
+def test_html_to_text(html_string, expected):
+    assert html_to_text(html_string) == expected
+
+
+def test_html_to_text_keeps_long_text():
+    text = "word " * 5000
+    assert html_to_text(f"<p>{text}</p>") == text.strip()
+
+
+def test_html_to_string_formatter_wraps_type_error():
+    with pytest.raises(FormatterException):
+        html_to_string_formatter(None)
+
+
+@pytest.mark.parametrize(
+    "html_string, max_length, expected",
+    [
+        ("<p>abc</p><p>def</p>", 4, "abc\n"),
+        ("<p>abc</p><p>def</p>", 5, "abc\n\n"),
+        ("<p>abc</p><p>def</p>", 6, "abc\n\nd"),
+        ("<p>abc</p><p>def</p>", 100, "abc\n\ndef"),
+        ("<p>abc</p><p>def</p>", 0, "abc\n\ndef"),
+    ],
+)
+def test_html_to_text_caps_length(html_string, max_length, expected):
+    assert html_to_text(html_string, max_length) == expected
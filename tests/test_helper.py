@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+from app.common.exceptions import FeedResultFieldNotFoundError
+from app.feed_parser.field_method import fetch_pub_date_method
+from app.feed_parser.formatter import html_to_text
+from app.feed_parser.helper import (
+    ExtractionPlan,
+    get_description_max_length,
+    get_feed_description_description,
+    get_feed_description_list,
+    get_feed_release_date_field,
+)
+
+
+def test_description_is_capped_by_config():
+    max_length = get_description_max_length()
+    assert max_length > 0
+    entry = {"summary": "a" * (max_length + 100)}
+    assert get_feed_description_description(entry) == "a" * max_length
+
+
+def test_description_cap_can_be_given():
+    entries = [{"summary": "<p>abc</p><p>def</p>"}, {"title": "no description"}]
+    assert get_feed_description_list(entries, max_length=3) == ["abc", ""]
+    assert get_feed_description_list(entries, max_length=0) == ["abc\n\ndef", ""]
+
+
+def longest_description(entry, max_length):
+    """reference, every candidate formatted, the longest one of higher priority wins"""
+    values = [entry.get(key) for key in ["subtitle", "summary", "description"]]
+    values.append((entry.get("content") or [{}])[0].get("value"))
+    descriptions = [html_to_text(value, max_length) for value in values if value]
+    return sorted([d for d in descriptions if d], key=len, reverse=True)[0]
+
+
+def test_plan_keeps_longest_description_of_every_entry():
+    entries = [{"summary": "<p>summary %s</p>" % num} for num in range(5)]
+    # content is longer than summary from here on
+    entries += [
+        {
+            "summary": "short",
+            "content": [{"value": "<b>a much longer content %s</b>" % num}],
+        }
+        for num in range(5)
+    ]
+    # summary raw value is longer, but shorter as text
+    entries.append({"summary": "&amp;amp;" * 20, "subtitle": "plain subtitle"})
+    entries.append({"subtitle": "same", "summary": "same"})
+
+    plan = ExtractionPlan()
+    for entry in entries:
+        expected = longest_description(entry, 100)
+        assert get_feed_description_description(entry, 100) == expected
+        assert get_feed_description_description(entry, 100, plan) == expected
+
+
+def test_description_of_random_entries_matches_reference():
+    rng = random.Random(0)
+    words = ["a", "<p>", "<br/>", "&amp;", "&lt;b&gt;", " ", "\n", "<i>x</i>", "long"]
+    plan = ExtractionPlan()
+    for _ in range(500):
+        entry = {}
+        for key in ["subtitle", "summary", "description", "content"]:
+            if rng.random() < 0.6:
+                value = "".join(rng.choice(words) for _ in range(rng.randint(0, 12)))
+                entry[key] = [{"value": value}] if key == "content" else value
+        try:
+            expected = longest_description(entry, 8)
+        except IndexError:
+            with pytest.raises(FeedResultFieldNotFoundError):
+                get_feed_description_description(entry, 8, plan)
+            continue
+        assert get_feed_description_description(entry, 8, plan) == expected
+
+
+def test_plan_keeps_priority_of_release_date_methods():
+    plan = ExtractionPlan()
+    entries = [{"pubDate": "2023-03-0%sT10:00:00Z" % num} for num in range(1, 5)]
+    for entry in entries:
+        get_feed_release_date_field(entry, plan)
+    assert plan.get_method("release_date") is fetch_pub_date_method
+
+    entry = {"published": "2023-03-06T10:00:00Z", "pubDate": "2023-03-05T10:00:00Z"}
+    assert get_feed_release_date_field(entry, plan) == "2023/03/06 10:00:00"
+    assert get_feed_release_date_field(entry) == "2023/03/06 10:00:00"
@@ -0,0 +1,55 @@
+import os
+import time
+
+import pytest
+
+from app.common import metrics
+
+
+@pytest.fixture(autouse=True)
+def metrics_path(monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, "METRICS_PATH", str(tmp_path))
+    yield tmp_path
+    metrics._STATE.update({"run_id": None, "run_dir": None})
+
+
+def test_summary_of_run(metrics_path):
+    metrics.start_run("run")
+    metrics.incr("feed.count")
+    metrics.incr("feed.count", 2)
+    metrics.gauge("queue", 5)
+    for value in [0.1, 0.2, 0.3, 0.4]:
+        metrics.observe("feed.parse", value)
+
+    summary = metrics.end_run()
+    assert summary["counters"] == {"feed.count": 3}
+    assert summary["gauges"] == {"queue": 5}
+    assert summary["histograms"]["feed.parse"]["count"] == 4
+    assert summary["histograms"]["feed.parse"]["p50"] == 0.2
+    assert summary["histograms"]["feed.parse"]["max"] == 0.4
+    assert os.listdir(metrics_path) == ["run.json"]
+    assert not metrics.is_running()
+
+
+def test_nothing_is_recorded_without_run(metrics_path):
+    metrics.incr("feed.count")
+    assert metrics.end_run() is None
+    assert os.listdir(metrics_path) == []
+
+
+def test_percentile():
+    assert metrics.percentile([], 50) == 0.0
+    assert metrics.percentile([1, 2, 3, 4], 95) == 4
+    assert metrics.percentile([1, 2, 3, 4], 25) == 1
+
+
+def test_remove_old_runs_keeps_latest(metrics_path):
+    for num in range(5):
+        fp = metrics_path / f"{num}.json"
+        fp.write_text("{}")
+        os.utime(fp, (time.time() + num, time.time() + num))
+    (metrics_path / "crashed").mkdir()
+    os.utime(metrics_path / "crashed", (0, 0))
+
+    metrics.remove_old_runs(keep=2)
+    assert sorted(os.listdir(metrics_path)) == ["3.json", "4.json"]
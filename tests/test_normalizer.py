@@ -0,0 +1,72 @@
+import pytest
+
+from app.common.exceptions import FeedResultFieldNotFoundError, FormatterException
+from app.feed_parser.formatter import basic_datetime_formatter
+from app.feed_parser.normalizer import (
+    normalize_duration,
+    normalize_duration_list,
+    normalize_release_date,
+    normalize_release_date_list,
+)
+
+
+@pytest.mark.parametrize(
+    "release_date, expected",
+    [
+        ("Mon, 06 Mar 2023 10:00:00 +0800", "2023/03/06 02:00:00"),
+        ("06 Mar 2023 10:00 GMT", "2023/03/06 10:00:00"),
+        ("Mon, 06 Mar 2023 10:00:00", "2023/03/06 10:00:00"),
+        ("2023-03-06T10:00:00.000+08:00", "2023/03/06 02:00:00"),
+        ("2023-03-06T10:00:00Z", "2023/03/06 10:00:00"),
+        ("Thu, 15 No 2018 00:00:00 GMT", "2018/11/15 00:00:00"),
+    ],
+)
+def test_normalize_release_date(release_date, expected):
+    assert normalize_release_date(release_date) == expected
+
+
+@pytest.mark.parametrize(
+    "release_date",
+    [
+        "Mon, 06 Mar 2023 10:00:00 +0800",
+        "Tue, 28 Feb 2023 23:59:59 -0500",
+        "2023-03-06T10:00:00+08:00",
+        "2023-03-06 10:00:00",
+    ],
+)
+def test_normalize_release_date_matches_dateutil(release_date):
+    assert normalize_release_date(release_date) == basic_datetime_formatter(
+        release_date
+    )
+
+
+def test_normalize_release_date_raises_on_garbage():
+    with pytest.raises(FeedResultFieldNotFoundError):
+        normalize_release_date("not a date")
+
+
+@pytest.mark.parametrize(
+    "duration, expected",
+    [
+        ("3600", "1:00:00"),
+        ("10:05", "0:10:05"),
+        ("01:02:03", "01:02:03"),
+        ("125:30", "2:5:30"),
+        ("1:02:03.50", "1:02:03"),
+    ],
+)
+def test_normalize_duration(duration, expected):
+    assert normalize_duration(duration) == expected
+
+
+def test_normalize_duration_raises_on_garbage():
+    with pytest.raises(FormatterException):
+        normalize_duration("about an hour")
+
+
+def test_list_forms_give_none_for_bad_items():
+    assert normalize_release_date_list(["2023-03-06T10:00:00Z", "x"]) == [
+        "2023/03/06 10:00:00",
+        None,
+    ]
+    assert normalize_duration_list(["60", "x"]) == ["0:01:00", None]
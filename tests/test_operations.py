@@ -0,0 +1,196 @@
+import threading
+import types
+
+import psycopg2
+import pytest
+
+from app.common.exceptions import DatabaseInsertError
+from app.db import operations
+from app.db.operations import (
+    _to_copy_field,
+    insert_episode,
+    insert_episodes,
+    insert_producer,
+    insert_program,
+)
+from core.conf import settings
+
+LOCK = threading.Lock()
+
+
+def test_to_copy_field():
+    assert _to_copy_field(None) == ""
+    assert _to_copy_field("") == '""'
+    assert _to_copy_field('say "hi", bye\n') == '"say ""hi"", bye\n"'
+    assert _to_copy_field(3) == '"3"'
+
+
+@pytest.fixture(scope="module")
+def database():
+    """benchmark database of benchmarks/schema.sql, skipped if it is not running"""
+    try:
+        psycopg2.connect(settings.DATABASE["DSN"], connect_timeout=2).close()
+    except psycopg2.OperationalError as exc:
+        pytest.skip("benchmark database is not reachable, %s" % (exc,))
+
+    from benchmarks.run_entry_point import reset_database
+
+    reset_database()
+    sleep_dict = {}
+    producer_id = insert_producer(
+        artist_id="1", nick_name="producer", lock=LOCK, sleep_dict=sleep_dict
+    )
+    program_id, _ = insert_program(
+        producer_id=producer_id,
+        i_producer_id=producer_id,
+        tag_id=1,
+        collection_id="1",
+        title="program",
+        image_url="http://example.com/600.jpg",
+        new_program_rss_data={"feedUrl": "http://example.com/feed"},
+        lock=LOCK,
+        sleep_dict=sleep_dict,
+    )
+    return program_id
+
+
+@pytest.fixture
+def bulk_insert(monkeypatch):
+    # execution.config is reloaded on every access, replace it as a whole
+    def set_bulk_insert(page_size: int, copy_threshold: int):
+        monkeypatch.setattr(
+            operations,
+            "execution",
+            types.SimpleNamespace(
+                config=types.SimpleNamespace(
+                    bulk_insert={
+                        "page_size": page_size,
+                        "copy_threshold": copy_threshold,
+                    }
+                )
+            ),
+        )
+
+    return set_bulk_insert
+
+
+def create_episodes(prefix: str, count: int):
+    return [
+        {
+            "title": f"{prefix} {num}",
+            "description": f'description, "{num}"\n',
+            "data_uri": f"http://example.com/{prefix}/{num}.mp3",
+            "duration": str(num),
+            "release_date": "2023/03/%02d 10:00:00" % (num % 28 + 1,),
+            "tags": [(1,), (2,)] if num % 2 else [],
+            "img_url": None if num % 3 else f"http://example.com/{prefix}/{num}.jpg",
+        }
+        for num in range(count)
+    ]
+
+
+def fetch_rows(query, params):
+    conn = psycopg2.connect(settings.DATABASE["DSN"])
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("copy_threshold", [0, 1], ids=["values", "copy"])
+def test_insert_episodes_maps_ids_in_order(database, bulk_insert, copy_threshold):
+    bulk_insert(page_size=3, copy_threshold=copy_threshold)
+    prefix = f"ordered-{copy_threshold}"
+    episodes = create_episodes(prefix, 10)
+
+    episode_ids = insert_episodes(
+        program_id=database,
+        i_program_id="1",
+        episodes=episodes,
+        lock=LOCK,
+        sleep_dict={},
+    )
+
+    assert len(episode_ids) == len(episodes)
+    assert episode_ids == sorted(episode_ids)
+    rows = fetch_rows(
+        'SELECT "id", "title", "description", "img_url" FROM "products_episode" '
+        'WHERE "id" = ANY(%s) ORDER BY "id"',
+        (episode_ids,),
+    )
+    assert [row[0] for row in rows] == episode_ids
+    assert [row[1:] for row in rows] == [
+        (episode["title"], episode["description"], episode["img_url"])
+        for episode in episodes
+    ]
+
+    itunes_rows = fetch_rows(
+        'SELECT "ep_id", "i_ep_id" FROM "products_itunes_episode" '
+        'WHERE "ep_id" = ANY(%s)',
+        (episode_ids,),
+    )
+    assert dict(itunes_rows) == {
+        episode_id: episode["data_uri"]
+        for episode_id, episode in zip(episode_ids, episodes)
+    }
+
+    tag_rows = fetch_rows(
+        'SELECT "episode_id", "tag_id" FROM "products_episode_tags" '
+        'WHERE "episode_id" = ANY(%s) ORDER BY "id"',
+        (episode_ids,),
+    )
+    assert tag_rows == [
+        (episode_id, tag[0])
+        for episode_id, episode in zip(episode_ids, episodes)
+        for tag in episode["tags"]
+    ]
+
+
+@pytest.mark.parametrize("copy_threshold", [0, 1], ids=["values", "copy"])
+def test_failed_insert_episodes_saves_nothing(database, bulk_insert, copy_threshold):
+    bulk_insert(page_size=3, copy_threshold=copy_threshold)
+    prefix = f"failed-{copy_threshold}"
+    episodes = create_episodes(prefix, 5)
+    # tag does not exist
+    episodes[3]["tags"] = [(99999,)]
+
+    with pytest.raises(DatabaseInsertError):
+        insert_episodes(
+            program_id=database,
+            i_program_id="1",
+            episodes=episodes,
+            lock=LOCK,
+            sleep_dict={},
+        )
+    assert not fetch_rows(
+        'SELECT "id" FROM "products_episode" WHERE "title" LIKE %s',
+        (prefix + "%",),
+    )
+
+    # the one by one fallback of handle_create saves the others
+    saved = []
+    for episode in episodes:
+        try:
+            saved.append(
+                insert_episode(
+                    program_id=database,
+                    i_program_id="1",
+                    lock=LOCK,
+                    sleep_dict={},
+                    **episode,
+                )
+            )
+        except DatabaseInsertError:
+            pass
+    assert len(saved) == 4
+    assert (
+        len(
+            fetch_rows(
+                'SELECT "id" FROM "products_episode" WHERE "title" LIKE %s',
+                (prefix + "%",),
+            )
+        )
+        == 4
+    )
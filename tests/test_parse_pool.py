@@ -0,0 +1,58 @@
+from app.common.exceptions import FeedResultException, FormatterException
+from app.feed_parser.parse_pool import EpisodeRecord, iter_parsed_chunks
+
+
+def create_item(num: int, enclosure: bool = True) -> str:
+    enclosure_tag = (
+        f'<enclosure url="http://example.com/{num}.mp3" type="audio/mpeg"/>'
+        if enclosure
+        else ""
+    )
+    return (
+        f"<item><title>episode {num}</title><guid>{num}</guid>"
+        "<pubDate>Mon, 06 Mar 2023 10:00:00 +0800</pubDate>"
+        "<itunes:duration>10:00</itunes:duration>"
+        f"<description>&lt;p&gt;show {num}&lt;/p&gt;</description>"
+        f"{enclosure_tag}</item>"
+    )
+
+
+def create_feed(items) -> bytes:
+    return (
+        '<?xml version="1.0"?>'
+        '<rss xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd">'
+        f"<channel><title>podcast</title>{''.join(items)}</channel></rss>"
+    ).encode("utf-8")
+
+
+def test_chunks_of_one_parse():
+    content = create_feed(create_item(num) for num in range(5))
+    chunks = list(iter_parsed_chunks(content, chunk_size=2))
+
+    assert [chunk.index for chunk in chunks] == [0, 1, 2]
+    assert [chunk.done for chunk in chunks] == [False, False, True]
+    assert chunks[0].feed["title"] == "podcast"
+    assert chunks[1].feed is None
+    records = [record for chunk in chunks for record in chunk.records]
+    assert records[0] == EpisodeRecord(
+        data_uri="http://example.com/0.mp3",
+        title="episode 0",
+        release_date="2023/03/06 02:00:00",
+        duration="0:10:00",
+        description="show 0",
+        img_url=None,
+        tags=[],
+    )
+    assert [record.title for record in records] == [f"episode {n}" for n in range(5)]
+
+
+def test_entry_error_is_sent_as_record():
+    content = create_feed([create_item(0), create_item(1, enclosure=False)])
+    (chunk,) = iter_parsed_chunks(content, chunk_size=10)
+    assert isinstance(chunk.records[0], EpisodeRecord)
+    assert isinstance(chunk.records[1], (FeedResultException, FormatterException))
+
+
+def test_empty_feed_has_one_done_chunk():
+    (chunk,) = iter_parsed_chunks(create_feed([]), chunk_size=10)
+    assert chunk.done and chunk.records == [] and chunk.bozo == 0
@@ -0,0 +1,94 @@
+import multiprocessing
+import time
+from functools import partial
+
+import pytest
+
+from app.pipeline import Pipeline, Stage
+
+
+def double_stage(item, emit):
+    emit(item * 2)
+
+
+def collect_stage(results, item, emit):
+    if item == 6:
+        raise ValueError("handler error must not stop the worker")
+    results.put(item)
+
+
+def sleep_stage(item, emit):
+    time.sleep(60)
+
+
+def drain(results, count):
+    return sorted(results.get(timeout=5) for _ in range(count))
+
+
+def create_pipeline(results):
+    return Pipeline(
+        [
+            Stage("double", double_stage, workers=2),
+            Stage("collect", partial(collect_stage, results)),
+        ],
+        poll_interval=0.01,
+    )
+
+
+def test_stage_require_worker():
+    with pytest.raises(ValueError):
+        Stage("empty", double_stage, workers=0)
+    with pytest.raises(ValueError):
+        Pipeline([])
+
+
+def test_items_flow_through_stages():
+    results = multiprocessing.Queue()
+    pipeline = create_pipeline(results)
+    pipeline.start()
+    for num in range(5):
+        pipeline.stages[0].put(num)
+
+    for stage in pipeline.stages:
+        pipeline.join(stage)
+
+    # 3 * 2 raised in collect, the rest are emitted
+    assert drain(results, 4) == [0, 2, 4, 8]
+    assert all(stage.stopped for stage in pipeline.stages)
+    assert all(stage.is_idle() for stage in pipeline.stages)
+
+
+def test_wait_settled_keeps_workers_running():
+    results = multiprocessing.Queue()
+    pipeline = create_pipeline(results)
+    pipeline.start()
+    pipeline.stages[0].put(1)
+    pipeline.wait_settled(pipeline.get_stage("collect"))
+    assert drain(results, 1) == [2]
+
+    # settled stages accept more items, e.g. retries of the first round
+    pipeline.stages[0].put(2)
+    pipeline.wait_settled(pipeline.get_stage("collect"))
+    assert drain(results, 1) == [4]
+    assert not any(stage.stopped for stage in pipeline.stages)
+
+    for stage in pipeline.stages:
+        pipeline.join(stage)
+
+
+def test_drain_requires_stopped_upstream():
+    pipeline = create_pipeline(multiprocessing.Queue())
+    with pytest.raises(RuntimeError):
+        pipeline.wait_idle(pipeline.get_stage("collect"))
+    with pytest.raises(KeyError):
+        pipeline.get_stage("missing")
+
+
+def test_terminate_stops_busy_workers():
+    pipeline = Pipeline([Stage("sleep", sleep_stage)], poll_interval=0.01)
+    pipeline.start()
+    pipeline.stages[0].put(1)
+    pipeline.terminate()
+    for process in pipeline.stages[0].processes:
+        process.join(timeout=5)
+        assert not process.is_alive()
@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.crawler import rate_limiter
+from app.crawler.exceptions import CrawlerRateLimited, CrawlerUnavailable
+from app.crawler.rate_limiter import SharedTokenBucket, TokenBucket, get_rate_limiter
+
+CONFIG = {
+    "enabled": True,
+    "backend": "local",
+    "rate": 1,
+    "burst": 2,
+    "min_rate": 0.5,
+    "max_rate": 4,
+    "decrease_factor": 0.5,
+    "increase_step": 0.5,
+    "max_wait": 0,
+}
+
+
+@pytest.fixture(autouse=True)
+def reset_bucket(monkeypatch):
+    rate_limiter._SHARED_STATE[rate_limiter._TOKENS] = -1.0
+    monkeypatch.setitem(rate_limiter._LIMITER, "pid", None)
+
+
+def test_token_bucket_is_abstract():
+    with pytest.raises(TypeError):
+        TokenBucket(CONFIG)
+
+
+def test_take_grants_burst_then_asks_to_wait():
+    bucket = SharedTokenBucket(CONFIG)
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert 0 < bucket.take() <= 1
+
+
+def test_report_block_halves_rate_and_drops_burst():
+    bucket = SharedTokenBucket(CONFIG)
+    bucket.take()
+    bucket.report_block()
+    assert rate_limiter._SHARED_STATE[rate_limiter._RATE] == 0.5
+    assert bucket.take() > 0
+
+
+def test_rate_is_clamped():
+    bucket = SharedTokenBucket(CONFIG)
+    bucket.take()
+    for _ in range(10):
+        bucket.report_success()
+    assert rate_limiter._SHARED_STATE[rate_limiter._RATE] == CONFIG["max_rate"]
+    for _ in range(10):
+        bucket.report_block()
+    assert rate_limiter._SHARED_STATE[rate_limiter._RATE] == CONFIG["min_rate"]
+
+
+def test_acquire_raises_over_max_wait():
+    bucket = SharedTokenBucket(CONFIG)
+    bucket.acquire()
+    bucket.acquire()
+    with pytest.raises(CrawlerRateLimited) as exc_info:
+        bucket.acquire()
+    assert isinstance(exc_info.value, CrawlerUnavailable)
+
+
+def test_get_rate_limiter_is_cached_until_config_changes(monkeypatch):
+    config = SimpleNamespace(rate_limit=dict(CONFIG))
+    monkeypatch.setattr(rate_limiter, "execution", SimpleNamespace(config=config))
+
+    limiter = get_rate_limiter()
+    assert isinstance(limiter, SharedTokenBucket)
+    assert get_rate_limiter() is limiter
+
+    config.rate_limit = {**CONFIG, "rate": 2}
+    assert get_rate_limiter() is not limiter
+
+    config.rate_limit = {**CONFIG, "enabled": False}
+    assert get_rate_limiter() is None
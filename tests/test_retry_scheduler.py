@@ -0,0 +1,41 @@
+import time
+
+from app.retry_scheduler import KIND_GENRE, KIND_LOOKUP, RetryScheduler
+
+
+def test_compute_delay_backs_off_with_jitter_and_cap():
+    scheduler = RetryScheduler(base_delay=2, max_delay=5, jitter=0.5)
+    for _ in range(20):
+        assert 1 <= scheduler.compute_delay(1) <= 2
+        assert 2 <= scheduler.compute_delay(2) <= 4
+        assert 2.5 <= scheduler.compute_delay(5) <= 5
+
+
+def test_drops_key_after_max_attempts():
+    scheduler = RetryScheduler(max_attempts=2, base_delay=0, jitter=0)
+    assert scheduler.schedule(KIND_LOOKUP, "1")
+    assert scheduler.schedule(KIND_LOOKUP, "1")
+    assert not scheduler.schedule(KIND_LOOKUP, "1")
+    assert len(scheduler) == 2
+    assert scheduler.report()["dropped"] == [
+        {"kind": KIND_LOOKUP, "key": "1", "attempts": 2}
+    ]
+
+
+def test_pop_due_orders_genres_first():
+    scheduler = RetryScheduler(base_delay=0, jitter=0)
+    scheduler.schedule(KIND_LOOKUP, "1")
+    scheduler.schedule(KIND_GENRE, 26)
+    scheduler.schedule(KIND_LOOKUP, "2")
+
+    items = scheduler.pop_due(time.time() + 1)
+    assert [item.key for item in items] == [26, "1", "2"]
+    assert not scheduler
+    assert scheduler.report()["retried"] == 3
+
+
+def test_pop_due_keeps_items_not_due():
+    scheduler = RetryScheduler(base_delay=60, jitter=0)
+    scheduler.schedule(KIND_LOOKUP, "1")
+    assert scheduler.pop_due() == []
+    assert len(scheduler) == 1
@@ -0,0 +1,74 @@
+import pytest
+
+from app.crawler import sanitizer
+from app.crawler.sanitizer import (
+    detect_wide_encoding,
+    iter_sanitized_chunks,
+    load_hint,
+    sanitize_feed_content,
+    strip_control_bytes,
+)
+
+
+@pytest.fixture(autouse=True)
+def hints_path(monkeypatch, tmp_path):
+    monkeypatch.setattr(sanitizer, "FEED_HINTS_PATH", str(tmp_path))
+
+
+def test_strip_control_bytes_keeps_tab_and_newlines():
+    assert strip_control_bytes(b"<a>\x00x\x1f\ty\r\nz\x7f</a>") == b"<a>x\ty\r\nz</a>"
+
+
+def test_strip_control_bytes_keeps_multibyte_utf8():
+    content = "<a>節目\x0b</a>".encode("utf-8")
+    assert strip_control_bytes(content) == "<a>節目</a>".encode("utf-8")
+
+
+def test_strip_control_bytes_decodes_wide_encoding():
+    content = "<a>x\x01</a>".encode("utf-16")
+    encoding = detect_wide_encoding(content)
+    assert encoding == "utf-16"
+    cleaned = strip_control_bytes(content, encoding)
+    assert cleaned.decode("utf-16") == "<a>x</a>"
+
+
+def test_sanitize_feed_content_saves_hint_only_when_dirty():
+    url = "http://example.com/feed"
+    assert sanitize_feed_content(url, b"<rss/>") == b"<rss/>"
+    assert load_hint(url) is None
+
+    assert sanitize_feed_content(url, b"<rss>\x08</rss>") == b"<rss></rss>"
+    hint = load_hint(url)
+    assert hint.sanitize and hint.encoding is None
+
+
+def test_iter_sanitized_chunks_cleans_chunk_by_chunk():
+    url = "http://example.com/feed"
+    chunks = [b"<r", b"ss>\x00", b"x</rss>"]
+    assert b"".join(iter_sanitized_chunks(url, chunks)) == b"<rss>x</rss>"
+    assert load_hint(url).sanitize
+
+
+def test_iter_sanitized_chunks_joins_wide_encoding():
+    url = "http://example.com/feed"
+    content = "<a>x\x01</a>".encode("utf-16")
+    chunks = [content[num : num + 3] for num in range(0, len(content), 3)]
+    cleaned = list(iter_sanitized_chunks(url, chunks))
+    assert len(cleaned) == 1
+    assert cleaned[0].decode("utf-16") == "<a>x</a>"
+
+
+def test_iter_sanitized_chunks_closes_source():
+    closed = []
+
+    def iter_chunks():
+        try:
+            yield b"<rss>"
+            yield b"</rss>"
+        finally:
+            closed.append(True)
+
+    chunks = iter_sanitized_chunks("http://example.com/feed", iter_chunks())
+    next(chunks)
+    chunks.close()
+    assert closed == [True]
@@ -0,0 +1,155 @@
+import pytest
+
+from app.feed_parser.stream import (
+    EntryStopper,
+    StreamFeedParser,
+    StreamSourceError,
+    parse_feed_stream,
+)
+
+
+def create_feed(count: int) -> bytes:
+    items = "".join(
+        f"<item><title>episode {num}</title><guid>{num}</guid></item>"
+        for num in range(count)
+    )
+    return (
+        '<?xml version="1.0"?><rss version="2.0">'
+        f"<channel><title>podcast</title>{items}</channel></rss>"
+    ).encode("utf-8")
+
+
+def test_entries_are_read_lazily():
+    content = create_feed(1000)
+    read = []
+
+    def iter_chunks():
+        for start in range(0, len(content), 64):
+            read.append(start)
+            yield content[start : start + 64]
+
+    parser = StreamFeedParser(iter_chunks())
+    assert parser.feed["title"] == "podcast"
+
+    titles = []
+    for entry in parser:
+        titles.append(entry["title"])
+        if len(titles) == 3:
+            break
+    assert titles == ["episode 0", "episode 1", "episode 2"]
+    # only the head of the content is read
+    assert len(read) < 10
+
+
+def test_chunked_content_gives_the_same_entries():
+    content = create_feed(50)
+    result = parse_feed_stream([content[:50], content[50:]], 16)
+    assert [entry["id"] for entry in result.entries] == [str(n) for n in range(50)]
+
+
+def iter_broken_chunks(content: bytes, size: int):
+    yield from (content[start : start + 64] for start in range(0, size, 64))
+    raise ConnectionError("connection reset")
+
+
+def test_source_error_before_first_entry_raises():
+    content = create_feed(50)
+    with pytest.raises(StreamSourceError):
+        parse_feed_stream(iter_broken_chunks(content, 64))
+
+
+def test_source_error_after_first_entry_ends_entries():
+    content = create_feed(50)
+    parser = StreamFeedParser(iter_broken_chunks(content, len(content) // 2))
+    titles = [entry["title"] for entry in parser]
+    assert 0 < len(titles) < 50
+    assert titles[0] == "episode 0"
+    assert parser.bozo == 1 and parser.incomplete
+
+
+def test_close_closes_source():
+    closed = []
+
+    def iter_chunks():
+        try:
+            yield create_feed(10)
+        finally:
+            closed.append(True)
+
+    parser = StreamFeedParser(iter_chunks())
+    next(iter(parser))
+    parser.close()
+    assert closed == [True]
+
+
+def test_not_rss_falls_back_to_feedparser():
+    content = (
+        b'<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom">'
+        b"<title>atom</title><entry><title>one</title></entry></feed>"
+    )
+    result = parse_feed_stream(content)
+    assert result.feed["title"] == "atom"
+    assert [entry["title"] for entry in result.entries] == ["one"]
+
+
+def test_stopper_stops_after_consecutive_known_entries():
+    stopper = EntryStopper(max_known=2)
+    assert not stopper.add_known(None)
+    assert not stopper.add_new(None)
+    assert not stopper.add_known(None)
+    assert stopper.add_known(None)
+
+
+def test_stopper_never_stops_without_max_known():
+    stopper = EntryStopper()
+    assert not any(stopper.add_known(None) for _ in range(100))
+
+
+@pytest.mark.parametrize(
+    "release_date, stop",
+    [
+        ("2023/03/05 23:59:59", True),
+        ("2023/03/06 00:00:00", False),
+        ("2023/03/07 00:00:00", False),
+        (None, False),
+    ],
+)
+def test_stopper_stops_at_new_entry_before_watermark(release_date, stop):
+    stopper = EntryStopper(watermark="2023/03/06 00:00:00")
+    assert stopper.add_new(release_date) is stop
+
+
+def test_stopper_tracks_newest_known_release_date():
+    stopper = EntryStopper(track_watermark=True)
+    assert not stopper.add_new("2023/03/01 00:00:00")
+    stopper.add_known("2023/03/06 00:00:00")
+    stopper.add_known("2023/03/04 00:00:00")
+    assert stopper.watermark == "2023/03/06 00:00:00"
+    assert not stopper.add_new("2023/03/07 00:00:00")
+    assert stopper.add_new("2023/03/05 00:00:00")
+
+    fixed = EntryStopper(watermark="2023/03/01 00:00:00")
+    fixed.add_known("2023/03/06 00:00:00")
+    assert fixed.watermark == "2023/03/01 00:00:00"
+
+
+def test_stopper_ends_reading_of_streamed_feed():
+    content = create_feed(1000)
+    read = []
+
+    def iter_chunks():
+        for start in range(0, len(content), 256):
+            read.append(start)
+            yield content[start : start + 256]
+
+    known = {str(num) for num in range(5, 1000)}
+    stopper = EntryStopper(max_known=3)
+    new = []
+    for entry in StreamFeedParser(iter_chunks()):
+        if entry["guid"] not in known:
+            new.append(entry["guid"])
+            stopper.add_new(None)
+        elif stopper.add_known(None):
+            break
+    assert new == ["0", "1", "2", "3", "4"]
+    assert len(read) * 256 < len(content) // 10
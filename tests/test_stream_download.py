@@ -0,0 +1,65 @@
+import gzip
+import zlib
+
+import pytest
+
+from app.crawler.exceptions import FeedException, FeedTooLargeException
+from app.crawler.stream_download import (
+    ContentDecoder,
+    check_content_length,
+    iter_decoded_chunks,
+)
+
+BODY = b"<rss>" + b"<item>x</item>" * 2000 + b"</rss>"
+
+
+def split(data, size=100):
+    return [data[num : num + size] for num in range(0, len(data), size)]
+
+
+def decode(data, encoding, max_bytes=None, read_size=1024):
+    return b"".join(iter_decoded_chunks(split(data), encoding, max_bytes, read_size))
+
+
+@pytest.mark.parametrize(
+    "data, encoding",
+    [
+        (BODY, None),
+        (BODY, "identity"),
+        (gzip.compress(BODY), "gzip"),
+        (zlib.compress(BODY), "deflate"),
+        (zlib.compress(BODY)[2:-4], "deflate"),
+    ],
+)
+def test_decodes_content_encoding(data, encoding):
+    assert decode(data, encoding) == BODY
+
+
+def test_decodes_concatenated_gzip_members():
+    data = gzip.compress(BODY[:100]) + gzip.compress(BODY[100:])
+    assert decode(data, "gzip") == BODY
+
+
+def test_inflated_pieces_are_bounded_by_read_size():
+    decoder = ContentDecoder("gzip", read_size=512)
+    pieces = list(decoder.decode(gzip.compress(BODY)))
+    assert max(len(piece) for piece in pieces) <= 512
+    assert b"".join(pieces) + decoder.flush() == BODY
+
+
+def test_aborts_over_max_bytes():
+    with pytest.raises(FeedTooLargeException):
+        decode(gzip.compress(BODY), "gzip", max_bytes=len(BODY) - 1)
+    assert decode(gzip.compress(BODY), "gzip", max_bytes=len(BODY)) == BODY
+
+
+def test_check_content_length():
+    check_content_length({"Content-Length": "10"}, 10)
+    check_content_length({"Content-Length": "bad"}, 10)
+    with pytest.raises(FeedTooLargeException):
+        check_content_length({"Content-Length": "11"}, 10)
+
+
+def test_unsupported_encoding():
+    with pytest.raises(FeedException):
+        ContentDecoder("compress")
@@ -0,0 +1,120 @@
+import multiprocessing
+import threading
+
+import psycopg2
+import pytest
+
+from app.common.exceptions import DatabaseWriteTimeoutError
+from app.db import writer
+from app.db.writer import WriteResult, WriterService, run_batch
+
+
+@pytest.fixture(scope="module")
+def sync_manager():
+    with multiprocessing.Manager() as sync_manager:
+        yield sync_manager
+
+
+def create_service(sync_manager, timeout: float) -> WriterService:
+    # not started, commands are answered by the test itself
+    return WriterService(
+        workers=1, batch_size=10, manager=sync_manager, timeout=timeout
+    )
+
+
+def answer_commands(service: WriterService, count: int) -> threading.Thread:
+    def answer():
+        for _ in range(count):
+            command = service.commands.get(timeout=5)
+            command.reply.put(WriteResult(command.id, True, command.args[0]))
+
+    thread = threading.Thread(target=answer)
+    thread.start()
+    return thread
+
+
+def test_call_raises_timeout_error_without_result(sync_manager):
+    service = create_service(sync_manager, timeout=0.1)
+    with pytest.raises(DatabaseWriteTimeoutError):
+        service.call("insert_tag", ("talk",), {})
+
+
+def test_call_skips_result_of_command_given_up_before(sync_manager):
+    service = create_service(sync_manager, timeout=0.2)
+    with pytest.raises(DatabaseWriteTimeoutError):
+        service.call("insert_tag", ("late",), {})
+
+    # the late result arrives first on the reply queue of this thread
+    thread = answer_commands(service, 2)
+    assert service.call("insert_tag", ("next",), {}) == "next"
+    thread.join()
+
+
+def test_call_raises_exception_of_failed_command(sync_manager):
+    service = create_service(sync_manager, timeout=1)
+
+    def answer():
+        command = service.commands.get(timeout=5)
+        command.reply.put(WriteResult(command.id, False, ValueError("bad row")))
+
+    thread = threading.Thread(target=answer)
+    thread.start()
+    with pytest.raises(ValueError, match="bad row"):
+        service.call("insert_tag", ("talk",), {})
+    thread.join()
+
+
+def test_run_batch_rolls_back_failed_command_only(monkeypatch, manager):
+    monkeypatch.setattr(writer, "connection", manager)
+
+    def select(value):
+        with manager.cursor() as cursor:
+            cursor.execute("SELECT %s" % (value,))
+        return value
+
+    def fail(value):
+        with manager.cursor() as cursor:
+            cursor.execute("SELECT %s" % (value,))
+        raise ValueError("bad row %s" % (value,))
+
+    monkeypatch.setitem(writer.WRITE_COMMANDS, "select", select)
+    monkeypatch.setitem(writer.WRITE_COMMANDS, "fail", fail)
+    batch = [
+        writer.WriteCommand(num, name, (num,), {}, None)
+        for num, name in enumerate(["select", "fail", "select"])
+    ]
+
+    results = run_batch(batch)
+
+    assert [result.ok for result in results] == [True, False, True]
+    assert [result.id for result in results] == [0, 1, 2]
+    assert results[2].value == 2
+    assert isinstance(results[1].value, ValueError)
+    executed = manager.connections[0].executed
+    # one savepoint per command, one commit for the batch
+    assert len([sql for sql in executed if sql.startswith("SAVEPOINT")]) == 3
+    assert len([sql for sql in executed if sql.startswith("ROLLBACK TO")]) == 1
+    assert executed.count("COMMIT") == 1
+    rollback = executed.index(
+        next(sql for sql in executed if sql.startswith("ROLLBACK TO"))
+    )
+    assert executed[rollback - 1] == "SELECT 1"
+
+
+def test_run_batch_fails_every_command_if_commit_fails(monkeypatch, manager):
+    monkeypatch.setattr(writer, "connection", manager)
+    monkeypatch.setitem(writer.WRITE_COMMANDS, "select", lambda value: value)
+    batch = [writer.WriteCommand(num, "select", (num,), {}, None) for num in range(2)]
+
+    manager.ensure_connection()
+
+    def commit():
+        raise psycopg2.OperationalError("server closed the connection")
+
+    monkeypatch.setattr(manager.connections[0], "commit", commit)
+    results = run_batch(batch)
+
+    assert [result.ok for result in results] == [False, False]
+    assert all(
+        isinstance(result.value, writer.DatabaseInsertError) for result in results
+    )